@@ -0,0 +1,145 @@
+# Analytics & Reports view
+#
+# Each report is an entry in TABS, driven off the named queries in
+# queries_dict. Only the report picked in the selector is rendered, so its
+# query is the only one that runs on a rerun; adding a report costs nothing
+# for users who never open it.
+
+from collections import namedtuple
+
+import streamlit as st
+
+from db import at_risk, cached_read_sql, columnar_snapshot, retrain_forecast_model, run_query
+from filters import Filters, build_query, next_cursor
+from grid import GRIDS, paginated_grid
+from rollups import LOOKUPS
+
+# chart: (kind, index column, value column) drawn above the table
+# render: custom renderer for reports that are more than a query + table
+Tab = namedtuple("Tab", ["title", "heading", "query", "chart", "render"], defaults=[None, None, None])
+
+
+# --- Renderers ---
+def snapshot_caption(tab):
+    snapshot_name = columnar_snapshot(tab.query)
+    if snapshot_name:
+        st.caption(f"From analytics snapshot {snapshot_name}")
+
+
+def render_query_tab(tab):
+    df = run_query(tab.query)
+    snapshot_caption(tab)
+    if tab.chart:
+        kind, index, value = tab.chart
+        chart = st.bar_chart if kind == "bar" else st.line_chart
+        chart(df.set_index(index)[value])
+    st.dataframe(df, use_container_width=True)
+
+
+def render_grid(tab):
+    # Listing reports page through the table instead of loading all of it
+    descending = tab.query != "available_food"
+    paginated_grid(GRIDS[tab.query], descending=descending)
+
+
+def filter_options(column):
+    # Served by the lookup table of the column rather than a DISTINCT scan
+    return list(cached_read_sql(f"SELECT name AS {column} FROM {LOOKUPS[column]} ORDER BY name")[column])
+
+
+def render_filtered(tab):
+    # --- Sidebar Filters for Analytics ---
+    st.sidebar.header("🔍 Filters")
+
+    expiry_range = st.sidebar.date_input("📅 Expiry Between", value=())
+    min_quantity = st.sidebar.number_input("Min Quantity", min_value=0, value=None)
+    max_quantity = st.sidebar.number_input("Max Quantity", min_value=0, value=None)
+    filters = Filters(
+        locations=st.sidebar.multiselect("🌆 City", filter_options("location")),
+        food_types=st.sidebar.multiselect("🥗 Food Type", filter_options("food_type")),
+        meal_types=st.sidebar.multiselect("🍛 Meal Type", filter_options("meal_type")),
+        provider_types=st.sidebar.multiselect("🏢 Provider Type", filter_options("provider_type")),
+        expiry_from=expiry_range[0] if len(expiry_range) > 0 else None,
+        expiry_to=expiry_range[1] if len(expiry_range) > 1 else None,
+        min_quantity=min_quantity,
+        max_quantity=max_quantity,
+    )
+
+    # Keyset cursors of the pages seen so far; reset whenever the filters change
+    if st.session_state.get("filtered_filters") != filters:
+        st.session_state.filtered_filters = filters
+        st.session_state.filtered_pages = [None]
+    pages = st.session_state.filtered_pages
+
+    sql, params = build_query(filters, after=pages[-1])
+    df = cached_read_sql(sql, params, name="filtered_available_food")
+    st.dataframe(df, use_container_width=True)
+
+    cursor = next_cursor(df)
+    prev_col, next_col, page_col = st.columns([1, 1, 6])
+    prev_col.button("◀ Previous", disabled=len(pages) == 1, on_click=pages.pop)
+    next_col.button("Next ▶", disabled=cursor is None, on_click=pages.append, args=(cursor,))
+    page_col.caption(f"Page {len(pages)}")
+
+
+def render_dashboard(tab):
+    df = run_query(tab.query)
+    snapshot_caption(tab)
+    st.metric(label="Available Items", value=df['available_count'][0])
+    st.metric(label="Available Quantity", value=df['available_quantity'][0])
+    st.metric(label="Expired Items", value=df['expired_count'][0])
+    st.metric(label="Expired Quantity", value=df['expired_quantity'][0])
+    st.metric(label="Claimed Items", value=df['claimed_count'][0])
+    st.metric(label="Claimed Quantity", value=df['claimed_quantity'][0])
+
+
+def render_at_risk(tab):
+    limit = st.selectbox("Listings", [50, 200, 1000], index=1)
+    try:
+        model, df = at_risk(limit)
+    except ValueError as e:
+        st.info(str(e))
+        return
+    auc = "n/a" if model["holdout_auc"] is None else f"{model['holdout_auc']:.2f}"
+    st.caption(f"Chance that each available listing expires unclaimed. Model trained {model['trained_at']} "
+               f"on {model['listings']:,} claimed or expired listings (holdout AUC {auc}).")
+    st.dataframe(df, use_container_width=True, hide_index=True)
+    if st.button("Retrain model"):
+        retrain_forecast_model()
+        st.rerun()
+
+
+# --- Report registry ---
+TABS = [
+    Tab("Available Food", "🥗 Currently Available Food Items", "available_food", render=render_grid),
+    Tab("Claimed Food", "📦 Claimed Food and Receiver Details", "claimed_food", render=render_grid),
+    Tab("Expired Food", "⏳ Expired Food Items", "expired_food", render=render_grid),
+    Tab("Available by City", "🏙 Available Food by City", "available_by_city",
+        chart=("bar", "location", "total_quantity")),
+    Tab("Available by Provider Type", "🏢 Available Food by Provider Type", "available_by_provider_type",
+        chart=("bar", "provider_type", "total_quantity")),
+    Tab("Near Expiry (24h)", "⚠ Near Expiry Food Items (Next 24 Hours)", "near_expiry"),
+    Tab("At-Risk Food", "🚨 Available Food Most Likely to Expire Unclaimed", render=render_at_risk),
+    Tab("Top Providers", "🏆 Top Providers by Quantity Donated", "top_providers",
+        chart=("bar", "provider_name", "total_quantity")),
+    Tab("Top Receivers", "🤝 Top Receivers by Quantity Claimed", "top_receivers",
+        chart=("bar", "receiver_name", "total_claimed")),
+    Tab("Wastage by Location & Type", "♻ Wastage by Location and Food Type", "wastage_by_location_type"),
+    Tab("Claimed vs Expired Summary", "📊 Claimed vs Expired Summary", "claimed_vs_expired",
+        chart=("bar", "status", "total_quantity")),
+    Tab("Monthly Donations Trend", "📅 Monthly Food Donations Trend", "monthly_donations",
+        chart=("line", "month", "quantity_listed")),
+    Tab("Monthly Claims Trend", "📅 Monthly Claims Trend", "monthly_claims",
+        chart=("line", "month", "quantity_claimed")),
+    Tab("Filtered Available Food", "🔍 Filtered Available Food", render=render_filtered),
+    Tab("Provider Contacts", "☎ Provider Contact List", "provider_contacts_for_available"),
+    Tab("Dashboard Summary", "📊 Dashboard Summary", "dashboard_summary", render=render_dashboard),
+]
+
+
+def render():
+    titles = [tab.title for tab in TABS]
+    selected = st.radio("Report", titles, horizontal=True, label_visibility="collapsed")
+    tab = TABS[titles.index(selected)]
+    st.subheader(tab.heading)
+    (tab.render or render_query_tab)(tab)
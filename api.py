@@ -0,0 +1,418 @@
+# HTTP API for mobile clients
+#
+# An asyncio service (Starlette on uvicorn, both installed with Streamlit) over
+# the same database as the app:
+#
+#     GET  /reports                     names of the queries_dict reports
+#     GET  /reports/{name}?param=...    rows of a report, streamed as a JSON array
+#     GET  /listings?q=&available=1&after=&limit=50
+#                                       a page of listings: a full-text search
+#                                       (search.py) when q is given, newest first
+#                                       otherwise; "next" is the cursor for after
+#     POST /listings                    create a listing from the upload columns
+#                                       (bulk.UPLOAD_COLUMNS), checked like an upload
+#     POST /claims                      {food_id, receiver_id, quantity}, see claims.reserve
+#
+# SQLite calls block, so reads run on a thread executor with one worker per
+# read connection of the pool (pool.py), and a semaphore admits one request per
+# connection. Writes go to the pool's WriteQueue and are awaited through their
+# futures, so concurrent creates and claims share group commits the way the
+# app's sessions do.
+#
+# Like the Streamlit app, the service runs the expiry sweep (expiry_sweep.py) on
+# a background thread for as long as it is up, so listings served to mobile
+# clients expire on time even when nobody has the app open.
+#
+# GET responses carry an ETag built from the request URL, the data versions
+# (data_version.py) of the tables they read and, for reports relative to 'now'
+# such as near_expiry, the date. If-None-Match with the current tag gets a 304
+# without running the query. The versions are read before the query, so a tag
+# never claims to be newer than the body it came with. The tag is also the key
+# of an in-process cache of encoded bodies, the API's version of
+# db.cached_read_sql: a body is only recomputed after a write to a table it
+# reads (or the next day), and concurrent requests for a missing one wait for
+# a single query.
+#
+#     python -m api [--db local_food_wastage.db] [--host 127.0.0.1] [--port 8000] [--readers 4]
+#                   [--sweep-interval 900]
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+import claims
+import data_version
+import search
+from expiry_sweep import SWEEP_INTERVAL, ExpiryScheduler
+from pool import DB_PATH, READ_POOL_SIZE, ConnectionPool
+from queries_dict import queries
+from query_stats import QueryStats
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+STREAM_CHUNK = 1000  # report rows fetched and encoded at a time
+CACHE_BYTES = int(os.environ.get("API_CACHE_BYTES", 64 * 1024 * 1024))
+CACHE_ENTRY_BYTES = 1024 * 1024  # bigger bodies are streamed from the database every time
+LISTING_TABLES = ["Food_Listings", "Providers"]
+
+NEWEST_SQL = """
+    SELECT f.food_id, f.food_name, f.quantity, f.expiry, f.location,
+           f.food_type, f.meal_type, p.name AS provider_name, p.contact, f.status
+    FROM Food_Listings f
+    LEFT JOIN Providers p ON p.provider_id = f.provider_id
+    WHERE 1
+"""
+
+
+# --- Database access from the event loop ---
+class Database:
+    def __init__(self, path=DB_PATH, readers=READ_POOL_SIZE):
+        self.pool = ConnectionPool(path, readers)
+        self.stats = QueryStats()
+        self._executor = ThreadPoolExecutor(readers, thread_name_prefix="api-read")
+        self._slots = asyncio.Semaphore(readers)
+
+    def _run(self, fn, *args):
+        return asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _with_reader(self, fn, *args):
+        with self.pool.reader() as conn:
+            return fn(conn, *args)
+
+    async def read(self, fn, *args):
+        """Run fn(conn, *args) on the executor with a read connection."""
+        async with self._slots:
+            return await self._run(self._with_reader, fn, *args)
+
+    async def write(self, fn, *args):
+        """Run fn(conn, *args) in the next group commit."""
+        return await asyncio.wrap_future(self.pool.writes.submit(fn, *args))
+
+    async def stream(self, name, sql, params, chunk_size=STREAM_CHUNK):
+        """Yield the column names of sql, then its rows chunk by chunk.
+
+        One read connection is held until the generator is closed; errors in
+        the statement itself come out of the first step.
+        """
+        async with self._slots:
+            cursor = _Cursor(self.pool, self.stats, name, sql, params)
+            try:
+                yield await self._run(cursor.open)
+                while rows := await self._run(cursor.fetch, chunk_size):
+                    yield rows
+            finally:
+                # Also on a client disconnect, after any fetch still running
+                self._executor.submit(cursor.close)
+
+    def close(self):
+        self._executor.shutdown()
+        self.pool.close()
+
+
+class _Cursor:
+    """A streamed query on a checked-out read connection, closed exactly once."""
+
+    def __init__(self, pool, stats, name, sql, params):
+        self.pool, self.stats, self.name, self.sql, self.params = pool, stats, name, sql, params
+        self._lock = threading.Lock()
+        self._conn = self._cursor = None
+        self.rows = 0
+
+    def open(self):
+        with self._lock:
+            self.start = time.perf_counter()
+            self._conn = self.pool.checkout()
+            self._cursor = self._conn.execute(self.sql, self.params)
+            return [column[0] for column in self._cursor.description]
+
+    def fetch(self, size):
+        with self._lock:
+            rows = self._cursor.fetchmany(size) if self._cursor else []
+            self.rows += len(rows)
+            return rows
+
+    def close(self):
+        with self._lock:
+            if self._conn is None:
+                return
+            if self._cursor is not None:
+                self.stats.record(self._conn, self.name, self.sql, self.params,
+                                  (time.perf_counter() - self.start) * 1000, self.rows)
+                self._cursor.close()
+            self.pool.checkin(self._conn)
+            self._conn = self._cursor = None
+
+
+class BodyCache:
+    """LRU of encoded response bodies by ETag; only used from the event loop."""
+
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._bodies = OrderedDict()
+        self._filling = {}
+
+    async def claim(self, etag):
+        """Return (body, leader): the cached body, or None and whether to fill it.
+
+        A leader must call release(); the other callers that missed meanwhile
+        wait for it and then share what it cached.
+        """
+        filling = self._filling.get(etag)
+        if filling is not None:
+            await filling.wait()
+            return self._get(etag), False
+        body = self._get(etag)
+        if body is None:
+            self._filling[etag] = asyncio.Event()
+        return body, body is None
+
+    def release(self, etag, body=None):
+        if body is not None and len(body) <= CACHE_ENTRY_BYTES:
+            self._bodies[etag] = body
+            self.nbytes += len(body)
+            while self.nbytes > self.max_bytes:
+                self.nbytes -= len(self._bodies.popitem(last=False)[1])
+        self._filling.pop(etag).set()
+
+    def _get(self, etag):
+        body = self._bodies.get(etag)
+        if body is not None:
+            self._bodies.move_to_end(etag)
+        return body
+
+
+# --- Helpers ---
+def _etag(url, versions):
+    return 'W/"' + hashlib.sha1(repr((url, versions)).encode()).hexdigest()[:20] + '"'
+
+
+def _fresh(if_none_match, etag):
+    """True when the client's If-None-Match already names etag."""
+    tags = [tag.strip() for tag in (if_none_match or "").split(",")]
+    return etag in tags or "*" in tags
+
+
+def _not_modified(etag):
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+def _cached(body, etag):
+    return Response(body, media_type="application/json", headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+def _error(status, message, **extra):
+    return JSONResponse({"error": message, **extra}, status_code=status)
+
+
+async def _json_body(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        return None
+    return body if isinstance(body, dict) else None
+
+
+# --- Reports ---
+async def list_reports(request):
+    return JSONResponse(sorted(queries))
+
+
+async def report(request):
+    name = request.path_params["name"]
+    if name not in queries:
+        return _error(404, f"Unknown report {name!r}")
+    sql, db = queries[name], request.app.state.db
+
+    versions = await db.read(data_version.versions, data_version.tables_in(sql))
+    etag = _etag(str(request.url), versions + data_version.clock(sql))
+    if _fresh(request.headers.get("if-none-match"), etag):
+        return _not_modified(etag)
+    cache = request.app.state.cache
+    cached, leader = await cache.claim(etag)
+    if cached is not None:
+        return _cached(cached, etag)
+
+    rows = db.stream(f"api:report:{name}", sql, dict(request.query_params))
+    try:
+        columns = await anext(rows)
+    except sqlite3.Error as e:  # a missing or misnamed parameter
+        await rows.aclose()
+        if leader:
+            cache.release(etag)
+        return _error(400, str(e))
+
+    async def body():
+        # Also kept for the cache, until it outgrows a cache entry
+        parts, size, complete = [b"["], 1, False
+        try:
+            yield b"["
+            separator = ""
+            async for chunk in rows:
+                part = (separator + ",".join(json.dumps(dict(zip(columns, row))) for row in chunk)).encode()
+                separator = ","
+                yield part
+                if parts is not None:
+                    parts.append(part)
+                    size += len(part)
+                    parts = parts if size < CACHE_ENTRY_BYTES else None
+            yield b"]"
+            complete = True
+        finally:
+            await rows.aclose()
+            if leader:
+                cache.release(etag, b"".join(parts) + b"]" if complete and parts is not None else None)
+
+    return StreamingResponse(body(), media_type="application/json",
+                             headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+# --- Listings ---
+def _listings_page(conn, stats, terms, available_only, after, limit):
+    """Encoded page of listings; "next" is the cursor of the following page."""
+    start = time.perf_counter()
+    if terms:
+        ranked = conn.execute(*search.probe_query(terms)).fetchone() is None
+        sql, params = search.build_query(terms, ranked, available_only, after, limit)
+    else:
+        ranked = False
+        sql = NEWEST_SQL + ("    AND f.status = 'Available'\n" if available_only else "")
+        params = {"page_size": limit}
+        if after is not None:
+            sql += "    AND f.food_id < :after\n"
+            params["after"] = after
+        sql += "    ORDER BY f.food_id DESC\n    LIMIT :page_size"
+    cursor = conn.execute(sql, params)
+    columns = [column[0] for column in cursor.description]
+    items = [dict(zip(columns, row)) for row in cursor]
+    stats.record(conn, "api:search" if terms else "api:listings", sql, params,
+                 (time.perf_counter() - start) * 1000, len(items))
+
+    cursor = search.next_cursor([item["food_id"] for item in items], ranked, after, limit)
+    return json.dumps({"items": items, "next": cursor, "ranked": ranked}).encode()
+
+
+async def listings(request):
+    query = request.query_params
+    try:
+        after = int(query["after"]) if query.get("after") else None
+        limit = int(query.get("limit", PAGE_SIZE))
+    except ValueError:
+        return _error(400, "after and limit must be whole numbers")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        return _error(400, f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    available_only = query.get("available", "1") not in ("0", "false")
+
+    db, cache = request.app.state.db, request.app.state.cache
+    etag = _etag(str(request.url), await db.read(data_version.versions, LISTING_TABLES))
+    if _fresh(request.headers.get("if-none-match"), etag):
+        return _not_modified(etag)
+    body, leader = await cache.claim(etag)
+    if body is None:
+        try:
+            body = await db.read(_listings_page, db.stats, search.match_terms(query.get("q", "")),
+                                 available_only, after, limit)
+        finally:
+            if leader:
+                cache.release(etag, body)
+    return _cached(body, etag)
+
+
+def _validate_listing(conn, body):
+    # The same checks as a one-row upload
+    import bulk
+    import pandas as pd
+
+    columns = [*(["food_id"] if body.get("food_id") is not None else []), *bulk.UPLOAD_COLUMNS]
+    row = {column: None if body.get(column) in (None, "") else str(body[column]) for column in columns}
+    return bulk.validate(conn, pd.DataFrame([row], dtype=object))
+
+
+def _insert_listing(conn, rows):
+    import bulk
+
+    bulk.insert_listings(conn, rows)
+    return conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+
+
+async def create_listing(request):
+    body = await _json_body(request)
+    if body is None:
+        return _error(400, "Expected a JSON object")
+    db = request.app.state.db
+    rows, errors = await db.read(_validate_listing, body)
+    if not errors.empty:
+        return _error(422, "Invalid listing", details=errors["error"].iloc[0].split("; "))
+    food_id = await db.write(_insert_listing, rows)
+    return JSONResponse({"food_id": food_id}, status_code=201)
+
+
+# --- Claims ---
+async def create_claim(request):
+    body = await _json_body(request)
+    try:
+        food_id, receiver_id, quantity = (int(body[key]) for key in ("food_id", "receiver_id", "quantity"))
+    except (KeyError, TypeError, ValueError):
+        return _error(400, "Expected a JSON object with whole-number food_id, receiver_id and quantity")
+    try:
+        claim = await request.app.state.db.write(claims.reserve, food_id, receiver_id, quantity)
+    except claims.ClaimRejected as e:
+        return _error(409, str(e))
+    return JSONResponse(claim._asdict(), status_code=201)
+
+
+ROUTES = [
+    Route("/reports", list_reports),
+    Route("/reports/{name}", report),
+    Route("/listings", listings),
+    Route("/listings", create_listing, methods=["POST"]),
+    Route("/claims", create_claim, methods=["POST"]),
+]
+
+
+def create_app(path=DB_PATH, readers=READ_POOL_SIZE, sweep_interval=SWEEP_INTERVAL):
+    @asynccontextmanager
+    async def lifespan(app):
+        # The pool migrates the database, so it comes before the sweeper connects
+        app.state.db = Database(path, readers)
+        app.state.cache = BodyCache()
+        sweeper = ExpiryScheduler(path, sweep_interval)
+        sweeper.start()
+        try:
+            yield
+        finally:
+            sweeper.stop()
+            sweeper.join()
+            app.state.db.close()
+
+    return Starlette(routes=ROUTES, lifespan=lifespan)
+
+
+def main(argv=None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the listings, claims and reports over HTTP.")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database file")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--readers", type=int, default=READ_POOL_SIZE, help="read connections (and executor threads)")
+    parser.add_argument("--sweep-interval", type=int, default=SWEEP_INTERVAL, help="seconds between expiry sweeps")
+    args = parser.parse_args(argv)
+    uvicorn.run(create_app(args.db, args.readers, args.sweep_interval), host=args.host, port=args.port,
+                log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+# Benchmark harness for queries_dict and the CRUD paths in food.py
+#
+# Generates a synthetic database with the same columns and value distributions
+# as the shipped *_data.csv files, then times every named query, the filtered
+# and paginated listing queries, the expiry sweep and the Add / Update / Delete
+# statements. Results are written as JSON with p50/p95 latencies so runs can be
+# compared across commits.
+#
+# Usage:
+#     python -m benchmark [--rows 10k|1M|10M|<n>] [--repeat 20] [--out bench/results.json]
+
+import argparse
+import csv
+import json
+import math
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+import changelog
+import rollups
+import search
+from filters import Filters, build_query
+from grid import GRIDS, build_page_query
+from ingest import BULK_PRAGMAS, INDEXES, index_names, mark_claimed
+from migrations import ISO_FORMAT, migrate
+from queries_dict import queries
+
+BENCH_DIR = "bench"
+SIZES = {"10k": 10_000, "1M": 1_000_000, "10M": 10_000_000}
+BATCH = 50_000
+SEED = 42
+
+# Statements issued by the Add / Update / Delete forms in food.py
+ADD_SQL = """
+    INSERT INTO Food_Listings
+    (food_name, quantity, expiry, provider_id, location, food_type, status)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+UPDATE_SQL = """
+    UPDATE Food_Listings SET
+    food_name = ?, quantity = ?, expiry = ?, provider_id = ?, location = ?, food_type = ?, status = ?
+    WHERE food_id = ?
+"""
+DELETE_SQL = "DELETE FROM Food_Listings WHERE food_id = ?"
+# A listing's UPDATE_SQL parameters, to put it back after the timed update
+UPDATE_PARAMS_SQL = """
+    SELECT food_name, quantity, expiry, provider_id, location, food_type, status, food_id
+    FROM Food_Listings WHERE food_id >= ? ORDER BY food_id LIMIT 1
+"""
+
+
+# --- Synthetic data ---
+class Distributions:
+    """Empirical value frequencies taken from the shipped CSVs."""
+
+    def __init__(self, data_dir="."):
+        def read(name):
+            with open(os.path.join(data_dir, name), newline="") as f:
+                return list(csv.DictReader(f))
+
+        food = read("food_listings_data.csv")
+        providers = read("providers_data.csv")
+        receivers = read("receivers_data.csv")
+        claims = read("claims_data.csv")
+
+        self.food_name = Counter(r["Food_Name"] for r in food)
+        self.quantity = Counter(int(r["Quantity"]) for r in food)
+        self.provider_type = Counter(r["Provider_Type"] for r in food)
+        self.food_type = Counter(r["Food_Type"] for r in food)
+        self.meal_type = Counter(r["Meal_Type"] for r in food)
+        self.provider_kind = Counter(r["Type"] for r in providers)
+        self.receiver_kind = Counter(r["Type"] for r in receivers)
+        self.claim_status = Counter(r["Status"] for r in claims)
+        # Listing locations and provider / receiver cities share one pool
+        self.cities = sorted({r["Location"] for r in food} | {r["City"] for r in providers}
+                             | {r["City"] for r in receivers})
+
+        expiry = [datetime.strptime(r["Expiry_Date"], "%m/%d/%Y") for r in food]
+        claimed = [datetime.strptime(r["Timestamp"], "%m/%d/%Y %H:%M") for r in claims]
+        # Spread of expiry dates, and how long before the earliest expiry claims arrive
+        self.expiry_days = max(expiry).toordinal() - min(expiry).toordinal()
+        self.claim_lead = (min(expiry) - min(claimed), max(claimed) - min(claimed))
+
+
+def _sampler(rng, counter):
+    values, weights = zip(*counter.items())
+
+    def sample(k):
+        return rng.choices(values, weights, k=k)
+    return sample
+
+
+def generate(conn, listings, dist, seed=SEED, log=print):
+    """Fill an empty, migrated database with `listings` synthetic listings."""
+    rng = random.Random(seed)
+    n_providers = max(1000, listings // 100)
+    n_receivers = max(1000, listings // 100)
+    n_claims = listings  # the shipped data has one claim per listing
+
+    food_name, quantity = _sampler(rng, dist.food_name), _sampler(rng, dist.quantity)
+    provider_type, food_type = _sampler(rng, dist.provider_type), _sampler(rng, dist.food_type)
+    meal_type, claim_status = _sampler(rng, dist.meal_type), _sampler(rng, dist.claim_status)
+    provider_kind, receiver_kind = _sampler(rng, dist.provider_kind), _sampler(rng, dist.receiver_kind)
+
+    # Centre the expiry window on today so the sweep and near-expiry reports have work
+    first_expiry = datetime.combine(date.today(), datetime.min.time()) - timedelta(days=dist.expiry_days // 2)
+    lead, spread = dist.claim_lead
+
+    def batches(total):
+        for start in range(0, total, BATCH):
+            yield start, min(BATCH, total - start)
+
+    for start, k in batches(n_providers):
+        conn.executemany(
+            "INSERT INTO Providers (provider_id, name, type, address, city, contact) VALUES (?, ?, ?, ?, ?, ?)",
+            ((start + i + 1, f"Provider {start + i + 1}", kind, f"{rng.randint(1, 99999)} Main Street",
+              rng.choice(dist.cities), f"+1-555-{rng.randint(0, 9999999):07d}")
+             for i, kind in enumerate(provider_kind(k))),
+        )
+    for start, k in batches(n_receivers):
+        conn.executemany(
+            "INSERT INTO Receivers (receiver_id, name, type, city, contact) VALUES (?, ?, ?, ?, ?)",
+            ((start + i + 1, f"Receiver {start + i + 1}", kind, rng.choice(dist.cities),
+              f"+1-555-{rng.randint(0, 9999999):07d}")
+             for i, kind in enumerate(receiver_kind(k))),
+        )
+    for start, k in batches(listings):
+        names, qtys, ptypes = food_name(k), quantity(k), provider_type(k)
+        ftypes, mtypes = food_type(k), meal_type(k)
+        rows = []
+        for i in range(k):
+            expiry = first_expiry + timedelta(days=rng.randint(0, dist.expiry_days))
+            rows.append((start + i + 1, names[i], qtys[i], rng.randint(1, n_providers), ptypes[i],
+                         rng.choice(dist.cities), ftypes[i], mtypes[i], expiry.strftime("%Y-%m-%d %H:%M:%S"),
+                         "Available"))
+        conn.executemany("""
+            INSERT INTO Food_Listings (food_id, food_name, quantity, provider_id, provider_type,
+                                       location, food_type, meal_type, expiry, status)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+        log(f"  listings {start + k:,}/{listings:,}")
+    for start, k in batches(n_claims):
+        statuses = claim_status(k)
+        rows = []
+        for i in range(k):
+            claimed = first_expiry - lead + timedelta(seconds=rng.randint(0, int(spread.total_seconds())))
+            rows.append((start + i + 1, rng.randint(1, listings), rng.randint(1, n_receivers), statuses[i],
+                         claimed.strftime("%Y-%m-%d %H:%M:00")))
+        conn.executemany("""
+            INSERT INTO Claims (claim_id, food_id, receiver_id, status, claim_time)
+            VALUES (?, ?, ?, ?, ?)
+        """, rows)
+
+
+def build_database(path, listings, data_dir=".", log=print):
+    """Create a synthetic benchmark database with the shipped schema."""
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    for pragma in BULK_PRAGMAS:
+        conn.execute(pragma)
+
+    t0 = time.perf_counter()
+    conn.execute("BEGIN")
+    # Same order as a full ingest: load bare tables, then build indexes and rollups once
+    for name in index_names():
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    rollups.drop_triggers(conn)
+    search.drop_triggers(conn)
+    changelog.drop_triggers(conn)
+    generate(conn, listings, Distributions(data_dir), log=log)
+    for sql in INDEXES:
+        conn.execute(sql)
+    mark_claimed(conn)
+    # Expire the older half of the history up front; the last couple of days
+    # are left for the timed expiry sweep
+    conn.execute("""
+        UPDATE Food_Listings SET status = 'Expired'
+        WHERE status = 'Available' AND expiry < date('now', '-2 days')
+    """)
+    rollups.rebuild(conn)
+    rollups.create_triggers(conn)
+    search.rebuild(conn)
+    search.create_triggers(conn)
+    changelog.reload(conn, *changelog.KEYS)
+    changelog.create_triggers(conn)
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+    log(f"Generated {path} with {listings:,} listings in {time.perf_counter() - t0:.1f}s")
+
+
+# --- Timing ---
+def percentile(samples, pct):
+    # Nearest-rank percentile
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def summarize(samples, rows):
+    return {
+        "runs": len(samples),
+        "rows": rows,
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 95) * 1000, 3),
+        "mean_ms": round(sum(samples) / len(samples) * 1000, 3),
+    }
+
+
+def time_query(conn, sql, params=(), repeat=20):
+    samples, rows = [], 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        rows = len(conn.execute(sql, params).fetchall())
+        samples.append(time.perf_counter() - t0)
+    return summarize(samples, rows)
+
+
+def time_write(conn, run, undo=None, repeat=20):
+    """Time run(i) plus its commit; undo(i) restores the data untimed."""
+    samples, rows = [], 0
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        rows = run(i)
+        conn.commit()
+        samples.append(time.perf_counter() - t0)
+        if undo:
+            undo(i)
+            conn.commit()
+    return summarize(samples, rows)
+
+
+def run_benchmarks(conn, repeat=20, log=print):
+    rng = random.Random(SEED)
+    results = {}
+
+    def record(name, result):
+        results[name] = result
+        log(f"{name:40s} p50 {result['p50_ms']:9.3f} ms   p95 {result['p95_ms']:9.3f} ms   rows {result['rows']}")
+
+    params = {"city": "All", "food_type": "All", "meal_type": "All"}
+    for name, sql in queries.items():
+        record(f"query:{name}", time_query(conn, sql, params if ":" in sql else (), repeat))
+
+    city = conn.execute("SELECT location FROM Food_Listings WHERE status = 'Available' LIMIT 1").fetchone()
+    for label, filters in [("filtered:all", Filters()),
+                           ("filtered:city", Filters(locations=[city[0]] if city else [])),
+                           ("filtered:food_meal", Filters(food_types=["Vegan"], meal_types=["Dinner", "Lunch"]))]:
+        sql, p = build_query(filters)
+        record(label, time_query(conn, sql, p, repeat))
+
+    for name, grid in GRIDS.items():
+        sort = list(grid.sorts)[-1]
+        sql, p = build_page_query(grid, sort, descending=True)
+        record(f"grid:{name}", time_query(conn, sql, p, repeat))
+        record(f"grid:{name}:count", time_query(conn, grid.count, repeat=repeat))
+
+    # Expiry sweep, rolled back each time so every run does the same work
+    from expiry_sweep import EXPIRE_SQL
+    samples, rows = [], 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        rows = conn.execute(EXPIRE_SQL).rowcount
+        samples.append(time.perf_counter() - t0)
+        conn.rollback()
+    record("sweep:expire", summarize(samples, rows))
+
+    # CRUD statements from food.py, each committed like the forms do. Every
+    # write is undone untimed, and the change log entries they added are
+    # dropped, so repeated runs measure the same database.
+    max_id = conn.execute("SELECT MAX(food_id) FROM Food_Listings").fetchone()[0]
+    logged = changelog.latest_seq(conn)
+    # The forms store the picked date at midnight in ISO_FORMAT
+    today = date.today().strftime(ISO_FORMAT)
+    added = []
+
+    def add(i):
+        cur = conn.execute(ADD_SQL, ("Bread", 10, today, 1, "Benchmark City", "Vegan", "Available"))
+        added.append(cur.lastrowid)
+        return cur.rowcount
+
+    record("crud:insert", time_write(conn, add, lambda i: conn.execute(DELETE_SQL, (added[i],)), repeat))
+
+    originals = [conn.execute(UPDATE_PARAMS_SQL, (rng.randint(1, max_id),)).fetchone() for _ in range(repeat)]
+
+    def update(i):
+        return conn.execute(UPDATE_SQL, ("Bread", 10, today, 1, "Benchmark City", "Vegan", "Available",
+                                         originals[i][-1])).rowcount
+
+    record("crud:update", time_write(conn, update, lambda i: conn.execute(UPDATE_SQL, originals[i]), repeat))
+
+    victims = []
+    for _ in range(repeat):
+        victims.append(conn.execute(ADD_SQL, ("Bread", 10, today, 1, "Benchmark City", "Vegan",
+                                              "Available")).lastrowid)
+    conn.commit()
+    record("crud:delete", time_write(conn, lambda i: conn.execute(DELETE_SQL, (victims[i],)).rowcount,
+                                     repeat=repeat))
+
+    conn.execute("DELETE FROM Changelog WHERE seq > ?", (logged,))
+    conn.commit()
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_rows(value):
+    return SIZES.get(value) or int(value.replace("_", ""))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the queries and CRUD paths on synthetic data.")
+    parser.add_argument("--rows", default="10k", help="listings to generate: 10k, 1M, 10M or a number")
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per statement")
+    parser.add_argument("--db", help="benchmark database (default bench/bench_<rows>.db)")
+    parser.add_argument("--regenerate", action="store_true", help="rebuild the database even if it exists")
+    parser.add_argument("--out", help="JSON results file (default bench/results_<rows>.json)")
+    args = parser.parse_args(argv)
+
+    listings = parse_rows(args.rows)
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    db_path = args.db or os.path.join(BENCH_DIR, f"bench_{args.rows}.db")
+    out_path = args.out or os.path.join(BENCH_DIR, f"results_{args.rows}.json")
+
+    if args.regenerate or not os.path.exists(db_path):
+        build_database(db_path, listings)
+
+    conn = sqlite3.connect(db_path)
+    migrate(conn)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    results = run_benchmarks(conn, args.repeat)
+    conn.close()
+
+    report = {
+        "meta": {
+            "listings": listings,
+            "repeat": args.repeat,
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "sqlite": sqlite3.sqlite_version,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+    with open(out_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {out_path}")
+
+
+if __name__ == "__main__":
+    main()
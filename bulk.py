@@ -0,0 +1,207 @@
+# Bulk upload and streaming export of food listings
+#
+# Uploads are CSV or Excel files with the columns of food_listings_data.csv
+# (Food_ID is optional; the database assigns one when it is left out).
+# validate() checks the whole file with vectorized pandas operations and one
+# json_each lookup per referenced table, and returns the rows to insert along
+# with a per-row error report; insert_listings() writes the valid rows with a
+# single executemany inside the caller's transaction.
+#
+# export() streams a query into a CSV or Parquet file CHUNK_SIZE rows at a
+# time, so an export never holds more than one chunk as a DataFrame. The app
+# only offers downloads up to crud.EXPORT_MAX_BYTES; bigger ones go to a file:
+#
+#     python -m bulk "Food Listings" listings.parquet [--db local_food_wastage.db] [--format parquet]
+
+import argparse
+import json
+import os
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+import data_version
+from ingest import EXPIRY_FORMAT, ISO_FORMAT, chunk_rows, clean_columns, insert_sql
+from queries_dict import queries
+
+CHUNK_SIZE = 10_000
+
+UPLOAD_COLUMNS = ["food_name", "quantity", "expiry_date", "provider_id", "provider_type",
+                  "location", "food_type", "meal_type"]
+# expiry_date is only read, to parse into expiry
+INSERT_COLUMNS = ["food_id", "food_name", "quantity", "provider_id", "provider_type",
+                  "location", "food_type", "meal_type", "expiry", "status"]
+
+# label -> (sql, params); reports that take parameters are left out
+EXPORTS = {
+    "Food Listings": ("SELECT * FROM Food_Listings ORDER BY food_id", None),
+    "Claims": ("SELECT * FROM Claims ORDER BY claim_id", None),
+    "Providers": ("SELECT * FROM Providers ORDER BY provider_id", None),
+    "Receivers": ("SELECT * FROM Receivers ORDER BY receiver_id", None),
+    **{f"Report: {name}": (sql, None) for name, sql in queries.items() if ":" not in sql},
+}
+
+
+# --- Upload ---
+def read_upload(data, filename):
+    """Read an uploaded CSV or Excel file as strings, with ingest's column names."""
+    if filename.lower().endswith((".xlsx", ".xls")):
+        try:
+            df = pd.read_excel(data, dtype=str)
+        except ImportError as e:
+            raise ValueError(f"Reading Excel files needs an Excel engine for pandas ({e}).") from e
+    else:
+        df = pd.read_csv(data, dtype=str, keep_default_na=False, na_values=[""])
+    return clean_columns(df)
+
+
+def _existing(conn, table, column, values):
+    ids = sorted({int(v) for v in values.dropna() if float(v).is_integer()})
+    rows = conn.execute(f"SELECT {column} FROM {table} WHERE {column} IN (SELECT value FROM json_each(?))",
+                        (json.dumps(ids),))
+    return {row[0] for row in rows}
+
+
+def validate(conn, df):
+    """Return (rows ready for insert_listings, errors with line and error columns).
+
+    Raises ValueError when required columns are missing.
+    """
+    missing = [c for c in UPLOAD_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+
+    quantity = pd.to_numeric(df["quantity"], errors="coerce")
+    provider_id = pd.to_numeric(df["provider_id"], errors="coerce")
+    given_id = df["food_id"].notna() if "food_id" in df else pd.Series(False, index=df.index)
+    food_id = pd.to_numeric(df["food_id"], errors="coerce") if "food_id" in df else pd.Series(np.nan, index=df.index)
+    # The shipped format first, then ISO dates
+    expiry = pd.to_datetime(df["expiry_date"], format=EXPIRY_FORMAT, errors="coerce")
+    expiry = expiry.fillna(pd.to_datetime(df["expiry_date"], format="%Y-%m-%d", errors="coerce"))
+
+    checks = [
+        (df["food_name"].isna(), "food_name is empty"),
+        (~(quantity > 0) | (quantity % 1 != 0), "quantity must be a whole number above 0"),
+        (expiry.isna(), "expiry_date must be M/D/YYYY or YYYY-MM-DD"),
+        (~provider_id.isin(_existing(conn, "Providers", "provider_id", provider_id)), "provider_id not found"),
+        (given_id & (food_id.isna() | (food_id % 1 != 0)), "food_id must be a whole number"),
+        (food_id.notna() & food_id.duplicated(keep=False), "food_id repeated in the file"),
+        (food_id.isin(_existing(conn, "Food_Listings", "food_id", food_id)), "food_id already exists"),
+    ]
+    errors = pd.Series("", index=df.index)
+    for failed, message in checks:
+        errors = errors.where(~failed, errors + message + "; ")
+    bad = errors != ""
+
+    rows = df.loc[~bad, UPLOAD_COLUMNS].copy()
+    rows["food_id"] = food_id[~bad].astype("Int64")
+    rows["quantity"] = quantity[~bad].astype("Int64")
+    rows["provider_id"] = provider_id[~bad].astype("Int64")
+    rows["expiry"] = expiry[~bad].dt.strftime(ISO_FORMAT)
+    rows["status"] = np.where(expiry[~bad].dt.date < date.today(), "Expired", "Available")
+
+    report = pd.DataFrame({"line": df.index[bad] + 2, "error": errors[bad].str.rstrip("; ")})
+    return rows[INSERT_COLUMNS], report
+
+
+def insert_listings(conn, rows):
+    """Insert validated rows in the caller's transaction; returns the count."""
+    conn.executemany(insert_sql("Food_Listings", INSERT_COLUMNS), chunk_rows(rows, INSERT_COLUMNS))
+    if len(rows):
+        data_version.bump(conn, "Food_Listings")
+    return len(rows)
+
+
+# --- Export ---
+class ExportTooLarge(ValueError):
+    """An export grew past max_bytes; it stops at the first chunk that does."""
+
+    def __init__(self, max_bytes, rows):
+        super().__init__(f"The export passed {max_bytes / 2**20:,.0f} MB after {rows:,} rows.")
+        self.max_bytes = max_bytes
+        self.rows = rows
+
+
+def _check_size(out, max_bytes, rows):
+    if max_bytes is not None and out.tell() > max_bytes:
+        raise ExportTooLarge(max_bytes, rows)
+
+
+def _write_csv(chunks, out, max_bytes=None):
+    rows = 0
+    for i, df in enumerate(chunks):
+        out.write(df.to_csv(header=i == 0, index=False).encode("utf-8"))
+        rows += len(df)
+        _check_size(out, max_bytes, rows)
+    return rows
+
+
+def _write_parquet(chunks, out, max_bytes=None):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ValueError("Parquet export needs pyarrow.") from e
+
+    writer, rows = None, 0
+    try:
+        for df in chunks:
+            if writer is None:
+                # Chunk dtypes drift (an all-NULL column, ints with a NULL), so the
+                # first chunk fixes the file schema and later chunks are cast to it
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                schema = pa.schema([field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                                    for field in table.schema])
+                writer = pq.ParquetWriter(out, schema)
+            # Each chunk is written out as its own row group
+            writer.write_table(pa.Table.from_pandas(df, schema=writer.schema, preserve_index=False))
+            rows += len(df)
+            _check_size(out, max_bytes, rows)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def export(conn, sql, params, fmt, out, chunk_size=CHUNK_SIZE, max_bytes=None):
+    """Write the result of sql to the binary file out as "csv" or "parquet"; returns the row count.
+
+    With max_bytes, raises ExportTooLarge as soon as out grows past it, so at
+    most one chunk is written beyond the limit.
+    """
+    chunks = pd.read_sql(sql, conn, params=params, chunksize=chunk_size)
+    write = _write_parquet if fmt == "parquet" else _write_csv
+    try:
+        return write(chunks, out, max_bytes)
+    finally:
+        # Finalizes the query when the export stops early, so the connection
+        # doesn't go back to its pool holding an open read snapshot
+        chunks.close()
+
+def main(argv=None):
+    from expiry_sweep import DB_PATH, connect
+
+    parser = argparse.ArgumentParser(description="Export a table or report to a CSV or Parquet file.")
+    parser.add_argument("source", choices=list(EXPORTS), help="table or report, as named on the Export page")
+    parser.add_argument("out", help="file to write")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database file")
+    parser.add_argument("--format", choices=["csv", "parquet"],
+                        help="file format (default from the out extension, else csv)")
+    args = parser.parse_args(argv)
+    fmt = args.format or ("parquet" if args.out.endswith(".parquet") else "csv")
+
+    conn = connect(args.db)
+    sql, params = EXPORTS[args.source]
+    t0 = time.perf_counter()
+    try:
+        with open(args.out, "wb") as out:
+            rows = export(conn, sql, params, fmt, out)
+    finally:
+        conn.close()
+    print(f"{rows:,} rows, {os.path.getsize(args.out):,} bytes ({time.perf_counter() - t0:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+# Change log of Food_Listings and Claims
+#
+# Triggers append one row to Changelog per inserted, updated or deleted row of
+# the two tables, under an AUTOINCREMENT sequence number, so a consumer that
+# remembers the last seq it processed can ask for what changed since and
+# update in time proportional to the changes rather than to the tables. The
+# log holds keys only: a consumer reads the current row for an insert or
+# update and drops its copy for a delete. changes_since() nets the entries of
+# a row down to its latest one.
+#
+# Bulk loads drop the triggers like the rollup and search ones, and log one
+# 'reload' entry per table instead (row_id NULL): whoever sees it resyncs that
+# table from scratch.
+#
+# Consumers register their cursor in Changelog_Consumers. compact() deletes the
+# entries every registered consumer has seen, and any older than
+# RETENTION_DAYS even if one hasn't; only ever a prefix of the log, so the
+# entries left are contiguous and a cursor from before them is detectably
+# stale (CursorExpired: resync, then carry on from latest_seq()).
+#
+# The tables are created by migrations.py (v12); TRIGGERS must match the
+# latest migration step that creates them.
+#
+#     python -m changelog [--db local_food_wastage.db] [--since 0] [--table Claims] [--compact]
+
+import argparse
+import json
+import os
+from collections import namedtuple
+
+RETENTION_DAYS = int(os.environ.get("CHANGELOG_RETENTION_DAYS", 7))
+
+# Logged table -> its key
+KEYS = {
+    "Food_Listings": "food_id",
+    "Claims": "claim_id",
+}
+
+Change = namedtuple("Change", "seq table row_id op")
+
+
+class CursorExpired(Exception):
+    """The entries after a cursor were compacted away; the consumer must resync."""
+
+
+# --- Trigger bodies ---
+def _log(table, row_id, op):
+    return f"INSERT INTO Changelog (table_name, row_id, op) VALUES ('{table}', {row_id}, '{op}');"
+
+
+def _triggers(table, key, short):
+    return {
+        f"trg_changelog_{short}_insert": f"""
+            AFTER INSERT ON {table} BEGIN
+                {_log(table, f"NEW.{key}", "insert")}
+            END
+        """,
+        f"trg_changelog_{short}_delete": f"""
+            AFTER DELETE ON {table} BEGIN
+                {_log(table, f"OLD.{key}", "delete")}
+            END
+        """,
+        # A new key is a delete of the old one as far as consumers are concerned
+        f"trg_changelog_{short}_update": f"""
+            AFTER UPDATE ON {table} BEGIN
+                INSERT INTO Changelog (table_name, row_id, op)
+                SELECT '{table}', OLD.{key}, 'delete' WHERE NEW.{key} IS NOT OLD.{key};
+                {_log(table, f"NEW.{key}", "update")}
+            END
+        """,
+    }
+
+
+TRIGGERS = {
+    **_triggers("Food_Listings", "food_id", "food"),
+    **_triggers("Claims", "claim_id", "claim"),
+}
+
+
+def create_triggers(conn):
+    for name, body in TRIGGERS.items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+
+def drop_triggers(conn):
+    # Bulk loads drop the triggers and call reload() for the tables they replaced
+    for name in TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def reload(conn, *tables):
+    """Log that `tables` were replaced wholesale."""
+    conn.executemany("INSERT INTO Changelog (table_name, row_id, op) VALUES (?, NULL, 'reload')",
+                     [(table,) for table in tables if table in KEYS])
+
+
+# --- Reading ---
+def latest_seq(conn):
+    """Sequence number of the last change ever logged (0 before the first)."""
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'Changelog'").fetchone()
+    return row[0] if row else 0
+
+
+def oldest_cursor(conn):
+    """Oldest cursor changes_since() can still serve."""
+    first = conn.execute("SELECT MIN(seq) FROM Changelog").fetchone()[0]
+    return latest_seq(conn) if first is None else first - 1
+
+
+def changes_since(conn, after, until=None, tables=None):
+    """Net changes with after < seq <= until (default: all), oldest first.
+
+    One Change per row, its latest op; read the current rows in the same
+    transaction to see them as of `until`. Raises CursorExpired when entries
+    after `after` are gone (or `after` is from another database).
+    """
+    last = latest_seq(conn)
+    if not oldest_cursor(conn) <= after <= last:
+        raise CursorExpired(f"Changes after {after} are no longer in the changelog "
+                            f"(it holds {oldest_cursor(conn)} to {last}).")
+    # A bare column next to MAX() comes from the row holding the maximum
+    sql = """
+        SELECT MAX(seq), table_name, row_id, op
+        FROM Changelog
+        WHERE seq > ? AND seq <= ?
+    """
+    params = [after, last if until is None else until]
+    if tables is not None:
+        sql += " AND table_name IN (SELECT value FROM json_each(?))"
+        params.append(json.dumps(list(tables)))
+    sql += " GROUP BY table_name, row_id ORDER BY 1"
+    return [Change(*row) for row in conn.execute(sql, params)]
+
+
+# --- Consumers ---
+def cursor(conn, name):
+    """Last seq consumer `name` processed, or None if it isn't registered."""
+    row = conn.execute("SELECT seq FROM Changelog_Consumers WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else None
+
+
+def advance(conn, name, seq):
+    """Record that consumer `name` has processed every change up to seq."""
+    conn.execute("""
+        INSERT INTO Changelog_Consumers (name, seq, updated_at) VALUES (?, ?, datetime('now'))
+        ON CONFLICT (name) DO UPDATE SET seq = excluded.seq, updated_at = excluded.updated_at
+    """, (name, seq))
+
+
+def unregister(conn, name):
+    conn.execute("DELETE FROM Changelog_Consumers WHERE name = ?", (name,))
+
+
+def compact(conn, retention_days=RETENTION_DAYS):
+    """Delete the entries no consumer needs any more; returns how many."""
+    through = conn.execute("SELECT MIN(seq) FROM Changelog_Consumers").fetchone()[0] or 0
+    # First entry still within retention; the walk from the oldest entry stops
+    # there, so it costs about as much as the delete
+    recent = conn.execute("""
+        SELECT seq FROM Changelog WHERE changed_at >= datetime('now', ?) ORDER BY seq LIMIT 1
+    """, (f"-{retention_days} days",)).fetchone()
+    through = max(through, recent[0] - 1 if recent else latest_seq(conn))
+    return conn.execute("DELETE FROM Changelog WHERE seq <= ?", (through,)).rowcount
+
+
+def main(argv=None):
+    # Imported here: the expiry sweep compacts the log
+    from expiry_sweep import DB_PATH, connect
+
+    parser = argparse.ArgumentParser(description="Show the changes logged since a cursor.")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database file")
+    parser.add_argument("--since", type=int, help="cursor to list the net changes after")
+    parser.add_argument("--table", action="append", choices=list(KEYS), help="only this table (repeatable)")
+    parser.add_argument("--compact", action="store_true", help="delete the entries no consumer needs first")
+    args = parser.parse_args(argv)
+
+    conn = connect(args.db)
+    if args.compact:
+        print(f"compacted {compact(conn):,} entries")
+        conn.commit()
+    print(f"changelog holds {oldest_cursor(conn)} to {latest_seq(conn)}")
+    for name, seq, updated_at in conn.execute("SELECT name, seq, updated_at FROM Changelog_Consumers ORDER BY 1"):
+        print(f"  consumer {name}: at {seq} (updated {updated_at})")
+    if args.since is not None:
+        for change in changes_since(conn, args.since, tables=args.table):
+            print(f"{change.seq:>10}  {change.op:7} {change.table} {'' if change.row_id is None else change.row_id}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
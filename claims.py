@@ -0,0 +1,191 @@
+# Atomic claims with partial quantities
+#
+# claim() reserves part of a listing with a single conditional
+# UPDATE ... RETURNING and inserts the Claims row in the same BEGIN IMMEDIATE
+# transaction. The UPDATE re-checks status, expiry and the remaining quantity
+# under the write lock, so two receivers can never be handed the same units; a
+# listing with nothing left becomes Claimed. Food_Listings.quantity stays the
+# amount listed, which the reports sum; Food_Listings.reserved is how much of
+# it the claims took, and Claims.quantity what each claim took.
+#
+# SQLITE_BUSY ("database is locked") can still surface once busy_timeout runs
+# out under heavy contention; the whole transaction is then retried with
+# exponential backoff.
+#
+# The stress test runs many claimers in separate processes against a copy of
+# the database and checks that no unit was allocated twice:
+#
+#     python -m claims --db /tmp/copy.db [--processes 32] [--claimers 400] [--listings 20]
+
+import argparse
+import multiprocessing
+import random
+import sqlite3
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import data_version
+from expiry_sweep import connect
+from write_queue import is_busy
+
+RETRIES = 6
+BACKOFF = 0.02  # seconds before the first retry; doubles each attempt
+
+Claim = namedtuple("Claim", ["claim_id", "food_id", "receiver_id", "quantity", "remaining", "status"])
+
+RESERVE_SQL = """
+    UPDATE Food_Listings
+    SET reserved = reserved + :quantity,
+        status = CASE WHEN quantity - reserved = :quantity THEN 'Claimed' ELSE status END
+    WHERE food_id = :food_id
+      AND status = 'Available'
+      AND expiry >= date('now')
+      AND quantity - reserved >= :quantity
+    RETURNING quantity - reserved, status
+"""
+
+INSERT_CLAIM_SQL = """
+    INSERT INTO Claims (food_id, receiver_id, status, quantity, claim_time)
+    VALUES (:food_id, :receiver_id, 'Pending', :quantity, :claim_time)
+    RETURNING claim_id
+"""
+
+
+class ClaimRejected(Exception):
+    """The claim can't be granted: unknown receiver, or not enough on offer."""
+
+
+def _rejection(conn, food_id, quantity):
+    row = conn.execute("SELECT status, quantity - reserved, expiry < date('now') FROM Food_Listings "
+                       "WHERE food_id = ?", (food_id,)).fetchone()
+    if row is None:
+        return f"Food ID {food_id} not found."
+    status, remaining, expired = row
+    if status != "Available":
+        return f"Food ID {food_id} is {status}."
+    if expired:
+        return f"Food ID {food_id} has expired."
+    return f"Only {remaining} left of food ID {food_id}, {quantity} requested."
+
+
+def reserve(conn, food_id, receiver_id, quantity):
+    """Reserve and record the claim inside the caller's write transaction.
+
+    The caller must already hold the write lock (BEGIN IMMEDIATE), as claim()
+    and the write queue do. Raises ClaimRejected when it can't be granted.
+    """
+    if quantity < 1:
+        raise ClaimRejected("Quantity must be at least 1.")
+    if conn.execute("SELECT 1 FROM Receivers WHERE receiver_id = ?", (receiver_id,)).fetchone() is None:
+        raise ClaimRejected(f"Receiver ID {receiver_id} not found.")
+    params = {"food_id": food_id, "receiver_id": receiver_id, "quantity": quantity,
+              "claim_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+    reserved = conn.execute(RESERVE_SQL, params).fetchone()
+    if reserved is None:
+        raise ClaimRejected(_rejection(conn, food_id, quantity))
+    claim_id = conn.execute(INSERT_CLAIM_SQL, params).fetchone()[0]
+    data_version.bump(conn, "Food_Listings", "Claims")
+    return Claim(claim_id, food_id, receiver_id, quantity, *reserved)
+
+
+def _claim_once(conn, food_id, receiver_id, quantity):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        result = reserve(conn, food_id, receiver_id, quantity)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return result
+
+
+def claim(conn, food_id, receiver_id, quantity, retries=RETRIES):
+    """Reserve `quantity` of a listing for a receiver and return the Claim.
+
+    Raises ClaimRejected when the claim can't be granted, and the last
+    sqlite3.OperationalError once `retries` busy retries are used up.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return _claim_once(conn, food_id, receiver_id, quantity)
+        except sqlite3.OperationalError as e:
+            if not is_busy(e) or attempt == retries:
+                raise
+            time.sleep(BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5))
+
+
+# --- Stress test ---
+_worker_conn = None
+
+
+def _claimer(args):
+    db_path, food_ids, receiver_ids, claims_each, seed = args
+    global _worker_conn
+    if _worker_conn is None:
+        _worker_conn = connect(db_path)
+    rng = random.Random(seed)
+    granted = rejected = 0
+    for _ in range(claims_each):
+        try:
+            claim(_worker_conn, rng.choice(food_ids), rng.choice(receiver_ids), rng.randint(1, 5))
+            granted += 1
+        except ClaimRejected:
+            rejected += 1
+    return granted, rejected
+
+
+def stress(db_path, processes=32, claimers=400, listings=20, quantity=50, claims_each=5, log=print):
+    """Run concurrent claimers against a few hot listings; returns the violations found."""
+    conn = connect(db_path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    receiver_ids = [row[0] for row in conn.execute("SELECT receiver_id FROM Receivers LIMIT 1000")]
+    food_ids = []
+    for i in range(listings):
+        cur = conn.execute("""
+            INSERT INTO Food_Listings (food_name, quantity, expiry, location, food_type, meal_type, status)
+            VALUES (?, ?, datetime('now', '+7 days'), 'Stress City', 'Vegetarian', 'Lunch', 'Available')
+        """, (f"Stress {i}", quantity))
+        food_ids.append(cur.lastrowid)
+    conn.commit()
+
+    t0 = time.perf_counter()
+    jobs = [(db_path, food_ids, receiver_ids, claims_each, seed) for seed in range(claimers)]
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.map(_claimer, jobs)
+    elapsed = time.perf_counter() - t0
+    granted = sum(g for g, _ in results)
+    rejected = sum(r for _, r in results)
+    log(f"{granted} granted, {rejected} rejected by {claimers} claimers in {processes} processes "
+        f"({elapsed:.2f} s, {(granted + rejected) / elapsed:.0f} claims/s)")
+
+    # Every unit is either still on offer or in exactly one claim
+    violations = []
+    for food_id in food_ids:
+        listed, remaining, status, claimed = conn.execute("""
+            SELECT f.quantity, f.quantity - f.reserved, f.status,
+                   (SELECT IFNULL(SUM(quantity), 0) FROM Claims WHERE food_id = f.food_id)
+            FROM Food_Listings f WHERE f.food_id = ?
+        """, (food_id,)).fetchone()
+        if (listed != quantity or remaining < 0 or remaining + claimed != quantity
+                or (status == "Claimed") != (remaining == 0)):
+            violations.append((food_id, remaining, status, claimed))
+    conn.close()
+    log(f"{len(violations)} listings violate remaining + claimed == {quantity}")
+    return violations
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stress-test concurrent claims against a copy of the database.")
+    parser.add_argument("--db", required=True, help="SQLite database file; it gets test listings and claims")
+    parser.add_argument("--processes", type=int, default=32, help="concurrent worker processes")
+    parser.add_argument("--claimers", type=int, default=400, help="simulated receivers")
+    parser.add_argument("--listings", type=int, default=20, help="hot listings to fight over")
+    parser.add_argument("--quantity", type=int, default=50, help="starting quantity of each listing")
+    args = parser.parse_args(argv)
+    violations = stress(args.db, args.processes, args.claimers, args.listings, args.quantity)
+    raise SystemExit(1 if violations else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+# Manage Food Listings pages
+#
+# One render function per entry of the sidebar menu. food.py imports this
+# module only when one of these pages is picked, and the pages import what
+# they need themselves: adding or deleting a listing never loads pandas, and
+# only Bulk Upload and Export load bulk.py.
+
+import os
+import sqlite3
+import tempfile
+from datetime import datetime
+
+import streamlit as st
+
+from claims import ClaimRejected
+from db import cached_read_sql, claim_food, execute, export, insert_upload, read_sql, validate_upload
+from migrations import ISO_FORMAT
+
+# Download buttons hold the whole file in the server's memory until the session
+# ends, so bigger exports are refused and left to `python -m bulk`
+EXPORT_MAX_BYTES = int(os.environ.get("EXPORT_MAX_BYTES", 50 * 1024 * 1024))
+
+
+def render_view():
+    st.subheader("All Food Listings")
+    from grid import GRIDS, paginated_grid
+    paginated_grid(GRIDS["all_listings"])
+
+
+def render_search():
+    import search
+
+    st.subheader("Search Food Listings")
+    text_col, available_col = st.columns([4, 1])
+    text = text_col.text_input("Search", placeholder="Food, city, provider name or address")
+    available_only = available_col.toggle("Available only", value=True)
+    terms = search.match_terms(text)
+    if not terms:
+        return
+
+    # Cursors of the pages seen so far; reset whenever the search changes
+    if st.session_state.get("search_view") != (terms, available_only):
+        st.session_state.search_view = (terms, available_only)
+        st.session_state.search_pages = [None]
+    pages = st.session_state.search_pages
+
+    ranked = cached_read_sql(*search.probe_query(terms), name="search:probe").empty
+    sql, params = search.build_query(terms, ranked, available_only, pages[-1])
+    # The cache key leaves out the SQL text, so the query shape goes into the name
+    df = cached_read_sql(sql, params, name=f"search:{'ranked' if ranked else 'newest'}:"
+                                           f"{'available' if available_only else 'all'}")
+    if not ranked:
+        st.caption("Many listings match, so the newest are shown first; add words to rank by relevance.")
+    st.dataframe(df, use_container_width=True, hide_index=True)
+
+    cursor = search.next_cursor(df["food_id"].tolist(), ranked, pages[-1])
+    prev_col, next_col, page_col = st.columns([1, 1, 6])
+    prev_col.button("◀ Previous", disabled=len(pages) == 1, on_click=pages.pop)
+    next_col.button("Next ▶", disabled=cursor is None, on_click=pages.append, args=(cursor,))
+    page_col.caption(f"Page {len(pages)}")
+
+
+def render_add():
+    st.subheader("Add New Food Entry")
+    with st.form("add_form"):
+        food_name = st.text_input("Food Name")
+        quantity = st.number_input("Quantity", min_value=1)
+        expiry = st.date_input("Expiry Date", datetime.today())
+        provider_id = st.number_input("Provider ID", min_value=1)
+        location = st.text_input("Location")
+        food_type = st.text_input("Food Type")
+        status = st.selectbox("Status", ["Available", "Claimed", "Expired"])
+
+        submitted = st.form_submit_button("Add Food")
+        if submitted:
+            try:
+                execute("""
+                    INSERT INTO Food_Listings
+                    (food_name, quantity, expiry, provider_id, location, food_type, status)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                    (food_name, quantity, expiry.strftime(ISO_FORMAT), provider_id, location, food_type, status)
+                )
+            except sqlite3.IntegrityError:
+                st.error(f"Provider ID {provider_id} not found.")
+            else:
+                st.success(f"Food '{food_name}' added successfully!")
+
+
+def render_bulk_upload():
+    from bulk import read_upload
+
+    st.subheader("Bulk Upload Food Listings")
+    st.caption("CSV or Excel file with the columns of food_listings_data.csv; Food_ID is optional.")
+    upload = st.file_uploader("Listings file", type=["csv", "xlsx", "xls"])
+    if upload is not None:
+        try:
+            rows, errors = validate_upload(read_upload(upload, upload.name))
+        except ValueError as e:
+            st.error(str(e))
+        else:
+            st.write(f"{len(rows):,} valid rows, {len(errors):,} rows with errors.")
+            if not errors.empty:
+                st.dataframe(errors, use_container_width=True, hide_index=True)
+                st.download_button("Download error report", errors.to_csv(index=False), "upload_errors.csv")
+            if st.button(f"Import {len(rows):,} valid rows", disabled=rows.empty):
+                st.success(f"{insert_upload(rows):,} listings added.")
+
+
+def render_update():
+    import pandas as pd
+
+    st.subheader("Update Food Entry")
+    food_id = st.number_input("Food ID to Update", min_value=1)
+    existing = read_sql("SELECT * FROM Food_Listings WHERE food_id = ?", (food_id,))
+    if existing.empty:
+        st.error("Food ID not found.")
+    else:
+        row = existing.iloc[0]
+        with st.form("update_form"):
+            food_name = st.text_input("Food Name", value=row['food_name'])
+            # Claims may already hold part of it, and the listing can't shrink below that
+            reserved = int(row['reserved'])
+            quantity = st.number_input("Quantity", min_value=max(1, reserved),
+                                       value=max(1, reserved, int(row['quantity'])),
+                                       help=f"{reserved} already claimed" if reserved else None)
+            expiry = st.date_input("Expiry Date", value=pd.to_datetime(row['expiry']))
+            provider_id = st.number_input("Provider ID", min_value=1, value=int(row['provider_id']))
+            location = st.text_input("Location", value=row['location'])
+            food_type = st.text_input("Food Type", value=row['food_type'])
+            status = st.selectbox("Status", ["Available", "Claimed", "Expired"], index=["Available", "Claimed", "Expired"].index(row['status']))
+
+            submitted = st.form_submit_button("Update Food")
+            if submitted:
+                try:
+                    execute("""
+                        UPDATE Food_Listings SET
+                        food_name = ?, quantity = ?, expiry = ?, provider_id = ?, location = ?, food_type = ?, status = ?
+                        WHERE food_id = ?""",
+                        (food_name, quantity, expiry.strftime(ISO_FORMAT), provider_id, location, food_type, status, food_id)
+                    )
+                except sqlite3.IntegrityError:
+                    st.error(f"Provider ID {provider_id} not found.")
+                else:
+                    st.success(f"Food ID {food_id} updated successfully!")
+
+
+def render_delete():
+    st.subheader("Delete Food Entry")
+    food_id = st.number_input("Food ID to Delete", min_value=1)
+    if st.button("Delete"):
+        execute("DELETE FROM Food_Listings WHERE food_id = ?", (food_id,))
+        st.warning(f"Food ID {food_id} and its claims deleted if it existed.")
+
+
+def render_claim():
+    st.subheader("Claim Food")
+    food_id = st.number_input("Food ID to Claim", min_value=1)
+    listing = read_sql("""
+        SELECT food_name, quantity, quantity - reserved AS remaining, expiry, location, status
+        FROM Food_Listings WHERE food_id = ?
+    """, (food_id,))
+    if listing.empty:
+        st.error("Food ID not found.")
+    else:
+        st.dataframe(listing, use_container_width=True, hide_index=True)
+        with st.form("claim_form"):
+            receiver_id = st.number_input("Receiver ID", min_value=1)
+            quantity = st.number_input("Quantity", min_value=1, value=1)
+
+            submitted = st.form_submit_button("Claim")
+            if submitted:
+                try:
+                    claim = claim_food(food_id, receiver_id, quantity)
+                    st.success(f"Claim {claim.claim_id}: {claim.quantity} reserved, "
+                               f"{claim.remaining} left ({claim.status}).")
+                except ClaimRejected as e:
+                    st.error(str(e))
+
+
+def render_export():
+    from bulk import EXPORTS, ExportTooLarge
+
+    st.subheader("Export Data")
+    source = st.selectbox("Data", list(EXPORTS))
+    fmt = st.radio("Format", ["csv", "parquet"], horizontal=True)
+    st.caption(f"Downloads are limited to {EXPORT_MAX_BYTES / 2**20:,.0f} MB. For bigger exports run "
+               f"`python -m bulk \"{source}\" <file>.{fmt}` on the server.")
+    if st.button("Prepare export"):
+        # Streamed to a temp file chunk by chunk instead of one big DataFrame,
+        # and stopped once it outgrows the limit; only the encoded file is
+        # handed to the download button
+        sql, params = EXPORTS[source]
+        with tempfile.TemporaryFile() as out:
+            try:
+                rows = export(sql, params, fmt, out, name=f"export:{source}", max_bytes=EXPORT_MAX_BYTES)
+            except ExportTooLarge as e:
+                st.error(f"{e} That is over the download limit; run "
+                         f"`python -m bulk \"{source}\" <file>.{fmt}` on the server instead.")
+                return
+            except ValueError as e:
+                st.error(str(e))
+                return
+            out.seek(0)
+            st.download_button(f"Download {rows:,} rows", out.read(),
+                               f"{source.replace(' ', '_').lower()}.{fmt}")
@@ -0,0 +1,71 @@
+# Table-level data versions used to invalidate cached query results
+#
+# Every code path that writes to the core tables bumps the version of the
+# tables it touched, inside the same transaction. Readers fold the versions of
+# the tables a query reads into its cache key, so a cached result is reused
+# until one of those tables actually changes.
+
+import re
+from datetime import datetime, timezone
+
+from migrations import TABLES
+from rollups import LOOKUPS
+
+# Derived tables and the core tables whose writes change them
+DERIVED = {
+    "Listing_Rollup": ["Food_Listings"],
+    "Claims_Rollup": ["Claims", "Food_Listings"],
+    **{table: ["Food_Listings"] for table in LOOKUPS.values()},
+    "Listing_Search": ["Food_Listings", "Providers"],
+}
+
+# ON DELETE CASCADE foreign keys: a delete from the key's table also deletes from these
+CASCADES = {
+    "Food_Listings": ["Claims"],
+}
+
+_TABLE_PATTERN = re.compile(r"\b(" + "|".join([*TABLES, *DERIVED]) + r")\b")
+# date('now', ...) and friends: the result also changes when the day does
+_CLOCK_PATTERN = re.compile(r"\b(?:date|datetime|julianday|strftime)\s*\((?:\s*'[^']*'\s*,)?\s*'now'", re.IGNORECASE)
+_WRITE_PATTERN = re.compile(r"^\s*(?:INSERT\s+(?:OR\s+\w+\s+)?INTO|UPDATE|DELETE\s+FROM)\s+(\w+)", re.IGNORECASE)
+
+
+def tables_in(sql):
+    """Core tables a statement depends on, directly or through DERIVED, sorted."""
+    tables = set()
+    for name in _TABLE_PATTERN.findall(sql):
+        tables.update(DERIVED.get(name, [name]))
+    return sorted(tables)
+
+
+def written_tables(sql):
+    """Tables an INSERT/UPDATE/DELETE statement writes to, cascaded deletes included."""
+    match = _WRITE_PATTERN.match(sql)
+    if not match or match.group(1) not in TABLES:
+        return []
+    table = match.group(1)
+    cascades = CASCADES.get(table, []) if sql.lstrip().upper().startswith("DELETE") else []
+    return [table, *cascades]
+
+
+def bump(conn, *tables):
+    conn.executemany(
+        "UPDATE Data_Versions SET version = version + 1 WHERE table_name = ?",
+        [(table,) for table in tables],
+    )
+
+
+def clock(sql):
+    """Cache key part for a query that reads the current time: today's date
+    (UTC, like SQLite's 'now') as a pair to append to versions(), else ()."""
+    if not _CLOCK_PATTERN.search(sql):
+        return ()
+    return (("today", datetime.now(timezone.utc).date().isoformat()),)
+
+
+def versions(conn, tables=None):
+    """Return a tuple of (table, version) pairs usable as part of a cache key."""
+    rows = conn.execute("SELECT table_name, version FROM Data_Versions ORDER BY table_name").fetchall()
+    if tables is not None:
+        rows = [row for row in rows if row[0] in tables]
+    return tuple(rows)
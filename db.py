@@ -0,0 +1,217 @@
+# Connection management for the Streamlit app
+#
+# Streamlit reruns food.py on every widget interaction. Instead of opening and
+# closing a connection per rerun, one ConnectionPool (see pool.py) per process
+# is cached with st.cache_resource: a few read connections shared across
+# sessions and a single writer, all in WAL mode so readers never wait on the
+# writer. The writer is owned by a WriteQueue thread that group-commits the
+# writes of all sessions.
+
+import os
+import time
+
+import streamlit as st
+
+import claims
+import data_version
+import snapshot
+from expiry_sweep import SWEEP_INTERVAL, ExpiryScheduler
+from pool import DB_PATH, READ_POOL_SIZE, ConnectionPool
+from queries_dict import queries
+from query_stats import QueryStats
+
+# "columnar" runs the reports in snapshot.COLUMNAR_QUERIES on Parquet snapshots
+ANALYTICS_BACKEND = os.environ.get("ANALYTICS_BACKEND", "sqlite")
+
+
+@st.cache_resource
+def get_pool(path=DB_PATH, size=READ_POOL_SIZE):
+    return ConnectionPool(path, size)
+
+
+@st.cache_resource
+def start_expiry_scheduler(path=DB_PATH, interval=SWEEP_INTERVAL):
+    # Build the pool first so migrations have run before the sweeper connects
+    get_pool(path)
+    scheduler = ExpiryScheduler(path, interval)
+    scheduler.start()
+    return scheduler
+
+
+@st.cache_resource
+def start_snapshot_scheduler(path=DB_PATH, root=snapshot.SNAPSHOT_DIR, interval=snapshot.SNAPSHOT_INTERVAL):
+    """Keep the analytics snapshot fresh; does nothing unless ANALYTICS_BACKEND is columnar."""
+    if ANALYTICS_BACKEND != "columnar":
+        return None
+    get_pool(path)
+    scheduler = snapshot.SnapshotScheduler(path, root, interval)
+    scheduler.start()
+    return scheduler
+
+
+@st.cache_resource
+def get_query_stats():
+    return QueryStats()
+
+
+# --- Helpers used by the pages ---
+# Both are timed and recorded in get_query_stats() under `name`, or the SQL
+# text when there is none.
+def read_sql(sql, params=None, name=None):
+    # pandas takes about half a second to import, so pages that never read a
+    # DataFrame (Add Entry, Delete Entry) start without it
+    import pandas as pd
+
+    with get_pool().reader() as conn:
+        start = time.perf_counter()
+        df = pd.read_sql(sql, conn, params=params)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        get_query_stats().record(conn, name or sql, sql, params, elapsed_ms, len(df),
+                                 int(df.memory_usage(deep=True).sum()))
+        return df
+
+
+# Write jobs run on the WriteQueue thread, so the stats object is passed in
+# rather than looked up through st.cache_resource there
+def _execute_job(conn, sql, params, name, stats):
+    start = time.perf_counter()
+    rowcount = conn.execute(sql, params).rowcount
+    stats.record(conn, name or sql, sql, params, (time.perf_counter() - start) * 1000, rowcount)
+    tables = data_version.written_tables(sql)
+    if tables and rowcount:
+        data_version.bump(conn, *tables)
+    return rowcount
+
+
+def _claim_job(conn, food_id, receiver_id, quantity, stats):
+    start = time.perf_counter()
+    result = claims.reserve(conn, food_id, receiver_id, quantity)
+    stats.record(conn, "claim", claims.RESERVE_SQL, {"food_id": food_id, "quantity": quantity},
+                 (time.perf_counter() - start) * 1000, 1)
+    return result
+
+
+def execute(sql, params=(), name=None):
+    """Run a single write statement and return the number of affected rows."""
+    return get_pool().write(_execute_job, sql, params, name, get_query_stats())
+
+
+def claim_food(food_id, receiver_id, quantity):
+    """Reserve part of a listing (see claims.reserve) in the next group commit."""
+    return get_pool().write(_claim_job, food_id, receiver_id, quantity, get_query_stats())
+
+
+def validate_upload(df):
+    """Check an uploaded listings file (see bulk.validate)."""
+    import bulk
+
+    with get_pool().reader() as conn:
+        return bulk.validate(conn, df)
+
+
+def insert_upload(rows):
+    """Insert validated upload rows in one write transaction; returns the count."""
+    import bulk
+
+    return get_pool().write(bulk.insert_listings, rows)
+
+
+def export(sql, params, fmt, out, name=None, max_bytes=None):
+    """Stream a query into the binary file out as csv or parquet; returns the row count."""
+    import bulk
+
+    with get_pool().reader() as conn:
+        start = time.perf_counter()
+        rows = bulk.export(conn, sql, params, fmt, out, max_bytes=max_bytes)
+        get_query_stats().record(conn, name or sql, sql, params, (time.perf_counter() - start) * 1000, rows)
+    return rows
+
+
+# --- Cached reads ---
+# Results are keyed on the query name, its parameters and the data versions of
+# the tables it reads, plus the date for queries relative to 'now'; the SQL
+# text itself (_sql) is left out of the hash.
+@st.cache_data(max_entries=256, show_spinner=False)
+def _cached_read(name, _sql, params, versions):
+    return read_sql(_sql, params, name=name)
+
+
+def cached_read_sql(sql, params=None, name=None):
+    with get_pool().reader() as conn:
+        versions = data_version.versions(conn, data_version.tables_in(sql))
+    return _cached_read(name or sql, sql, params, versions + data_version.clock(sql))
+
+
+# Snapshots never change once written, so the snapshot name is the whole key
+@st.cache_data(max_entries=64, show_spinner=False)
+def _columnar_read(name, snapshot_name):
+    return snapshot.query(name, snapshot_name=snapshot_name)
+
+
+def columnar_snapshot(name=None):
+    """Name of the snapshot serving the columnar reports (or report `name`), or None."""
+    if ANALYTICS_BACKEND != "columnar" or (name and name not in snapshot.COLUMNAR_QUERIES):
+        return None
+    return snapshot.current()
+
+
+def run_query(name, params=None):
+    """Run a named query from queries_dict through the result cache.
+
+    With the columnar backend, reports it covers come from the latest snapshot
+    instead; until the first snapshot exists they still run on SQLite.
+    """
+    snapshot_name = columnar_snapshot(name)
+    if snapshot_name and not params:
+        return _columnar_read(name, snapshot_name)
+    return cached_read_sql(queries[name], params, name=name)
+
+
+# --- Wastage forecast ---
+# The model is trained once and kept on disk (see forecast.py); a process only
+# trains when there is no saved model yet or the report asks for a retrain.
+def _train_forecast_model(path):
+    import forecast
+
+    with get_pool().reader() as conn:
+        start = time.perf_counter()
+        model = forecast.train(conn)
+        get_query_stats().record(conn, "forecast:train", forecast.HISTORY_SQL, None,
+                                 (time.perf_counter() - start) * 1000, model["listings"])
+    forecast.save(model, path or forecast.MODEL_PATH)
+    return model
+
+
+@st.cache_resource(show_spinner="Training the wastage model...")
+def get_forecast_model(path=None):
+    import forecast
+
+    return forecast.load(path or forecast.MODEL_PATH) or _train_forecast_model(path)
+
+
+def retrain_forecast_model(path=None):
+    """Train on the current history and replace the saved model."""
+    _train_forecast_model(path)
+    get_forecast_model.clear()
+
+
+# Keyed on the model and the listings' data version; the ttl keeps days_left
+# from going stale while nothing is written
+@st.cache_data(max_entries=8, ttl=600, show_spinner="Scoring available listings...")
+def _at_risk(trained_at, versions, limit, _model):
+    import forecast
+
+    with get_pool().reader() as conn:
+        start = time.perf_counter()
+        df = forecast.at_risk(conn, _model, limit)
+        get_query_stats().record(conn, "forecast:at_risk", forecast.AVAILABLE_SQL, None,
+                                 (time.perf_counter() - start) * 1000, len(df))
+    return df
+
+
+def at_risk(limit=200):
+    """(model, the `limit` Available listings most likely to expire unclaimed)."""
+    model = get_forecast_model()
+    with get_pool().reader() as conn:
+        versions = data_version.versions(conn, ["Food_Listings"])
+    return model, _at_risk(model["trained_at"], versions, limit, model)
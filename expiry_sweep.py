@@ -0,0 +1,154 @@
+# Scheduled expiry sweep for Food_Listings
+#
+# Marks Available listings past their expiry date as Expired. The sweep used to
+# run at the top of every page render; it now runs on an interval, either as a
+# daemon thread inside the Streamlit process or as its own process:
+#
+#     python -m expiry_sweep [--db local_food_wastage.db] [--interval 900] [--once]
+#
+# Each run is recorded in Expiry_Sweeps with the number of rows it expired and
+# the number still Available but expiring within a day, so any number of app
+# processes and sweepers can share the work: a sweep that finds a recent run
+# skips itself. Each run also compacts the change log (changelog.py).
+#
+# The scheduler reports through the expiry_sweep logger: each sweep at INFO,
+# a sweep that couldn't get the database at WARNING.
+
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import changelog
+import data_version
+from migrations import migrate
+
+DB_PATH = "local_food_wastage.db"
+SWEEP_INTERVAL = int(os.environ.get("EXPIRY_SWEEP_INTERVAL", 900))  # seconds
+
+logger = logging.getLogger(__name__)
+
+# expiry is ISO text, so a plain comparison is equivalent to
+# date(expiry) < date('now') and can use idx_food_status_expiry
+EXPIRE_SQL = """
+    UPDATE Food_Listings
+    SET status = 'Expired'
+    WHERE status = 'Available' AND expiry < date('now')
+"""
+
+# Same window as the near_expiry query: expiring today or tomorrow
+NEAR_EXPIRY_SQL = """
+    SELECT COUNT(*) FROM Food_Listings
+    WHERE status = 'Available' AND expiry < date('now', '+2 days')
+"""
+
+
+def connect(path=DB_PATH):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA busy_timeout = 5000")
+    conn.execute("PRAGMA foreign_keys = ON")
+    migrate(conn)
+    return conn
+
+
+def last_run(conn):
+    """Return (ran_at, expired_count, near_expiry_count) of the latest sweep, or None."""
+    return conn.execute("""
+        SELECT ran_at, expired_count, near_expiry_count
+        FROM Expiry_Sweeps ORDER BY sweep_id DESC LIMIT 1
+    """).fetchone()
+
+
+def seconds_since_last_run(conn):
+    row = conn.execute("""
+        SELECT (julianday('now') - julianday(MAX(ran_at))) * 86400 FROM Expiry_Sweeps
+    """).fetchone()
+    return row[0]
+
+
+def sweep(conn):
+    """Expire overdue listings, record the run and compact the change log; returns (expired, near_expiry)."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        expired = conn.execute(EXPIRE_SQL).rowcount
+        if expired:
+            data_version.bump(conn, "Food_Listings")
+        near_expiry = conn.execute(NEAR_EXPIRY_SQL).fetchone()[0]
+        conn.execute("""
+            INSERT INTO Expiry_Sweeps (ran_at, expired_count, near_expiry_count)
+            VALUES (datetime('now'), ?, ?)
+        """, (expired, near_expiry))
+        changelog.compact(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return expired, near_expiry
+
+
+def sweep_if_due(conn, interval=SWEEP_INTERVAL):
+    """Sweep unless another process swept within the interval; None when skipped."""
+    elapsed = seconds_since_last_run(conn)
+    if elapsed is not None and elapsed < interval:
+        return None
+    return sweep(conn)
+
+
+class ExpiryScheduler(threading.Thread):
+    """Daemon thread that calls sweep_if_due() every `interval` seconds."""
+
+    def __init__(self, path=DB_PATH, interval=SWEEP_INTERVAL):
+        super().__init__(name="expiry-sweep", daemon=True)
+        self.path = path
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        conn = connect(self.path)
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    result = sweep_if_due(conn, self.interval)
+                    if result is not None:
+                        expired, near_expiry = result
+                        logger.info("expiry sweep: %d expired, %d near expiry", expired, near_expiry)
+                except sqlite3.OperationalError as e:
+                    # Typically "database is locked"; try again next tick
+                    logger.warning("expiry sweep failed: %s", e)
+                self._stop_event.wait(self.interval)
+        finally:
+            conn.close()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Periodically mark expired food listings.")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database file")
+    parser.add_argument("--interval", type=int, default=SWEEP_INTERVAL, help="seconds between sweeps")
+    parser.add_argument("--once", action="store_true", help="sweep once and exit")
+    args = parser.parse_args(argv)
+
+    if args.once:
+        conn = connect(args.db)
+        t0 = time.perf_counter()
+        expired, near_expiry = sweep(conn)
+        conn.close()
+        print(f"{expired} expired, {near_expiry} near expiry ({(time.perf_counter() - t0) * 1000:.1f} ms)")
+        return
+
+    logging.basicConfig(level=logging.INFO, format="[%(asctime)s] %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
+    scheduler = ExpiryScheduler(args.db, args.interval)
+    scheduler.start()
+    try:
+        while scheduler.is_alive():
+            scheduler.join(timeout=1)
+    except KeyboardInterrupt:
+        scheduler.stop()
+
+
+if __name__ == "__main__":
+    main()
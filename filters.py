@@ -0,0 +1,90 @@
+# Filter engine for "Filtered Available Food"
+#
+# Builds parameterized SQL for the available-food listing instead of pasting
+# sidebar values into an f-string. Multi-select filters are bound as one JSON
+# array each and expanded with json_each, so the SQL text only depends on which
+# filters are switched on, never on their values: the set of statements is
+# fixed and each one stays in SQLite's statement cache.
+#
+# Indexes serving each predicate:
+#   status only / expiry window / keyset  -> idx_food_status_expiry (status, expiry, rowid)
+#   locations                             -> idx_food_status_location
+#   food / meal types                     -> idx_food_status_food_type
+#   provider types                        -> idx_food_status_provider_type
+#
+# Pages are fetched with keyset pagination on (expiry, food_id): the cursor is
+# the last row of the previous page, so page N costs the same as page 1.
+
+import json
+from collections import namedtuple
+
+Filters = namedtuple(
+    "Filters",
+    ["locations", "food_types", "meal_types", "provider_types",
+     "expiry_from", "expiry_to", "min_quantity", "max_quantity"],
+    defaults=[(), (), (), (), None, None, None, None],
+)
+
+PAGE_SIZE = 50
+
+BASE_SQL = """
+    SELECT f.food_id, f.food_name, f.quantity, f.expiry, f.location,
+           f.food_type, f.meal_type, p.name AS provider_name, p.contact
+    FROM Food_Listings f
+    JOIN Providers p ON f.provider_id = p.provider_id
+    WHERE f.status = 'Available'
+"""
+
+# Multi-select filter field -> column
+IN_FILTERS = [
+    ("locations", "f.location"),
+    ("food_types", "f.food_type"),
+    ("meal_types", "f.meal_type"),
+    ("provider_types", "f.provider_type"),
+]
+
+# Scalar filter field -> predicate
+RANGE_FILTERS = [
+    ("expiry_from", "f.expiry >= :expiry_from"),
+    ("expiry_to", "f.expiry < date(:expiry_to, '+1 day')"),
+    ("min_quantity", "f.quantity >= :min_quantity"),
+    ("max_quantity", "f.quantity <= :max_quantity"),
+]
+
+
+def build_query(filters, after=None, page_size=PAGE_SIZE):
+    """Return (sql, params) for one page of available food.
+
+    after is the (expiry, food_id) of the last row already shown, or None for
+    the first page.
+    """
+    clauses = []
+    params = {}
+    for field, column in IN_FILTERS:
+        values = getattr(filters, field)
+        if values:
+            clauses.append(f"{column} IN (SELECT value FROM json_each(:{field}))")
+            params[field] = json.dumps(list(values))
+    for field, predicate in RANGE_FILTERS:
+        value = getattr(filters, field)
+        if value is not None:
+            clauses.append(predicate)
+            params[field] = str(value) if field.startswith("expiry") else value
+    if after is not None:
+        clauses.append("(f.expiry, f.food_id) > (:after_expiry, :after_id)")
+        params["after_expiry"], params["after_id"] = after
+
+    sql = BASE_SQL
+    for clause in clauses:
+        sql += f"      AND {clause}\n"
+    sql += "    ORDER BY f.expiry ASC, f.food_id ASC\n    LIMIT :page_size\n"
+    params["page_size"] = page_size
+    return sql, params
+
+
+def next_cursor(df, page_size=PAGE_SIZE):
+    """Cursor for the page after df, or None when df was the last page."""
+    if len(df) < page_size:
+        return None
+    last = df.iloc[-1]
+    return last["expiry"], int(last["food_id"])
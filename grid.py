@@ -0,0 +1,141 @@
+# Paginated data grid for large listing views
+#
+# "View Entries" and the Available / Claimed / Expired reports used to load
+# whole tables into st.dataframe. A Grid only fetches the visible page, using
+# keyset pagination on (sort column, id) so every page is an index range scan,
+# and shows a row count read from the rollups (rollups.py), so it costs a few
+# rows however big the tables get, even when a write invalidates the cache.
+
+from collections import namedtuple
+
+import streamlit as st
+
+from db import cached_read_sql
+
+# select: SELECT ... FROM ... without WHERE / ORDER BY
+# where:  fixed predicate or None
+# id:     (sql expression, result column) of the unique tiebreak key
+# sorts:  label -> (sql expression, result column); only indexed columns
+# count:  row count from the rollups; joins are left out, hence an estimate
+Grid = namedtuple("Grid", ["name", "select", "where", "id", "sorts", "count"])
+
+PAGE_SIZES = [25, 50, 100, 250]
+
+_LISTING_COLUMNS = """
+    SELECT f.food_id, f.food_name, f.quantity, f.expiry, f.location,
+           f.food_type, f.meal_type, p.name AS provider_name, p.contact
+    FROM Food_Listings f
+    JOIN Providers p ON f.provider_id = p.provider_id
+"""
+
+GRIDS = {
+    "all_listings": Grid(
+        "all_listings",
+        "SELECT * FROM Food_Listings f",
+        None,
+        ("f.food_id", "food_id"),
+        {"Food ID": ("f.food_id", "food_id"), "Expiry": ("f.expiry", "expiry")},
+        "SELECT IFNULL(SUM(items), 0) AS n FROM Listing_Rollup",
+    ),
+    "available_food": Grid(
+        "available_food",
+        _LISTING_COLUMNS,
+        "f.status = 'Available'",
+        ("f.food_id", "food_id"),
+        {"Expiry": ("f.expiry", "expiry")},
+        "SELECT IFNULL(SUM(items), 0) AS n FROM Listing_Rollup WHERE status = 'Available'",
+    ),
+    "expired_food": Grid(
+        "expired_food",
+        """
+        SELECT f.food_id, f.food_name, f.quantity, f.expiry, f.location, f.food_type, f.meal_type
+        FROM Food_Listings f
+        """,
+        "f.status = 'Expired'",
+        ("f.food_id", "food_id"),
+        {"Expiry": ("f.expiry", "expiry")},
+        "SELECT IFNULL(SUM(items), 0) AS n FROM Listing_Rollup WHERE status = 'Expired'",
+    ),
+    "claimed_food": Grid(
+        "claimed_food",
+        """
+        SELECT c.claim_id, f.food_id, f.food_name, IFNULL(c.quantity, f.quantity) AS quantity,
+               f.location, f.food_type,
+               r.name AS receiver_name, r.contact, c.claim_time
+        FROM Claims c
+        JOIN Food_Listings f ON c.food_id = f.food_id
+        JOIN Receivers r ON c.receiver_id = r.receiver_id
+        """,
+        None,
+        ("c.claim_id", "claim_id"),
+        {"Claim Time": ("c.claim_time", "claim_time")},
+        "SELECT IFNULL(SUM(items), 0) AS n FROM Claims_Rollup",
+    ),
+}
+
+
+def build_page_query(grid, sort, descending=False, after=None, page_size=50):
+    """Return (sql, params) for the page after the `after` cursor."""
+    sort_expr, _ = grid.sorts[sort]
+    id_expr, _ = grid.id
+    direction, op = ("DESC", "<") if descending else ("ASC", ">")
+
+    clauses = [grid.where] if grid.where else []
+    params = {"page_size": page_size}
+    if sort_expr == id_expr:
+        order = f"{id_expr} {direction}"
+        if after is not None:
+            clauses.append(f"{id_expr} {op} :after_id")
+            params["after_id"] = after[1]
+    else:
+        order = f"{sort_expr} {direction}, {id_expr} {direction}"
+        if after is not None:
+            clauses.append(f"({sort_expr}, {id_expr}) {op} (:after_sort, :after_id)")
+            params["after_sort"], params["after_id"] = after
+
+    sql = grid.select
+    if clauses:
+        sql += "\n    WHERE " + " AND ".join(clauses)
+    sql += f"\n    ORDER BY {order}\n    LIMIT :page_size"
+    return sql, params
+
+
+def page_cursor(grid, sort, df, page_size):
+    """(sort value, id) of the last row, or None when df was the last page."""
+    if len(df) < page_size:
+        return None
+    last = df.iloc[-1]
+    value = last[grid.sorts[sort][1]]
+    # numpy scalars can't be bound as SQLite parameters
+    return (value.item() if hasattr(value, "item") else value), int(last[grid.id[1]])
+
+
+def paginated_grid(grid, default_sort=None, descending=False):
+    """Render a sortable, paginated st.dataframe for a Grid."""
+    sort_col, order_col, size_col = st.columns([2, 1, 1])
+    sorts = list(grid.sorts)
+    sort = sort_col.selectbox("Sort by", sorts, index=sorts.index(default_sort or sorts[0]),
+                              key=f"{grid.name}_sort")
+    descending = order_col.toggle("Descending", value=descending, key=f"{grid.name}_desc")
+    page_size = size_col.selectbox("Rows per page", PAGE_SIZES, index=1, key=f"{grid.name}_size")
+
+    # Keyset cursors of the pages seen so far; reset when the ordering changes
+    state_key = f"{grid.name}_pages"
+    view = (sort, descending, page_size)
+    if st.session_state.get(f"{grid.name}_view") != view:
+        st.session_state[f"{grid.name}_view"] = view
+        st.session_state[state_key] = [None]
+    pages = st.session_state[state_key]
+
+    sql, params = build_page_query(grid, sort, descending, pages[-1], page_size)
+    # The cache key leaves out the SQL text, so the ordering goes into the name
+    df = cached_read_sql(sql, params, name=f"grid:{grid.name}:{sort}:{'desc' if descending else 'asc'}")
+    total = int(cached_read_sql(grid.count)["n"][0])
+    st.dataframe(df, use_container_width=True, hide_index=True)
+
+    cursor = page_cursor(grid, sort, df, page_size)
+    prev_col, next_col, info_col = st.columns([1, 1, 6])
+    prev_col.button("◀ Previous", disabled=len(pages) == 1, on_click=pages.pop, key=f"{grid.name}_prev")
+    next_col.button("Next ▶", disabled=cursor is None, on_click=pages.append, args=(cursor,),
+                    key=f"{grid.name}_next")
+    info_col.caption(f"Page {len(pages)} of ~{max(1, -(-total // page_size)):,} · ~{total:,} rows")
@@ -0,0 +1,336 @@
+# Bulk CSV ingestion for local_food_wastage.db
+#
+# Replaces the notebook's read_csv -> clean_columns -> to_sql(replace) cells.
+# Each CSV is streamed in chunks, dates are parsed once into ISO text and rows
+# are loaded with executemany inside a single transaction.
+#
+# --incremental upserts daily delta files (same shape as food_listings_data.csv
+# and claims_data.csv) instead of rebuilding. A high-water mark per source file
+# lets a re-run skip unchanged files and resume appended ones from the last
+# byte offset it loaded.
+#
+# Usage:
+#     python -m ingest [--db local_food_wastage.db] [--data-dir .] [--chunk-size 50000]
+#     python -m ingest --incremental [--listings FILE] [--claims FILE]
+
+import argparse
+import hashlib
+import io
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+import changelog
+import data_version
+import rollups
+import search
+from migrations import INDEXES, ISO_FORMAT, migrate
+
+DB_PATH = "local_food_wastage.db"
+CHUNK_SIZE = 50_000
+
+# Source formats used by the shipped CSVs, e.g. 3/17/2025 and 3/5/2025 5:26
+EXPIRY_FORMAT = "%m/%d/%Y"
+CLAIM_TIME_FORMAT = "%m/%d/%Y %H:%M"
+
+# Load order matters for the foreign keys: parents before children
+SOURCES = [
+    ("Providers", "providers_data.csv",
+     ["provider_id", "name", "type", "address", "city", "contact"]),
+    ("Receivers", "receivers_data.csv",
+     ["receiver_id", "name", "type", "city", "contact"]),
+    ("Food_Listings", "food_listings_data.csv",
+     ["food_id", "food_name", "quantity", "provider_id", "provider_type",
+      "location", "food_type", "meal_type", "expiry", "status"]),
+    ("Claims", "claims_data.csv",
+     ["claim_id", "food_id", "receiver_id", "status", "claim_time"]),
+]
+
+# PRAGMAs for a one-off bulk load; durability comes from the single commit
+BULK_PRAGMAS = [
+    "PRAGMA synchronous = OFF",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -65536",
+    "PRAGMA locking_mode = EXCLUSIVE",
+]
+
+# Upsert key per table for incremental imports, plus columns an update must not
+# overwrite (status is owned by the claims and the expiry sweep, not the CSV).
+# The CSV's quantity is the amount listed; what claims hold of it is in
+# Food_Listings.reserved, which no CSV column touches.
+UPSERT_KEYS = {
+    "Food_Listings": ("food_id", ["status"]),
+    "Claims": ("claim_id", []),
+}
+
+# Bytes before the recorded offset that must still match for a file to count as appended
+TAIL_BYTES = 4096
+
+
+# --- Chunk preparation ---
+def clean_columns(df):
+    df.columns = df.columns.str.strip().str.lower().str.replace(" ", "_")
+    return df
+
+
+def to_iso(values, fmt):
+    return pd.to_datetime(values, format=fmt, errors="coerce").dt.strftime(ISO_FORMAT)
+
+
+def prepare_chunk(table, df):
+    df = clean_columns(df)
+    if table == "Food_Listings":
+        df["quantity"] = pd.to_numeric(df["quantity"], errors="coerce")
+        df["expiry"] = to_iso(df["expiry_date"], EXPIRY_FORMAT)
+        # Claimed status is resolved with one set-based UPDATE after loading
+        df["status"] = "Available"
+    elif table == "Claims":
+        df["claim_time"] = to_iso(df["timestamp"], CLAIM_TIME_FORMAT)
+    return df
+
+
+def chunk_rows(df, columns):
+    df = df[columns].astype(object)
+    df = df.where(df.notna(), None)
+    return df.itertuples(index=False, name=None)
+
+
+def read_chunks(path, chunk_size, offset=0):
+    options = dict(chunksize=chunk_size, dtype=str, keep_default_na=False, na_values=[""])
+    if not offset:
+        return pd.read_csv(path, **options)
+    # Resume after the last loaded row, reusing the file's own header line
+    with open(path, "rb") as f:
+        header = f.readline()
+        f.seek(offset)
+        rest = f.read()
+    return pd.read_csv(io.BytesIO(header + rest), **options)
+
+
+# --- Loading ---
+def insert_sql(table, columns):
+    cols = ", ".join(columns)
+    marks = ", ".join("?" for _ in columns)
+    return f"INSERT INTO {table} ({cols}) VALUES ({marks})"
+
+
+def upsert_sql(table, columns):
+    key, keep = UPSERT_KEYS[table]
+    updates = ", ".join(f"{c} = excluded.{c}" for c in columns if c != key and c not in keep)
+    return f"{insert_sql(table, columns)} ON CONFLICT({key}) DO UPDATE SET {updates}"
+
+
+def load_table(conn, table, path, columns, chunk_size=CHUNK_SIZE, sql=None, offset=0, on_chunk=None):
+    sql = sql or insert_sql(table, columns)
+    total = 0
+    for df in read_chunks(path, chunk_size, offset):
+        df = prepare_chunk(table, df)
+        conn.executemany(sql, chunk_rows(df, columns))
+        if on_chunk:
+            on_chunk(df)
+        total += len(df)
+    return total
+
+
+def mark_claimed(conn):
+    cur = conn.execute("""
+        UPDATE Food_Listings
+        SET status = 'Claimed'
+        WHERE status = 'Available'
+          AND food_id IN (SELECT food_id FROM Claims)
+    """)
+    return cur.rowcount
+
+
+def mark_claimed_touched(conn):
+    # Only listings whose rows or claims arrived in this run are re-evaluated
+    cur = conn.execute("""
+        UPDATE Food_Listings
+        SET status = 'Claimed'
+        WHERE status = 'Available'
+          AND food_id IN (SELECT food_id FROM temp.touched_food)
+          AND EXISTS (SELECT 1 FROM Claims c WHERE c.food_id = Food_Listings.food_id)
+    """)
+    return cur.rowcount
+
+
+# --- High-water marks ---
+def _tail_hash(path, offset):
+    with open(path, "rb") as f:
+        f.seek(max(0, offset - TAIL_BYTES))
+        return hashlib.sha1(f.read(offset - max(0, offset - TAIL_BYTES))).hexdigest()
+
+
+def resume_offset(conn, path):
+    """Byte offset to resume loading path from, or None if nothing is new.
+
+    0 means the file must be read from the start: it is new, or it was
+    rewritten rather than appended to since the recorded mark.
+    """
+    mark = conn.execute(
+        "SELECT byte_offset, mtime, tail_hash FROM Ingest_Watermarks WHERE source = ?",
+        (os.path.abspath(path),),
+    ).fetchone()
+    if mark is None:
+        return 0
+    offset, mtime, tail_hash = mark
+    st = os.stat(path)
+    if st.st_size == offset and st.st_mtime == mtime:
+        return None
+    if st.st_size >= offset and _tail_hash(path, offset) == tail_hash:
+        return None if st.st_size == offset else offset
+    return 0
+
+
+def record_watermark(conn, path, table, rows):
+    st = os.stat(path)
+    conn.execute("""
+        INSERT INTO Ingest_Watermarks (source, table_name, byte_offset, mtime, tail_hash, rows_loaded, loaded_at)
+        VALUES (?, ?, ?, ?, ?, ?, datetime('now'))
+        ON CONFLICT(source) DO UPDATE SET
+            table_name = excluded.table_name,
+            byte_offset = excluded.byte_offset,
+            mtime = excluded.mtime,
+            tail_hash = excluded.tail_hash,
+            rows_loaded = rows_loaded + excluded.rows_loaded,
+            loaded_at = excluded.loaded_at
+    """, (os.path.abspath(path), table, st.st_size, st.st_mtime, _tail_hash(path, st.st_size), rows))
+
+
+def index_names():
+    # "CREATE INDEX IF NOT EXISTS <name> ON ..." -> <name>
+    return [sql.split()[5] for sql in INDEXES]
+
+
+def ingest(db_path=DB_PATH, data_dir=".", chunk_size=CHUNK_SIZE, log=print):
+    """Rebuild every table from the CSVs in data_dir; returns rows loaded per table."""
+    conn = sqlite3.connect(db_path)
+    migrate(conn)
+    for pragma in BULK_PRAGMAS:
+        conn.execute(pragma)
+
+    counts = {}
+    started = time.perf_counter()
+    conn.execute("BEGIN")
+    try:
+        # Secondary indexes and rollups are cheaper to build once at the end
+        # than to maintain per row
+        for name in index_names():
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
+        rollups.drop_triggers(conn)
+        search.drop_triggers(conn)
+        changelog.drop_triggers(conn)
+        for table, _, _ in reversed(SOURCES):
+            conn.execute(f"DELETE FROM {table}")
+        conn.execute("DELETE FROM Ingest_Watermarks")
+
+        for table, filename, columns in SOURCES:
+            path = os.path.join(data_dir, filename)
+            t0 = time.perf_counter()
+            counts[table] = load_table(conn, table, path, columns, chunk_size)
+            record_watermark(conn, path, table, counts[table])
+            elapsed = time.perf_counter() - t0
+            log(f"{table}: {counts[table]:,} rows in {elapsed:.2f}s "
+                f"({counts[table] / max(elapsed, 1e-9):,.0f} rows/s)")
+
+        t0 = time.perf_counter()
+        for sql in INDEXES:
+            conn.execute(sql)
+        claimed = mark_claimed(conn)
+        rollups.rebuild(conn)
+        rollups.create_triggers(conn)
+        search.rebuild(conn)
+        search.create_triggers(conn)
+        changelog.reload(conn, *counts)
+        changelog.create_triggers(conn)
+        log(f"Indexes and rollups rebuilt, {claimed:,} listings marked Claimed "
+            f"in {time.perf_counter() - t0:.2f}s")
+
+        data_version.bump(conn, *counts)
+        conn.commit()
+        conn.execute("ANALYZE")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    elapsed = time.perf_counter() - started
+    total = sum(counts.values())
+    log(f"Total: {total:,} rows in {elapsed:.2f}s ({total / max(elapsed, 1e-9):,.0f} rows/s)")
+    return counts
+
+
+def ingest_incremental(db_path=DB_PATH, listings_path=None, claims_path=None,
+                       chunk_size=CHUNK_SIZE, log=print):
+    """Upsert new rows from delta CSVs; returns rows loaded per table."""
+    conn = sqlite3.connect(db_path)
+    migrate(conn)
+
+    columns = {table: cols for table, _, cols in SOURCES}
+    counts = {}
+    started = time.perf_counter()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS touched_food (food_id INTEGER PRIMARY KEY)")
+
+        def touch(df):
+            ids = pd.to_numeric(df["food_id"], errors="coerce").dropna().astype("int64").unique()
+            conn.executemany("INSERT OR IGNORE INTO temp.touched_food VALUES (?)", ((int(i),) for i in ids))
+
+        for table, path in (("Food_Listings", listings_path), ("Claims", claims_path)):
+            if not path:
+                continue
+            offset = resume_offset(conn, path)
+            if offset is None:
+                log(f"{table}: {path} unchanged, skipped")
+                continue
+            t0 = time.perf_counter()
+            counts[table] = load_table(conn, table, path, columns[table], chunk_size,
+                                       sql=upsert_sql(table, columns[table]), offset=offset, on_chunk=touch)
+            record_watermark(conn, path, table, counts[table])
+            elapsed = time.perf_counter() - t0
+            log(f"{table}: upserted {counts[table]:,} rows from {path} in {elapsed:.2f}s "
+                f"({counts[table] / max(elapsed, 1e-9):,.0f} rows/s)")
+
+        if counts:
+            claimed = mark_claimed_touched(conn)
+            log(f"{claimed:,} listings marked Claimed")
+            data_version.bump(conn, "Food_Listings", *counts)
+        conn.execute("DROP TABLE temp.touched_food")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    log(f"Incremental import finished in {(time.perf_counter() - started) * 1000:.1f} ms")
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load the *_data.csv files into the SQLite database.")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database file")
+    parser.add_argument("--data-dir", default=".", help="directory holding the *_data.csv files")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="CSV rows read per chunk")
+    parser.add_argument("--incremental", action="store_true",
+                        help="upsert new rows instead of rebuilding every table")
+    parser.add_argument("--listings", help="food listings delta CSV (incremental mode)")
+    parser.add_argument("--claims", help="claims delta CSV (incremental mode)")
+    args = parser.parse_args(argv)
+
+    if args.incremental:
+        listings, claims = args.listings, args.claims
+        if not listings and not claims:
+            listings = os.path.join(args.data_dir, "food_listings_data.csv")
+            claims = os.path.join(args.data_dir, "claims_data.csv")
+        ingest_incremental(args.db, listings, claims, args.chunk_size)
+    else:
+        ingest(args.db, args.data_dir, args.chunk_size)
+
+
+if __name__ == "__main__":
+    main()
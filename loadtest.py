@@ -0,0 +1,199 @@
+# Load test for the HTTP API
+#
+# Starts api.py on a copy of the database (the shipped file is never written
+# to), then keeps --concurrency keep-alive connections busy for --duration
+# seconds, each sending its next request as soon as the last one is answered,
+# and reports requests per second and latency percentiles per endpoint.
+#
+# --revalidate sends each connection's last ETag for a path back in
+# If-None-Match, the way a caching mobile client would, so unchanged data is
+# answered with 304s. --claims adds that share of POST /claims requests for a
+# unit of a random available listing, which also bumps the data versions.
+#
+#     python -m loadtest [--db local_food_wastage.db] [--concurrency 32] [--duration 10] [--revalidate]
+#     python -m loadtest --url http://127.0.0.1:8000 [--path /listings?q=rice ...]
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from urllib.parse import urlsplit
+
+from expiry_sweep import DB_PATH, connect
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+PATHS = [
+    "/listings",
+    "/listings?available=0",
+    "/listings?q=bread",
+    "/listings?q=rice&available=0",
+    "/listings?q=main%20st",
+    "/reports/available_by_city",
+    "/reports/top_providers",
+    "/reports/dashboard_summary",
+]
+STARTUP_TIMEOUT = 120  # seconds for the server to migrate and start listening
+
+
+# --- Minimal HTTP/1.1 client ---
+async def request(reader, writer, method, path, headers=None, body=None):
+    """Send one request on a keep-alive connection; returns (status, headers, body)."""
+    payload = json.dumps(body).encode() if body is not None else b""
+    lines = [f"{method} {path} HTTP/1.1", "Host: loadtest", f"Content-Length: {len(payload)}"]
+    if body is not None:
+        lines.append("Content-Type: application/json")
+    lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + payload)
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    response_headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        response_headers[name.strip().lower()] = value.strip()
+    if "content-length" in response_headers:
+        data = await reader.readexactly(int(response_headers["content-length"]))
+    elif response_headers.get("transfer-encoding") == "chunked":
+        chunks = []
+        while size := int((await reader.readline()).split(b";")[0], 16):
+            chunks.append(await reader.readexactly(size))
+            await reader.readline()
+        await reader.readline()
+        data = b"".join(chunks)
+    else:
+        data = b""
+    return status, response_headers, data
+
+
+# --- Load ---
+async def _worker(host, port, paths, claim_share, food_ids, revalidate, deadline, results):
+    reader, writer = await asyncio.open_connection(host, port)
+    etags = {}
+    rnd = random.Random()
+    try:
+        while time.perf_counter() < deadline:
+            if food_ids and rnd.random() < claim_share:
+                label, method, path = "POST /claims", "POST", "/claims"
+                body = {"food_id": rnd.choice(food_ids), "receiver_id": rnd.randint(1, 1000), "quantity": 1}
+            else:
+                path = rnd.choice(paths)
+                label, method, body = f"GET {path}", "GET", None
+            headers = {"If-None-Match": etags[path]} if revalidate and path in etags else None
+            start = time.perf_counter()
+            status, response_headers, _ = await request(reader, writer, method, path, headers, body)
+            results[label].append((time.perf_counter() - start, status))
+            if "etag" in response_headers:
+                etags[path] = response_headers["etag"]
+    finally:
+        writer.close()
+
+
+async def _load(url, concurrency, duration, paths, claim_share, revalidate):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    food_ids = []
+    if claim_share:
+        reader, writer = await asyncio.open_connection(host, port)
+        _, _, data = await request(reader, writer, "GET", "/listings?limit=500")
+        writer.close()
+        food_ids = [item["food_id"] for item in json.loads(data)["items"]]
+
+    results = defaultdict(list)
+    start = time.perf_counter()
+    await asyncio.gather(*(_worker(host, port, paths, claim_share, food_ids, revalidate,
+                                   start + duration, results) for _ in range(concurrency)))
+    return results, time.perf_counter() - start
+
+
+def report(results, elapsed, log=print):
+    """Print and return per-endpoint throughput and latency."""
+    summary = {}
+    log(f"{'endpoint':44} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  statuses")
+    everything = [sample for samples in results.values() for sample in samples]
+    for label, samples in sorted(results.items()) + [("all", everything)]:
+        latencies = sorted(latency * 1000 for latency, _ in samples)
+        cuts = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        statuses = Counter(status for _, status in samples)
+        summary[label] = {"requests": len(samples), "rps": len(samples) / elapsed,
+                          "p50_ms": cuts[49], "p95_ms": cuts[94], "p99_ms": cuts[98], "statuses": dict(statuses)}
+        log(f"{label[:44]:44} {len(samples):9,} {len(samples) / elapsed:8.0f} {cuts[49]:8.1f} {cuts[94]:8.1f} "
+            f"{cuts[98]:8.1f}  {' '.join(f'{status}:{n}' for status, n in sorted(statuses.items()))}")
+    return summary
+
+
+# --- Server ---
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_until_up(port, server):
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"API server exited with code {server.returncode}")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("API server did not start in time")
+
+
+def run(db_path=DB_PATH, url=None, concurrency=32, duration=10, paths=PATHS, claim_share=0.0,
+        revalidate=False, readers=None, log=print):
+    """Load the API at url, or one started on a copy of db_path; returns report()."""
+    if url:
+        results, elapsed = asyncio.run(_load(url, concurrency, duration, paths, claim_share, revalidate))
+        return report(results, elapsed, log)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # Migrate the copy up front so the server starts straight away
+        copy = os.path.join(workdir, os.path.basename(db_path))
+        shutil.copy(db_path, copy)
+        connect(copy).close()
+
+        port = _free_port()
+        command = [sys.executable, "-m", "api", "--db", copy, "--port", str(port)]
+        if readers:
+            command += ["--readers", str(readers)]
+        env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [APP_DIR, os.environ.get("PYTHONPATH")]))}
+        server = subprocess.Popen(command, cwd=workdir, env=env)
+        try:
+            _wait_until_up(port, server)
+            log(f"{concurrency} connections for {duration} s against {db_path}")
+            results, elapsed = asyncio.run(_load(f"http://127.0.0.1:{port}", concurrency, duration, paths,
+                                                 claim_share, revalidate))
+            return report(results, elapsed, log)
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure API requests per second at a given concurrency.")
+    parser.add_argument("--db", default=DB_PATH, help="database to copy and serve")
+    parser.add_argument("--url", help="load an API that is already running instead")
+    parser.add_argument("--concurrency", type=int, default=32, help="connections kept busy at once")
+    parser.add_argument("--duration", type=float, default=10, help="seconds to run")
+    parser.add_argument("--path", action="append", help="GET path to request (repeatable; default a mix)")
+    parser.add_argument("--claims", type=float, default=0.0, help="share of requests that are claims (0-1)")
+    parser.add_argument("--revalidate", action="store_true", help="send If-None-Match with the last ETag")
+    parser.add_argument("--readers", type=int, help="read connections for the started server")
+    args = parser.parse_args(argv)
+    run(args.db, args.url, args.concurrency, args.duration, args.path or PATHS, args.claims,
+        args.revalidate, args.readers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# Claim matching engine
+#
+# Allocates Available listings to receivers and writes the allocation back as
+# Pending claims. Each tier is one vectorized NumPy pass rather than a loop
+# over (listing, receiver) pairs:
+#
+#   1. same city: listings and receiver slots are bucketed by city; inside a
+#      city the soonest-expiring listings go first, to receivers in id order,
+#      by pairing the i-th listing of the bucket with its i-th slot.
+#   2. any city: what is left on both sides is paired the same way across the
+#      whole table, soonest expiry first. Skipped with --same-city-only.
+#
+# The data has no coordinates, so "nearby" can only mean the same city; the
+# second tier is the fallback for receivers whose city has no supply.
+#
+# Receivers with a Pending claim already have food on the way and are left
+# out; every other receiver asks for `per_receiver` listings.
+#
+#     python -m matching [--db local_food_wastage.db] [--per-receiver 1] [--same-city-only] [--dry-run]
+
+import argparse
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import data_version
+from expiry_sweep import DB_PATH, connect
+
+BATCH_CACHE_KIB = -65536  # page cache for the write pass, like ingest's BULK_PRAGMAS
+
+# Soonest expiry first; idx_food_status_expiry returns them in this order
+LISTINGS_SQL = """
+    SELECT food_id, location
+    FROM Food_Listings
+    WHERE status = 'Available' AND expiry >= date('now')
+    ORDER BY expiry, food_id
+"""
+
+RECEIVERS_SQL = """
+    SELECT receiver_id, city
+    FROM Receivers
+    WHERE receiver_id NOT IN (
+        SELECT receiver_id FROM Claims WHERE status = 'Pending' AND receiver_id IS NOT NULL
+    )
+    ORDER BY receiver_id
+"""
+
+
+def pair_by_group(listing_groups, slot_groups):
+    """Pair the i-th listing of each group with the i-th slot of the same group.
+
+    Both arrays hold non-negative group codes, each in priority order. Returns
+    (listing positions, slot positions) of the pairs.
+    """
+    listing_order = np.argsort(listing_groups, kind="stable")
+    slot_order = np.argsort(slot_groups, kind="stable")
+    listing_sorted = listing_groups[listing_order]
+    slot_sorted = slot_groups[slot_order]
+
+    # Position of each element inside its group
+    listing_rank = np.arange(len(listing_sorted)) - np.searchsorted(listing_sorted, listing_sorted)
+    slot_rank = np.arange(len(slot_sorted)) - np.searchsorted(slot_sorted, slot_sorted)
+
+    n_groups = max(listing_groups.max(initial=-1), slot_groups.max(initial=-1)) + 1
+    listing_count = np.bincount(listing_sorted, minlength=n_groups)
+    slot_count = np.bincount(slot_sorted, minlength=n_groups)
+
+    # Each group keeps min(listings, slots) of both; the survivors line up
+    keep_listing = listing_rank < slot_count[listing_sorted]
+    keep_slot = slot_rank < listing_count[slot_sorted]
+    return listing_order[keep_listing], slot_order[keep_slot]
+
+
+def allocate(listings, receivers, per_receiver=1, same_city_only=False):
+    """Match listings (food_id, location; soonest expiry first) to receivers
+    (receiver_id, city). Returns a DataFrame of food_id, receiver_id, same_city."""
+    codes, _ = pd.factorize(pd.concat([listings["location"], receivers["city"]], ignore_index=True))
+    listing_city = codes[:len(listings)]
+    # Slots go round-robin, so every receiver gets one listing before any gets two
+    slot_city = np.tile(codes[len(listings):], per_receiver)
+    slot_receiver = np.tile(receivers["receiver_id"].to_numpy(), per_receiver)
+    food_ids = listings["food_id"].to_numpy()
+
+    # Tier 1: same city; unknown cities (-1) sit this tier out
+    listing_known = np.flatnonzero(listing_city >= 0)
+    slot_known = np.flatnonzero(slot_city >= 0)
+    li, si = pair_by_group(listing_city[listing_known], slot_city[slot_known])
+    listing_pos, slot_pos = listing_known[li], slot_known[si]
+    same_city = np.ones(len(listing_pos), dtype=bool)
+
+    # Tier 2: leftovers across all cities, still soonest expiry first
+    if not same_city_only:
+        listing_left = np.setdiff1d(np.arange(len(food_ids)), listing_pos)
+        slot_left = np.setdiff1d(np.arange(len(slot_receiver)), slot_pos)
+        n = min(len(listing_left), len(slot_left))
+        listing_pos = np.concatenate([listing_pos, listing_left[:n]])
+        slot_pos = np.concatenate([slot_pos, slot_left[:n]])
+        same_city = np.concatenate([same_city, np.zeros(n, dtype=bool)])
+
+    return pd.DataFrame({
+        "food_id": food_ids[listing_pos],
+        "receiver_id": slot_receiver[slot_pos],
+        "same_city": same_city,
+    })
+
+
+def write_claims(conn, matches):
+    """Insert the matches as Pending claims and mark their listings Claimed."""
+    # Set-based statements over a temp table visit the listings in food_id
+    # order instead of one random primary key lookup per match
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS matched (food_id INTEGER PRIMARY KEY, receiver_id INTEGER)")
+    conn.executemany("INSERT INTO temp.matched VALUES (?, ?)",
+                     zip(matches["food_id"].tolist(), matches["receiver_id"].tolist()))
+    # Listings first: their rollup trigger then has no claims to move yet
+    conn.execute("""
+        UPDATE Food_Listings SET status = 'Claimed'
+        WHERE status = 'Available' AND food_id IN (SELECT food_id FROM temp.matched)
+    """)
+    conn.execute("""
+        INSERT INTO Claims (food_id, receiver_id, status, claim_time)
+        SELECT food_id, receiver_id, 'Pending', ? FROM temp.matched
+    """, (datetime.now().strftime("%Y-%m-%d %H:%M:%S"),))
+    conn.execute("DROP TABLE temp.matched")
+    data_version.bump(conn, "Claims", "Food_Listings")
+
+
+def match(conn, per_receiver=1, same_city_only=False, dry_run=False):
+    """Allocate and, unless dry_run, write the claims in one transaction.
+
+    The write lock is taken before reading, so nothing can claim a listing
+    between the allocation and the write. Returns the matches.
+    """
+    conn.execute(f"PRAGMA cache_size = {BATCH_CACHE_KIB}")
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        listings = pd.read_sql(LISTINGS_SQL, conn)
+        receivers = pd.read_sql(RECEIVERS_SQL, conn)
+        matches = allocate(listings, receivers, per_receiver, same_city_only)
+        if dry_run or matches.empty:
+            conn.rollback()
+        else:
+            write_claims(conn, matches)
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return matches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Allocate available food to receivers as Pending claims.")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database file")
+    parser.add_argument("--per-receiver", type=int, default=1, help="listings each receiver asks for")
+    parser.add_argument("--same-city-only", action="store_true", help="never match across cities")
+    parser.add_argument("--dry-run", action="store_true", help="compute the allocation without writing it")
+    args = parser.parse_args(argv)
+
+    conn = connect(args.db)
+    t0 = time.perf_counter()
+    matches = match(conn, args.per_receiver, args.same_city_only, args.dry_run)
+    conn.close()
+    same_city = int(matches["same_city"].sum())
+    print(f"{len(matches)} matched ({same_city} same city, {len(matches) - same_city} other city)"
+          f"{' [dry run]' if args.dry_run else ''} ({(time.perf_counter() - t0) * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1266 @@
+# Versioned schema migrations for local_food_wastage.db
+#
+# The notebook loads the CSVs with to_sql(if_exists="replace"), which throws
+# away the explicit CREATE TABLE schemas: no primary keys, no foreign keys and
+# no indexes. migrate() rebuilds the tables in place and records the schema
+# version in PRAGMA user_version, so running it on every app start is cheap.
+#
+# Each step holds the statements it ran when it shipped, so a database
+# upgraded from any version ends up with the same schema as a new one. A step
+# that has shipped is never edited: schema changes go in a new step. The live
+# trigger definitions in rollups.py, search.py and changelog.py, which bulk
+# loads drop and recreate, must match the latest step that created them, as
+# INDEXES must match the indexes the steps leave behind.
+
+import sqlite3
+
+from queries_dict import queries
+
+# --- Core tables and their current indexes ---
+TABLES = ["Providers", "Receivers", "Food_Listings", "Claims"]
+
+# expiry and claim_time are canonical ISO text in ISO_FORMAT (v9), so date
+# ranges compare them directly and a month is their first seven characters
+# (the generated expiry_month and claim_month columns).
+ISO_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Indexes backing the queries in queries_dict; bulk loads drop and recreate them
+INDEXES = [
+    # available / expired / near expiry lists, claimed vs expired, dashboard counts
+    "CREATE INDEX IF NOT EXISTS idx_food_status_expiry ON Food_Listings(status, expiry)",
+    # sidebar filters, available by city, wastage by location & type
+    "CREATE INDEX IF NOT EXISTS idx_food_status_location ON Food_Listings(status, location, food_type, meal_type)",
+    # filtered available food: food / meal type without a city
+    "CREATE INDEX IF NOT EXISTS idx_food_status_food_type ON Food_Listings(status, food_type, meal_type)",
+    # available by provider type
+    "CREATE INDEX IF NOT EXISTS idx_food_status_provider_type ON Food_Listings(status, provider_type)",
+    # provider joins (top providers, provider contacts)
+    "CREATE INDEX IF NOT EXISTS idx_food_provider ON Food_Listings(provider_id, quantity)",
+    # provider contacts for available food, without the table
+    "CREATE INDEX IF NOT EXISTS idx_food_status_provider ON Food_Listings(status, provider_id, location, food_type)",
+    # monthly donations trend
+    "CREATE INDEX IF NOT EXISTS idx_food_expiry_quantity ON Food_Listings(expiry, quantity)",
+    "CREATE INDEX IF NOT EXISTS idx_claims_food ON Claims(food_id)",
+    # top receivers: every claim's receiver, listing and quantity without the table
+    "CREATE INDEX IF NOT EXISTS idx_claims_receiver_food ON Claims(receiver_id, food_id, quantity)",
+    "CREATE INDEX IF NOT EXISTS idx_claims_claim_time ON Claims(claim_time)",
+    # month partitions of a snapshot
+    "CREATE INDEX IF NOT EXISTS idx_food_expiry_month ON Food_Listings(expiry_month)",
+    "CREATE INDEX IF NOT EXISTS idx_claims_claim_month ON Claims(claim_month)",
+]
+
+
+def _columns(conn, table):
+    return [row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')]
+
+
+def _rebuild_table(conn, table, create_sql):
+    # Standard SQLite rebuild: create the new shape, copy shared columns, swap
+    old_columns = _columns(conn, table)
+    new_sql = create_sql.replace(f"CREATE TABLE {table} (", f"CREATE TABLE {table}_new (", 1)
+    conn.execute(new_sql)
+    shared = [c for c in _columns(conn, f"{table}_new") if c in old_columns]
+    if shared:
+        cols = ", ".join(shared)
+        conn.execute(f"INSERT INTO {table}_new ({cols}) SELECT {cols} FROM {table}")
+    conn.execute(f"DROP TABLE {table}")
+    conn.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+
+
+def _run(conn, statements):
+    for sql in statements:
+        conn.execute(sql)
+
+
+# --- Migrations (position in the list + 1 == schema version) ---
+# Column names match the shipped database
+_V1_TABLES = {
+    "Providers": """
+        CREATE TABLE Providers (
+            provider_id INTEGER PRIMARY KEY,
+            name TEXT,
+            type TEXT,
+            address TEXT,
+            city TEXT,
+            contact TEXT
+        )
+    """,
+    "Receivers": """
+        CREATE TABLE Receivers (
+            receiver_id INTEGER PRIMARY KEY,
+            name TEXT,
+            type TEXT,
+            city TEXT,
+            contact TEXT
+        )
+    """,
+    "Food_Listings": """
+        CREATE TABLE Food_Listings (
+            food_id INTEGER PRIMARY KEY,
+            food_name TEXT,
+            quantity INTEGER,
+            expiry_date TEXT,
+            provider_id INTEGER REFERENCES Providers(provider_id),
+            provider_type TEXT,
+            location TEXT,
+            food_type TEXT,
+            meal_type TEXT,
+            expiry TIMESTAMP,
+            status TEXT
+        )
+    """,
+    "Claims": """
+        CREATE TABLE Claims (
+            claim_id INTEGER PRIMARY KEY,
+            food_id INTEGER REFERENCES Food_Listings(food_id) ON DELETE CASCADE,
+            receiver_id INTEGER REFERENCES Receivers(receiver_id),
+            status TEXT,
+            timestamp TEXT,
+            claim_time TIMESTAMP
+        )
+    """,
+}
+
+_V1_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_food_status_expiry ON Food_Listings(status, expiry)",
+    "CREATE INDEX IF NOT EXISTS idx_food_status_location ON Food_Listings(status, location, food_type, meal_type)",
+    "CREATE INDEX IF NOT EXISTS idx_food_status_provider_type ON Food_Listings(status, provider_type)",
+    "CREATE INDEX IF NOT EXISTS idx_food_provider ON Food_Listings(provider_id, quantity)",
+    "CREATE INDEX IF NOT EXISTS idx_food_expiry_quantity ON Food_Listings(expiry, quantity)",
+    "CREATE INDEX IF NOT EXISTS idx_claims_food ON Claims(food_id)",
+    "CREATE INDEX IF NOT EXISTS idx_claims_receiver ON Claims(receiver_id)",
+    "CREATE INDEX IF NOT EXISTS idx_claims_claim_time ON Claims(claim_time)",
+]
+
+
+def _v1_keys_and_indexes(conn):
+    for table, create_sql in _V1_TABLES.items():
+        if _columns(conn, table):
+            _rebuild_table(conn, table, create_sql)
+        else:
+            conn.execute(create_sql)
+    _run(conn, _V1_INDEXES)
+
+
+def _v2_ingest_watermarks(conn):
+    # High-water mark per source CSV for incremental imports (see ingest.py)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS Ingest_Watermarks (
+            source TEXT PRIMARY KEY,
+            table_name TEXT,
+            byte_offset INTEGER,
+            mtime REAL,
+            tail_hash TEXT,
+            rows_loaded INTEGER,
+            loaded_at TEXT
+        )
+    """)
+
+
+def _v3_expiry_sweeps(conn):
+    # One row per expiry sweep run (see expiry_sweep.py)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS Expiry_Sweeps (
+            sweep_id INTEGER PRIMARY KEY,
+            ran_at TEXT,
+            expired_count INTEGER,
+            near_expiry_count INTEGER
+        )
+    """)
+
+
+def _v4_data_versions(conn):
+    # Change counter per table, bumped by every writer (see data_version.py)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS Data_Versions (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.executemany(
+        "INSERT OR IGNORE INTO Data_Versions (table_name) VALUES (?)",
+        [("Providers",), ("Receivers",), ("Food_Listings",), ("Claims",)],
+    )
+
+
+def _v5_sync_indexes(conn):
+    # Filtered available food: food / meal type without a city
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_food_status_food_type ON Food_Listings(status, food_type, meal_type)")
+
+
+# Trigger-maintained aggregate tables for the dashboard (see rollups.py)
+_V6_ROLLUPS = [
+    """
+        CREATE TABLE IF NOT EXISTS Listing_Rollup (
+            status TEXT NOT NULL,
+            location TEXT NOT NULL,
+            food_type TEXT NOT NULL,
+            provider_type TEXT NOT NULL,
+            month TEXT NOT NULL,
+            items INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            PRIMARY KEY (status, location, food_type, provider_type, month)
+        ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_listing_rollup_month ON Listing_Rollup(month, items, quantity)",
+    """
+        CREATE TABLE IF NOT EXISTS Claims_Rollup (
+            month TEXT PRIMARY KEY,
+            items INTEGER NOT NULL,
+            quantity INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_food_insert
+        AFTER INSERT ON Food_Listings BEGIN
+            INSERT INTO Listing_Rollup (status, location, food_type, provider_type, month, items, quantity)
+                VALUES (IFNULL(NEW.status, ''), IFNULL(NEW.location, ''), IFNULL(NEW.food_type, ''),
+                    IFNULL(NEW.provider_type, ''), IFNULL(strftime('%Y-%m', NEW.expiry), ''), +1,
+                    +IFNULL(NEW.quantity, 0))
+                ON CONFLICT (status, location, food_type, provider_type, month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            INSERT INTO Claims_Rollup (month, items, quantity)
+                SELECT IFNULL(strftime('%Y-%m', c.claim_time), ''), +COUNT(*), +COUNT(*) * IFNULL(NEW.quantity, 0)
+                FROM Claims c WHERE c.food_id = NEW.food_id
+                GROUP BY 1
+                ON CONFLICT (month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_food_delete
+        AFTER DELETE ON Food_Listings BEGIN
+            INSERT INTO Listing_Rollup (status, location, food_type, provider_type, month, items, quantity)
+                VALUES (IFNULL(OLD.status, ''), IFNULL(OLD.location, ''), IFNULL(OLD.food_type, ''),
+                    IFNULL(OLD.provider_type, ''), IFNULL(strftime('%Y-%m', OLD.expiry), ''), -1,
+                    -IFNULL(OLD.quantity, 0))
+                ON CONFLICT (status, location, food_type, provider_type, month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            INSERT INTO Claims_Rollup (month, items, quantity)
+                SELECT IFNULL(strftime('%Y-%m', c.claim_time), ''), -COUNT(*), -COUNT(*) * IFNULL(OLD.quantity, 0)
+                FROM Claims c WHERE c.food_id = OLD.food_id
+                GROUP BY 1
+                ON CONFLICT (month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            DELETE FROM Listing_Rollup WHERE items = 0;
+            DELETE FROM Claims_Rollup WHERE items = 0;
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_food_update
+        AFTER UPDATE OF food_id, status, location, food_type, provider_type, expiry, quantity ON Food_Listings BEGIN
+            INSERT INTO Listing_Rollup (status, location, food_type, provider_type, month, items, quantity)
+                VALUES (IFNULL(OLD.status, ''), IFNULL(OLD.location, ''), IFNULL(OLD.food_type, ''),
+                    IFNULL(OLD.provider_type, ''), IFNULL(strftime('%Y-%m', OLD.expiry), ''), -1,
+                    -IFNULL(OLD.quantity, 0))
+                ON CONFLICT (status, location, food_type, provider_type, month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            INSERT INTO Claims_Rollup (month, items, quantity)
+                SELECT IFNULL(strftime('%Y-%m', c.claim_time), ''), -COUNT(*), -COUNT(*) * IFNULL(OLD.quantity, 0)
+                FROM Claims c WHERE c.food_id = OLD.food_id
+                GROUP BY 1
+                ON CONFLICT (month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            INSERT INTO Listing_Rollup (status, location, food_type, provider_type, month, items, quantity)
+                VALUES (IFNULL(NEW.status, ''), IFNULL(NEW.location, ''), IFNULL(NEW.food_type, ''),
+                    IFNULL(NEW.provider_type, ''), IFNULL(strftime('%Y-%m', NEW.expiry), ''), +1,
+                    +IFNULL(NEW.quantity, 0))
+                ON CONFLICT (status, location, food_type, provider_type, month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            INSERT INTO Claims_Rollup (month, items, quantity)
+                SELECT IFNULL(strftime('%Y-%m', c.claim_time), ''), +COUNT(*), +COUNT(*) * IFNULL(NEW.quantity, 0)
+                FROM Claims c WHERE c.food_id = NEW.food_id
+                GROUP BY 1
+                ON CONFLICT (month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            DELETE FROM Listing_Rollup WHERE items = 0;
+            DELETE FROM Claims_Rollup WHERE items = 0;
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_claim_insert
+        AFTER INSERT ON Claims BEGIN
+            INSERT INTO Claims_Rollup (month, items, quantity)
+                SELECT IFNULL(strftime('%Y-%m', NEW.claim_time), ''), +1, +IFNULL(f.quantity, 0)
+                FROM Food_Listings f WHERE f.food_id = NEW.food_id
+                ON CONFLICT (month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_claim_delete
+        AFTER DELETE ON Claims BEGIN
+            INSERT INTO Claims_Rollup (month, items, quantity)
+                SELECT IFNULL(strftime('%Y-%m', OLD.claim_time), ''), -1, -IFNULL(f.quantity, 0)
+                FROM Food_Listings f WHERE f.food_id = OLD.food_id
+                ON CONFLICT (month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            DELETE FROM Listing_Rollup WHERE items = 0;
+            DELETE FROM Claims_Rollup WHERE items = 0;
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_claim_update
+        AFTER UPDATE OF food_id, claim_time ON Claims BEGIN
+            INSERT INTO Claims_Rollup (month, items, quantity)
+                SELECT IFNULL(strftime('%Y-%m', OLD.claim_time), ''), -1, -IFNULL(f.quantity, 0)
+                FROM Food_Listings f WHERE f.food_id = OLD.food_id
+                ON CONFLICT (month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            INSERT INTO Claims_Rollup (month, items, quantity)
+                SELECT IFNULL(strftime('%Y-%m', NEW.claim_time), ''), +1, +IFNULL(f.quantity, 0)
+                FROM Food_Listings f WHERE f.food_id = NEW.food_id
+                ON CONFLICT (month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            DELETE FROM Listing_Rollup WHERE items = 0;
+            DELETE FROM Claims_Rollup WHERE items = 0;
+        END
+    """,
+    "DELETE FROM Listing_Rollup",
+    """
+        INSERT INTO Listing_Rollup (status, location, food_type, provider_type, month, items, quantity)
+        SELECT IFNULL(status, ''), IFNULL(location, ''), IFNULL(food_type, ''), IFNULL(provider_type, ''),
+               IFNULL(strftime('%Y-%m', expiry), ''), COUNT(*), IFNULL(SUM(quantity), 0)
+        FROM Food_Listings
+        GROUP BY 1, 2, 3, 4, 5
+    """,
+    "DELETE FROM Claims_Rollup",
+    """
+        INSERT INTO Claims_Rollup (month, items, quantity)
+        SELECT IFNULL(strftime('%Y-%m', c.claim_time), ''), COUNT(*), IFNULL(SUM(f.quantity), 0)
+        FROM Claims c
+        JOIN Food_Listings f ON c.food_id = f.food_id
+        GROUP BY 1
+    """,
+]
+
+
+def _v6_rollups(conn):
+    _run(conn, _V6_ROLLUPS)
+
+
+# Key-scoped pruning. The covering month index moved on every trigger upsert,
+# and the rollup is small enough to scan for the monthly report.
+_V7_ROLLUP_TRIGGERS = [
+    "DROP INDEX IF EXISTS idx_listing_rollup_month",
+    "DROP TRIGGER IF EXISTS trg_rollup_food_delete",
+    "DROP TRIGGER IF EXISTS trg_rollup_food_update",
+    "DROP TRIGGER IF EXISTS trg_rollup_claim_delete",
+    "DROP TRIGGER IF EXISTS trg_rollup_claim_update",
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_food_delete
+        BEFORE DELETE ON Food_Listings BEGIN
+            INSERT INTO Listing_Rollup (status, location, food_type, provider_type, month, items, quantity)
+                VALUES (IFNULL(OLD.status, ''), IFNULL(OLD.location, ''), IFNULL(OLD.food_type, ''),
+                    IFNULL(OLD.provider_type, ''), IFNULL(strftime('%Y-%m', OLD.expiry), ''), -1,
+                    -IFNULL(OLD.quantity, 0))
+                ON CONFLICT (status, location, food_type, provider_type, month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            INSERT INTO Claims_Rollup (month, items, quantity)
+                SELECT IFNULL(strftime('%Y-%m', c.claim_time), ''), -COUNT(*), -COUNT(*) * IFNULL(OLD.quantity, 0)
+                FROM Claims c WHERE c.food_id = OLD.food_id
+                GROUP BY 1
+                ON CONFLICT (month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            DELETE FROM Listing_Rollup
+                WHERE (status, location, food_type, provider_type, month) = (IFNULL(OLD.status, ''),
+                    IFNULL(OLD.location, ''), IFNULL(OLD.food_type, ''), IFNULL(OLD.provider_type, ''),
+                    IFNULL(strftime('%Y-%m', OLD.expiry), '')) AND items = 0;
+            DELETE FROM Claims_Rollup
+                WHERE items = 0 AND month IN (
+                SELECT IFNULL(strftime('%Y-%m', c.claim_time), '') FROM Claims c WHERE c.food_id = OLD.food_id);
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_food_update
+        AFTER UPDATE OF food_id, status, location, food_type, provider_type, expiry, quantity ON Food_Listings BEGIN
+            INSERT INTO Listing_Rollup (status, location, food_type, provider_type, month, items, quantity)
+                VALUES (IFNULL(OLD.status, ''), IFNULL(OLD.location, ''), IFNULL(OLD.food_type, ''),
+                    IFNULL(OLD.provider_type, ''), IFNULL(strftime('%Y-%m', OLD.expiry), ''), -1,
+                    -IFNULL(OLD.quantity, 0))
+                ON CONFLICT (status, location, food_type, provider_type, month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            INSERT INTO Claims_Rollup (month, items, quantity)
+                SELECT IFNULL(strftime('%Y-%m', c.claim_time), ''), -COUNT(*), -COUNT(*) * IFNULL(OLD.quantity, 0)
+                FROM Claims c WHERE c.food_id = OLD.food_id
+                GROUP BY 1
+                ON CONFLICT (month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            INSERT INTO Listing_Rollup (status, location, food_type, provider_type, month, items, quantity)
+                VALUES (IFNULL(NEW.status, ''), IFNULL(NEW.location, ''), IFNULL(NEW.food_type, ''),
+                    IFNULL(NEW.provider_type, ''), IFNULL(strftime('%Y-%m', NEW.expiry), ''), +1,
+                    +IFNULL(NEW.quantity, 0))
+                ON CONFLICT (status, location, food_type, provider_type, month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            INSERT INTO Claims_Rollup (month, items, quantity)
+                SELECT IFNULL(strftime('%Y-%m', c.claim_time), ''), +COUNT(*), +COUNT(*) * IFNULL(NEW.quantity, 0)
+                FROM Claims c WHERE c.food_id = NEW.food_id
+                GROUP BY 1
+                ON CONFLICT (month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            DELETE FROM Listing_Rollup
+                WHERE (status, location, food_type, provider_type, month) = (IFNULL(OLD.status, ''),
+                    IFNULL(OLD.location, ''), IFNULL(OLD.food_type, ''), IFNULL(OLD.provider_type, ''),
+                    IFNULL(strftime('%Y-%m', OLD.expiry), '')) AND items = 0;
+            DELETE FROM Claims_Rollup
+                WHERE items = 0 AND month IN (
+                SELECT IFNULL(strftime('%Y-%m', c.claim_time), '') FROM Claims c WHERE c.food_id = OLD.food_id);
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_claim_delete
+        AFTER DELETE ON Claims BEGIN
+            INSERT INTO Claims_Rollup (month, items, quantity)
+                SELECT IFNULL(strftime('%Y-%m', OLD.claim_time), ''), -1, -IFNULL(f.quantity, 0)
+                FROM Food_Listings f WHERE f.food_id = OLD.food_id
+                ON CONFLICT (month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            DELETE FROM Claims_Rollup
+                WHERE month = IFNULL(strftime('%Y-%m', OLD.claim_time), '') AND items = 0;
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_claim_update
+        AFTER UPDATE OF food_id, claim_time ON Claims BEGIN
+            INSERT INTO Claims_Rollup (month, items, quantity)
+                SELECT IFNULL(strftime('%Y-%m', OLD.claim_time), ''), -1, -IFNULL(f.quantity, 0)
+                FROM Food_Listings f WHERE f.food_id = OLD.food_id
+                ON CONFLICT (month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            INSERT INTO Claims_Rollup (month, items, quantity)
+                SELECT IFNULL(strftime('%Y-%m', NEW.claim_time), ''), +1, +IFNULL(f.quantity, 0)
+                FROM Food_Listings f WHERE f.food_id = NEW.food_id
+                ON CONFLICT (month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            DELETE FROM Claims_Rollup
+                WHERE month = IFNULL(strftime('%Y-%m', OLD.claim_time), '') AND items = 0;
+        END
+    """,
+]
+
+
+def _v7_rollup_triggers(conn):
+    _run(conn, _V7_ROLLUP_TRIGGERS)
+
+
+# Quantity reserved by a claim (see claims.py); NULL for claims that took the
+# whole listing, so the rollups fall back to the listing's quantity
+_V8_CLAIM_QUANTITY = [
+    "ALTER TABLE Claims ADD COLUMN quantity INTEGER",
+    "DROP TRIGGER IF EXISTS trg_rollup_food_insert",
+    "DROP TRIGGER IF EXISTS trg_rollup_food_delete",
+    "DROP TRIGGER IF EXISTS trg_rollup_food_update",
+    "DROP TRIGGER IF EXISTS trg_rollup_claim_insert",
+    "DROP TRIGGER IF EXISTS trg_rollup_claim_delete",
+    "DROP TRIGGER IF EXISTS trg_rollup_claim_update",
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_food_insert
+        AFTER INSERT ON Food_Listings BEGIN
+            INSERT INTO Listing_Rollup (status, location, food_type, provider_type, month, items, quantity)
+                VALUES (IFNULL(NEW.status, ''), IFNULL(NEW.location, ''), IFNULL(NEW.food_type, ''),
+                    IFNULL(NEW.provider_type, ''), IFNULL(strftime('%Y-%m', NEW.expiry), ''), +1,
+                    +IFNULL(NEW.quantity, 0))
+                ON CONFLICT (status, location, food_type, provider_type, month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            INSERT INTO Claims_Rollup (month, items, quantity)
+                SELECT IFNULL(strftime('%Y-%m', c.claim_time), ''), +COUNT(*),
+                +SUM(IFNULL(c.quantity, IFNULL(NEW.quantity, 0)))
+                FROM Claims c WHERE c.food_id = NEW.food_id
+                GROUP BY 1
+                ON CONFLICT (month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_food_delete
+        BEFORE DELETE ON Food_Listings BEGIN
+            INSERT INTO Listing_Rollup (status, location, food_type, provider_type, month, items, quantity)
+                VALUES (IFNULL(OLD.status, ''), IFNULL(OLD.location, ''), IFNULL(OLD.food_type, ''),
+                    IFNULL(OLD.provider_type, ''), IFNULL(strftime('%Y-%m', OLD.expiry), ''), -1,
+                    -IFNULL(OLD.quantity, 0))
+                ON CONFLICT (status, location, food_type, provider_type, month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            INSERT INTO Claims_Rollup (month, items, quantity)
+                SELECT IFNULL(strftime('%Y-%m', c.claim_time), ''), -COUNT(*),
+                -SUM(IFNULL(c.quantity, IFNULL(OLD.quantity, 0)))
+                FROM Claims c WHERE c.food_id = OLD.food_id
+                GROUP BY 1
+                ON CONFLICT (month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            DELETE FROM Listing_Rollup
+                WHERE (status, location, food_type, provider_type, month) = (IFNULL(OLD.status, ''),
+                    IFNULL(OLD.location, ''), IFNULL(OLD.food_type, ''), IFNULL(OLD.provider_type, ''),
+                    IFNULL(strftime('%Y-%m', OLD.expiry), '')) AND items = 0;
+            DELETE FROM Claims_Rollup
+                WHERE items = 0 AND month IN (
+                SELECT IFNULL(strftime('%Y-%m', c.claim_time), '') FROM Claims c WHERE c.food_id = OLD.food_id);
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_food_update
+        AFTER UPDATE OF food_id, status, location, food_type, provider_type, expiry, quantity ON Food_Listings BEGIN
+            INSERT INTO Listing_Rollup (status, location, food_type, provider_type, month, items, quantity)
+                VALUES (IFNULL(OLD.status, ''), IFNULL(OLD.location, ''), IFNULL(OLD.food_type, ''),
+                    IFNULL(OLD.provider_type, ''), IFNULL(strftime('%Y-%m', OLD.expiry), ''), -1,
+                    -IFNULL(OLD.quantity, 0))
+                ON CONFLICT (status, location, food_type, provider_type, month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            INSERT INTO Claims_Rollup (month, items, quantity)
+                SELECT IFNULL(strftime('%Y-%m', c.claim_time), ''), -COUNT(*),
+                -SUM(IFNULL(c.quantity, IFNULL(OLD.quantity, 0)))
+                FROM Claims c WHERE c.food_id = OLD.food_id
+                GROUP BY 1
+                ON CONFLICT (month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            INSERT INTO Listing_Rollup (status, location, food_type, provider_type, month, items, quantity)
+                VALUES (IFNULL(NEW.status, ''), IFNULL(NEW.location, ''), IFNULL(NEW.food_type, ''),
+                    IFNULL(NEW.provider_type, ''), IFNULL(strftime('%Y-%m', NEW.expiry), ''), +1,
+                    +IFNULL(NEW.quantity, 0))
+                ON CONFLICT (status, location, food_type, provider_type, month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            INSERT INTO Claims_Rollup (month, items, quantity)
+                SELECT IFNULL(strftime('%Y-%m', c.claim_time), ''), +COUNT(*),
+                +SUM(IFNULL(c.quantity, IFNULL(NEW.quantity, 0)))
+                FROM Claims c WHERE c.food_id = NEW.food_id
+                GROUP BY 1
+                ON CONFLICT (month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            DELETE FROM Listing_Rollup
+                WHERE (status, location, food_type, provider_type, month) = (IFNULL(OLD.status, ''),
+                    IFNULL(OLD.location, ''), IFNULL(OLD.food_type, ''), IFNULL(OLD.provider_type, ''),
+                    IFNULL(strftime('%Y-%m', OLD.expiry), '')) AND items = 0;
+            DELETE FROM Claims_Rollup
+                WHERE items = 0 AND month IN (
+                SELECT IFNULL(strftime('%Y-%m', c.claim_time), '') FROM Claims c WHERE c.food_id = OLD.food_id);
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_claim_insert
+        AFTER INSERT ON Claims BEGIN
+            INSERT INTO Claims_Rollup (month, items, quantity)
+                SELECT IFNULL(strftime('%Y-%m', NEW.claim_time), ''), +1, +IFNULL(NEW.quantity, IFNULL(f.quantity,
+                    0))
+                FROM Food_Listings f WHERE f.food_id = NEW.food_id
+                ON CONFLICT (month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_claim_delete
+        AFTER DELETE ON Claims BEGIN
+            INSERT INTO Claims_Rollup (month, items, quantity)
+                SELECT IFNULL(strftime('%Y-%m', OLD.claim_time), ''), -1, -IFNULL(OLD.quantity, IFNULL(f.quantity,
+                    0))
+                FROM Food_Listings f WHERE f.food_id = OLD.food_id
+                ON CONFLICT (month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            DELETE FROM Claims_Rollup
+                WHERE month = IFNULL(strftime('%Y-%m', OLD.claim_time), '') AND items = 0;
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_claim_update
+        AFTER UPDATE OF food_id, claim_time, quantity ON Claims BEGIN
+            INSERT INTO Claims_Rollup (month, items, quantity)
+                SELECT IFNULL(strftime('%Y-%m', OLD.claim_time), ''), -1, -IFNULL(OLD.quantity, IFNULL(f.quantity,
+                    0))
+                FROM Food_Listings f WHERE f.food_id = OLD.food_id
+                ON CONFLICT (month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            INSERT INTO Claims_Rollup (month, items, quantity)
+                SELECT IFNULL(strftime('%Y-%m', NEW.claim_time), ''), +1, +IFNULL(NEW.quantity, IFNULL(f.quantity,
+                    0))
+                FROM Food_Listings f WHERE f.food_id = NEW.food_id
+                ON CONFLICT (month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            DELETE FROM Claims_Rollup
+                WHERE month = IFNULL(strftime('%Y-%m', OLD.claim_time), '') AND items = 0;
+        END
+    """,
+]
+
+
+def _v8_claim_quantity(conn):
+    _run(conn, _V8_CLAIM_QUANTITY)
+
+
+# The app's add and update forms stored date-only expiries: rewrite every
+# parseable value as ISO_FORMAT and key the rollups on generated month
+# columns. ALTER TABLE can only add VIRTUAL generated columns; v15 rebuilds
+# the tables to store and index them.
+_V9_CANONICAL_DATES = [
+    "ALTER TABLE Food_Listings ADD COLUMN expiry_month TEXT GENERATED ALWAYS AS (substr(expiry, 1, 7)) VIRTUAL",
+    "ALTER TABLE Claims ADD COLUMN claim_month TEXT GENERATED ALWAYS AS (substr(claim_time, 1, 7)) VIRTUAL",
+    "DROP TRIGGER IF EXISTS trg_rollup_food_insert",
+    "DROP TRIGGER IF EXISTS trg_rollup_food_delete",
+    "DROP TRIGGER IF EXISTS trg_rollup_food_update",
+    "DROP TRIGGER IF EXISTS trg_rollup_claim_insert",
+    "DROP TRIGGER IF EXISTS trg_rollup_claim_delete",
+    "DROP TRIGGER IF EXISTS trg_rollup_claim_update",
+    """
+        UPDATE Food_Listings SET expiry = strftime('%Y-%m-%d %H:%M:%S', expiry)
+        WHERE expiry <> strftime('%Y-%m-%d %H:%M:%S', expiry)
+    """,
+    """
+        UPDATE Claims SET claim_time = strftime('%Y-%m-%d %H:%M:%S', claim_time)
+        WHERE claim_time <> strftime('%Y-%m-%d %H:%M:%S', claim_time)
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_food_insert
+        AFTER INSERT ON Food_Listings BEGIN
+            INSERT INTO Listing_Rollup (status, location, food_type, provider_type, month, items, quantity)
+                VALUES (IFNULL(NEW.status, ''), IFNULL(NEW.location, ''), IFNULL(NEW.food_type, ''),
+                    IFNULL(NEW.provider_type, ''), IFNULL(NEW.expiry_month, ''), +1, +IFNULL(NEW.quantity, 0))
+                ON CONFLICT (status, location, food_type, provider_type, month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            INSERT INTO Claims_Rollup (month, items, quantity)
+                SELECT IFNULL(c.claim_month, ''), +COUNT(*),
+                +SUM(IFNULL(c.quantity, IFNULL(NEW.quantity, 0)))
+                FROM Claims c WHERE c.food_id = NEW.food_id
+                GROUP BY 1
+                ON CONFLICT (month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_food_delete
+        BEFORE DELETE ON Food_Listings BEGIN
+            INSERT INTO Listing_Rollup (status, location, food_type, provider_type, month, items, quantity)
+                VALUES (IFNULL(OLD.status, ''), IFNULL(OLD.location, ''), IFNULL(OLD.food_type, ''),
+                    IFNULL(OLD.provider_type, ''), IFNULL(OLD.expiry_month, ''), -1, -IFNULL(OLD.quantity, 0))
+                ON CONFLICT (status, location, food_type, provider_type, month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            INSERT INTO Claims_Rollup (month, items, quantity)
+                SELECT IFNULL(c.claim_month, ''), -COUNT(*),
+                -SUM(IFNULL(c.quantity, IFNULL(OLD.quantity, 0)))
+                FROM Claims c WHERE c.food_id = OLD.food_id
+                GROUP BY 1
+                ON CONFLICT (month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            DELETE FROM Listing_Rollup
+                WHERE (status, location, food_type, provider_type, month) = (IFNULL(OLD.status, ''),
+                    IFNULL(OLD.location, ''), IFNULL(OLD.food_type, ''), IFNULL(OLD.provider_type, ''),
+                    IFNULL(OLD.expiry_month, '')) AND items = 0;
+            DELETE FROM Claims_Rollup
+                WHERE items = 0 AND month IN (
+                SELECT IFNULL(c.claim_month, '') FROM Claims c WHERE c.food_id = OLD.food_id);
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_food_update
+        AFTER UPDATE OF food_id, status, location, food_type, provider_type, expiry, quantity ON Food_Listings BEGIN
+            INSERT INTO Listing_Rollup (status, location, food_type, provider_type, month, items, quantity)
+                VALUES (IFNULL(OLD.status, ''), IFNULL(OLD.location, ''), IFNULL(OLD.food_type, ''),
+                    IFNULL(OLD.provider_type, ''), IFNULL(OLD.expiry_month, ''), -1, -IFNULL(OLD.quantity, 0))
+                ON CONFLICT (status, location, food_type, provider_type, month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            INSERT INTO Claims_Rollup (month, items, quantity)
+                SELECT IFNULL(c.claim_month, ''), -COUNT(*),
+                -SUM(IFNULL(c.quantity, IFNULL(OLD.quantity, 0)))
+                FROM Claims c WHERE c.food_id = OLD.food_id
+                GROUP BY 1
+                ON CONFLICT (month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            INSERT INTO Listing_Rollup (status, location, food_type, provider_type, month, items, quantity)
+                VALUES (IFNULL(NEW.status, ''), IFNULL(NEW.location, ''), IFNULL(NEW.food_type, ''),
+                    IFNULL(NEW.provider_type, ''), IFNULL(NEW.expiry_month, ''), +1, +IFNULL(NEW.quantity, 0))
+                ON CONFLICT (status, location, food_type, provider_type, month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            INSERT INTO Claims_Rollup (month, items, quantity)
+                SELECT IFNULL(c.claim_month, ''), +COUNT(*),
+                +SUM(IFNULL(c.quantity, IFNULL(NEW.quantity, 0)))
+                FROM Claims c WHERE c.food_id = NEW.food_id
+                GROUP BY 1
+                ON CONFLICT (month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            DELETE FROM Listing_Rollup
+                WHERE (status, location, food_type, provider_type, month) = (IFNULL(OLD.status, ''),
+                    IFNULL(OLD.location, ''), IFNULL(OLD.food_type, ''), IFNULL(OLD.provider_type, ''),
+                    IFNULL(OLD.expiry_month, '')) AND items = 0;
+            DELETE FROM Claims_Rollup
+                WHERE items = 0 AND month IN (
+                SELECT IFNULL(c.claim_month, '') FROM Claims c WHERE c.food_id = OLD.food_id);
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_claim_insert
+        AFTER INSERT ON Claims BEGIN
+            INSERT INTO Claims_Rollup (month, items, quantity)
+                SELECT IFNULL(NEW.claim_month, ''), +1, +IFNULL(NEW.quantity, IFNULL(f.quantity, 0))
+                FROM Food_Listings f WHERE f.food_id = NEW.food_id
+                ON CONFLICT (month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_claim_delete
+        AFTER DELETE ON Claims BEGIN
+            INSERT INTO Claims_Rollup (month, items, quantity)
+                SELECT IFNULL(OLD.claim_month, ''), -1, -IFNULL(OLD.quantity, IFNULL(f.quantity, 0))
+                FROM Food_Listings f WHERE f.food_id = OLD.food_id
+                ON CONFLICT (month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            DELETE FROM Claims_Rollup
+                WHERE month = IFNULL(OLD.claim_month, '') AND items = 0;
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_claim_update
+        AFTER UPDATE OF food_id, claim_time, quantity ON Claims BEGIN
+            INSERT INTO Claims_Rollup (month, items, quantity)
+                SELECT IFNULL(OLD.claim_month, ''), -1, -IFNULL(OLD.quantity, IFNULL(f.quantity, 0))
+                FROM Food_Listings f WHERE f.food_id = OLD.food_id
+                ON CONFLICT (month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            INSERT INTO Claims_Rollup (month, items, quantity)
+                SELECT IFNULL(NEW.claim_month, ''), +1, +IFNULL(NEW.quantity, IFNULL(f.quantity, 0))
+                FROM Food_Listings f WHERE f.food_id = NEW.food_id
+                ON CONFLICT (month) DO UPDATE SET
+                    items = items + excluded.items,
+                    quantity = quantity + excluded.quantity;
+            DELETE FROM Claims_Rollup
+                WHERE month = IFNULL(OLD.claim_month, '') AND items = 0;
+        END
+    """,
+    "DELETE FROM Listing_Rollup",
+    """
+        INSERT INTO Listing_Rollup (status, location, food_type, provider_type, month, items, quantity)
+        SELECT IFNULL(status, ''), IFNULL(location, ''), IFNULL(food_type, ''), IFNULL(provider_type, ''),
+               IFNULL(expiry_month, ''), COUNT(*), IFNULL(SUM(quantity), 0)
+        FROM Food_Listings
+        GROUP BY 1, 2, 3, 4, 5
+    """,
+    "DELETE FROM Claims_Rollup",
+    """
+        INSERT INTO Claims_Rollup (month, items, quantity)
+        SELECT IFNULL(c.claim_month, ''), COUNT(*), IFNULL(SUM(IFNULL(c.quantity, f.quantity)), 0)
+        FROM Claims c
+        JOIN Food_Listings f ON c.food_id = f.food_id
+        GROUP BY 1
+    """,
+]
+
+
+def _v9_canonical_dates(conn):
+    _run(conn, _V9_CANONICAL_DATES)
+
+
+# Lookup tables for the categorical columns (see rollups.LOOKUPS)
+_V10_LOOKUP_TABLES = [
+    """
+        CREATE TABLE IF NOT EXISTS Locations (
+            location_id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            listings INTEGER NOT NULL
+        )
+    """,
+    """
+        CREATE TABLE IF NOT EXISTS Food_Types (
+            food_type_id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            listings INTEGER NOT NULL
+        )
+    """,
+    """
+        CREATE TABLE IF NOT EXISTS Meal_Types (
+            meal_type_id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            listings INTEGER NOT NULL
+        )
+    """,
+    """
+        CREATE TABLE IF NOT EXISTS Provider_Types (
+            provider_type_id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            listings INTEGER NOT NULL
+        )
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_lookup_food_insert
+        AFTER INSERT ON Food_Listings BEGIN
+            INSERT INTO Locations (name, listings)
+                SELECT NEW.location, +1 WHERE NEW.location IS NOT NULL
+                ON CONFLICT (name) DO UPDATE SET listings = listings + excluded.listings;
+            INSERT INTO Food_Types (name, listings)
+                SELECT NEW.food_type, +1 WHERE NEW.food_type IS NOT NULL
+                ON CONFLICT (name) DO UPDATE SET listings = listings + excluded.listings;
+            INSERT INTO Meal_Types (name, listings)
+                SELECT NEW.meal_type, +1 WHERE NEW.meal_type IS NOT NULL
+                ON CONFLICT (name) DO UPDATE SET listings = listings + excluded.listings;
+            INSERT INTO Provider_Types (name, listings)
+                SELECT NEW.provider_type, +1 WHERE NEW.provider_type IS NOT NULL
+                ON CONFLICT (name) DO UPDATE SET listings = listings + excluded.listings;
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_lookup_food_delete
+        AFTER DELETE ON Food_Listings BEGIN
+            INSERT INTO Locations (name, listings)
+                SELECT OLD.location, -1 WHERE OLD.location IS NOT NULL
+                ON CONFLICT (name) DO UPDATE SET listings = listings + excluded.listings;
+            INSERT INTO Food_Types (name, listings)
+                SELECT OLD.food_type, -1 WHERE OLD.food_type IS NOT NULL
+                ON CONFLICT (name) DO UPDATE SET listings = listings + excluded.listings;
+            INSERT INTO Meal_Types (name, listings)
+                SELECT OLD.meal_type, -1 WHERE OLD.meal_type IS NOT NULL
+                ON CONFLICT (name) DO UPDATE SET listings = listings + excluded.listings;
+            INSERT INTO Provider_Types (name, listings)
+                SELECT OLD.provider_type, -1 WHERE OLD.provider_type IS NOT NULL
+                ON CONFLICT (name) DO UPDATE SET listings = listings + excluded.listings;
+            DELETE FROM Locations WHERE name = OLD.location AND listings = 0;
+            DELETE FROM Food_Types WHERE name = OLD.food_type AND listings = 0;
+            DELETE FROM Meal_Types WHERE name = OLD.meal_type AND listings = 0;
+            DELETE FROM Provider_Types WHERE name = OLD.provider_type AND listings = 0;
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_lookup_food_update
+        AFTER UPDATE OF location, food_type, meal_type, provider_type ON Food_Listings BEGIN
+            INSERT INTO Locations (name, listings)
+                SELECT OLD.location, -1 WHERE OLD.location IS NOT NULL
+                ON CONFLICT (name) DO UPDATE SET listings = listings + excluded.listings;
+            INSERT INTO Food_Types (name, listings)
+                SELECT OLD.food_type, -1 WHERE OLD.food_type IS NOT NULL
+                ON CONFLICT (name) DO UPDATE SET listings = listings + excluded.listings;
+            INSERT INTO Meal_Types (name, listings)
+                SELECT OLD.meal_type, -1 WHERE OLD.meal_type IS NOT NULL
+                ON CONFLICT (name) DO UPDATE SET listings = listings + excluded.listings;
+            INSERT INTO Provider_Types (name, listings)
+                SELECT OLD.provider_type, -1 WHERE OLD.provider_type IS NOT NULL
+                ON CONFLICT (name) DO UPDATE SET listings = listings + excluded.listings;
+            INSERT INTO Locations (name, listings)
+                SELECT NEW.location, +1 WHERE NEW.location IS NOT NULL
+                ON CONFLICT (name) DO UPDATE SET listings = listings + excluded.listings;
+            INSERT INTO Food_Types (name, listings)
+                SELECT NEW.food_type, +1 WHERE NEW.food_type IS NOT NULL
+                ON CONFLICT (name) DO UPDATE SET listings = listings + excluded.listings;
+            INSERT INTO Meal_Types (name, listings)
+                SELECT NEW.meal_type, +1 WHERE NEW.meal_type IS NOT NULL
+                ON CONFLICT (name) DO UPDATE SET listings = listings + excluded.listings;
+            INSERT INTO Provider_Types (name, listings)
+                SELECT NEW.provider_type, +1 WHERE NEW.provider_type IS NOT NULL
+                ON CONFLICT (name) DO UPDATE SET listings = listings + excluded.listings;
+            DELETE FROM Locations WHERE name = OLD.location AND listings = 0;
+            DELETE FROM Food_Types WHERE name = OLD.food_type AND listings = 0;
+            DELETE FROM Meal_Types WHERE name = OLD.meal_type AND listings = 0;
+            DELETE FROM Provider_Types WHERE name = OLD.provider_type AND listings = 0;
+        END
+    """,
+    """
+        INSERT INTO Locations (name, listings)
+        SELECT location, COUNT(*) FROM Food_Listings WHERE location IS NOT NULL GROUP BY 1
+    """,
+    """
+        INSERT INTO Food_Types (name, listings)
+        SELECT food_type, COUNT(*) FROM Food_Listings WHERE food_type IS NOT NULL GROUP BY 1
+    """,
+    """
+        INSERT INTO Meal_Types (name, listings)
+        SELECT meal_type, COUNT(*) FROM Food_Listings WHERE meal_type IS NOT NULL GROUP BY 1
+    """,
+    """
+        INSERT INTO Provider_Types (name, listings)
+        SELECT provider_type, COUNT(*) FROM Food_Listings WHERE provider_type IS NOT NULL GROUP BY 1
+    """,
+]
+
+
+def _v10_lookup_tables(conn):
+    _run(conn, _V10_LOOKUP_TABLES)
+
+
+# FTS5 index for the Search page (see search.py). Without a prefix index of
+# its length, a prefix query merges the full doclists of every term it covers
+# (60 ms for "provider" at 1M listings).
+_V11_LISTING_SEARCH = [
+    """
+        CREATE VIEW IF NOT EXISTS Listing_Search_Source AS
+        SELECT f.food_id, f.food_name, f.location, p.name AS provider_name, p.address AS provider_address
+        FROM Food_Listings f
+        LEFT JOIN Providers p ON p.provider_id = f.provider_id
+    """,
+    """
+        CREATE VIRTUAL TABLE IF NOT EXISTS Listing_Search USING fts5(
+            food_name, location, provider_name, provider_address,
+            content = 'Listing_Search_Source', content_rowid = 'food_id',
+            prefix = '2 3 4 5 6 7 8', tokenize = 'unicode61 remove_diacritics 2'
+        )
+    """,
+    "INSERT INTO Listing_Search (Listing_Search, rank) VALUES ('rank', 'bm25(10.0, 5.0, 2.0, 1.0)')",
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_search_food_insert
+        AFTER INSERT ON Food_Listings BEGIN
+            INSERT INTO Listing_Search (rowid, food_name, location, provider_name, provider_address)
+                SELECT food_id, food_name, location, provider_name, provider_address
+                    FROM Listing_Search_Source WHERE food_id = NEW.food_id;
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_search_food_delete
+        AFTER DELETE ON Food_Listings BEGIN
+            INSERT INTO Listing_Search (Listing_Search, rowid, food_name, location, provider_name, provider_address)
+                VALUES ('delete', OLD.food_id, OLD.food_name, OLD.location,
+                (SELECT name FROM Providers WHERE provider_id = OLD.provider_id),
+                (SELECT address FROM Providers WHERE provider_id = OLD.provider_id));
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_search_food_update
+        AFTER UPDATE OF food_id, food_name, location, provider_id ON Food_Listings BEGIN
+            INSERT INTO Listing_Search (Listing_Search, rowid, food_name, location, provider_name, provider_address)
+                VALUES ('delete', OLD.food_id, OLD.food_name, OLD.location,
+                (SELECT name FROM Providers WHERE provider_id = OLD.provider_id),
+                (SELECT address FROM Providers WHERE provider_id = OLD.provider_id));
+            INSERT INTO Listing_Search (rowid, food_name, location, provider_name, provider_address)
+                SELECT food_id, food_name, location, provider_name, provider_address
+                    FROM Listing_Search_Source WHERE food_id = NEW.food_id;
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_search_provider_insert
+        AFTER INSERT ON Providers BEGIN
+            INSERT INTO Listing_Search (Listing_Search, rowid, food_name, location, provider_name, provider_address)
+                SELECT 'delete', food_id, food_name, location, NULL, NULL
+                FROM Food_Listings WHERE provider_id = NEW.provider_id AND 1;
+            INSERT INTO Listing_Search (rowid, food_name, location, provider_name, provider_address)
+                SELECT food_id, food_name, location, provider_name, provider_address
+                    FROM Listing_Search_Source WHERE food_id IN (SELECT food_id FROM Food_Listings
+                    WHERE provider_id = NEW.provider_id);
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_search_provider_delete
+        AFTER DELETE ON Providers BEGIN
+            INSERT INTO Listing_Search (Listing_Search, rowid, food_name, location, provider_name, provider_address)
+                SELECT 'delete', food_id, food_name, location, OLD.name, OLD.address
+                FROM Food_Listings WHERE provider_id = OLD.provider_id AND 1;
+            INSERT INTO Listing_Search (rowid, food_name, location, provider_name, provider_address)
+                SELECT food_id, food_name, location, provider_name, provider_address
+                    FROM Listing_Search_Source WHERE food_id IN (SELECT food_id FROM Food_Listings
+                    WHERE provider_id = OLD.provider_id);
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_search_provider_update
+        AFTER UPDATE OF provider_id, name, address ON Providers BEGIN
+            INSERT INTO Listing_Search (Listing_Search, rowid, food_name, location, provider_name, provider_address)
+                SELECT 'delete', food_id, food_name, location, OLD.name, OLD.address
+                FROM Food_Listings WHERE provider_id = OLD.provider_id AND 1;
+            INSERT INTO Listing_Search (Listing_Search, rowid, food_name, location, provider_name, provider_address)
+                SELECT 'delete', food_id, food_name, location, NULL, NULL
+                FROM Food_Listings WHERE provider_id = NEW.provider_id AND NEW.provider_id IS NOT OLD.provider_id;
+            INSERT INTO Listing_Search (rowid, food_name, location, provider_name, provider_address)
+                SELECT food_id, food_name, location, provider_name, provider_address
+                    FROM Listing_Search_Source WHERE food_id IN (SELECT food_id FROM Food_Listings
+                    WHERE provider_id IN (OLD.provider_id, NEW.provider_id));
+        END
+    """,
+    "INSERT INTO Listing_Search (Listing_Search) VALUES ('rebuild')",
+]
+
+
+def _v11_listing_search(conn):
+    _run(conn, _V11_LISTING_SEARCH)
+
+
+# Change log of Food_Listings and Claims for incremental consumers (see changelog.py)
+_V12_CHANGELOG = [
+    """
+        CREATE TABLE IF NOT EXISTS Changelog (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id INTEGER,
+            op TEXT NOT NULL,
+            changed_at TEXT NOT NULL DEFAULT (datetime('now'))
+        )
+    """,
+    """
+        CREATE TABLE IF NOT EXISTS Changelog_Consumers (
+            name TEXT PRIMARY KEY,
+            seq INTEGER NOT NULL,
+            updated_at TEXT
+        )
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_changelog_food_insert
+        AFTER INSERT ON Food_Listings BEGIN
+            INSERT INTO Changelog (table_name, row_id, op) VALUES ('Food_Listings', NEW.food_id, 'insert');
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_changelog_food_delete
+        AFTER DELETE ON Food_Listings BEGIN
+            INSERT INTO Changelog (table_name, row_id, op) VALUES ('Food_Listings', OLD.food_id, 'delete');
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_changelog_food_update
+        AFTER UPDATE ON Food_Listings BEGIN
+            INSERT INTO Changelog (table_name, row_id, op)
+                SELECT 'Food_Listings', OLD.food_id, 'delete' WHERE NEW.food_id IS NOT OLD.food_id;
+            INSERT INTO Changelog (table_name, row_id, op) VALUES ('Food_Listings', NEW.food_id, 'update');
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_changelog_claim_insert
+        AFTER INSERT ON Claims BEGIN
+            INSERT INTO Changelog (table_name, row_id, op) VALUES ('Claims', NEW.claim_id, 'insert');
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_changelog_claim_delete
+        AFTER DELETE ON Claims BEGIN
+            INSERT INTO Changelog (table_name, row_id, op) VALUES ('Claims', OLD.claim_id, 'delete');
+        END
+    """,
+    """
+        CREATE TRIGGER IF NOT EXISTS trg_changelog_claim_update
+        AFTER UPDATE ON Claims BEGIN
+            INSERT INTO Changelog (table_name, row_id, op)
+                SELECT 'Claims', OLD.claim_id, 'delete' WHERE NEW.claim_id IS NOT OLD.claim_id;
+            INSERT INTO Changelog (table_name, row_id, op) VALUES ('Claims', NEW.claim_id, 'update');
+        END
+    """,
+]
+
+
+def _v12_changelog(conn):
+    _run(conn, _V12_CHANGELOG)
+
+
+def _v13_covering_indexes(conn):
+    # top_receivers and provider_contacts_for_available scanned their base
+    # table; idx_claims_receiver_food replaces idx_claims_receiver
+    conn.execute("DROP INDEX IF EXISTS idx_claims_receiver")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_claims_receiver_food ON Claims(receiver_id, food_id, quantity)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_food_status_provider "
+                 "ON Food_Listings(status, provider_id, location, food_type)")
+
+
+def _v14_reserved_quantity(conn):
+    # Claims took their units out of Food_Listings.quantity, which the reports
+    # sum as the amount listed. Reservations get their own column, and each
+    # listing gets back what claims.reserve took from it: the claims with a
+    # quantity of their own are the ones it made
+    conn.execute("ALTER TABLE Food_Listings ADD COLUMN reserved INTEGER NOT NULL DEFAULT 0")
+    conn.execute("""
+        UPDATE Food_Listings
+        SET reserved = c.quantity, quantity = Food_Listings.quantity + c.quantity
+        FROM (SELECT food_id, SUM(quantity) AS quantity FROM Claims WHERE quantity IS NOT NULL GROUP BY food_id) c
+        WHERE Food_Listings.food_id = c.food_id
+    """)
+
+
+# Months stored and indexed, and the CSVs' M/D/YYYY expiry_date and timestamp
+# copies dropped: nothing reads them, and the app's writes left them NULL
+_V15_TABLES = {
+    "Food_Listings": """
+        CREATE TABLE Food_Listings (
+            food_id INTEGER PRIMARY KEY,
+            food_name TEXT,
+            quantity INTEGER,
+            provider_id INTEGER REFERENCES Providers(provider_id),
+            provider_type TEXT,
+            location TEXT,
+            food_type TEXT,
+            meal_type TEXT,
+            expiry TIMESTAMP,
+            status TEXT,
+            reserved INTEGER NOT NULL DEFAULT 0,
+            expiry_month TEXT GENERATED ALWAYS AS (substr(expiry, 1, 7)) STORED
+        )
+    """,
+    "Claims": """
+        CREATE TABLE Claims (
+            claim_id INTEGER PRIMARY KEY,
+            food_id INTEGER REFERENCES Food_Listings(food_id) ON DELETE CASCADE,
+            receiver_id INTEGER REFERENCES Receivers(receiver_id),
+            status TEXT,
+            claim_time TIMESTAMP,
+            quantity INTEGER,
+            claim_month TEXT GENERATED ALWAYS AS (substr(claim_time, 1, 7)) STORED
+        )
+    """,
+}
+
+_V15_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_food_expiry_month ON Food_Listings(expiry_month)",
+    "CREATE INDEX IF NOT EXISTS idx_claims_claim_month ON Claims(claim_month)",
+]
+
+
+def _v15_stored_month_columns(conn):
+    # Triggers on Claims and Providers refer to Food_Listings, so the rename
+    # at the end of a rebuild fails while they exist. As in SQLite's own
+    # recipe, the views, triggers and indexes are saved, dropped and replayed
+    # as the database holds them.
+    saved = conn.execute("""
+        SELECT type, name, sql FROM sqlite_master
+        WHERE type IN ('view', 'trigger')
+           OR (type = 'index' AND tbl_name IN ('Food_Listings', 'Claims') AND sql IS NOT NULL)
+        ORDER BY type = 'trigger'
+    """).fetchall()
+    for kind, name, _ in saved:
+        if kind != "index":
+            conn.execute(f"DROP {kind.upper()} {name}")
+    for table, create_sql in _V15_TABLES.items():
+        _rebuild_table(conn, table, create_sql)
+    for _, _, sql in saved:
+        conn.execute(sql)
+    _run(conn, _V15_INDEXES)
+    conn.execute("UPDATE Data_Versions SET version = version + 1 WHERE table_name IN ('Food_Listings', 'Claims')")
+
+
+MIGRATIONS = [
+    _v1_keys_and_indexes,
+    _v2_ingest_watermarks,
+    _v3_expiry_sweeps,
+    _v4_data_versions,
+    _v5_sync_indexes,
+    _v6_rollups,
+    _v7_rollup_triggers,
+    _v8_claim_quantity,
+    _v9_canonical_dates,
+    _v10_lookup_tables,
+    _v11_listing_search,
+    _v12_changelog,
+    _v13_covering_indexes,
+    _v14_reserved_quantity,
+    _v15_stored_month_columns,
+]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Apply any pending migrations and return the resulting schema version."""
+    current = schema_version(conn)
+    if current >= len(MIGRATIONS):
+        return current
+
+    # Foreign keys must be off while tables are being rebuilt, and the pragma
+    # is a no-op inside a transaction, so toggle it around the whole run.
+    fk_enabled = conn.execute("PRAGMA foreign_keys").fetchone()[0]
+    conn.execute("PRAGMA foreign_keys = OFF")
+    try:
+        for version, step in enumerate(MIGRATIONS, start=1):
+            if version <= current:
+                continue
+            conn.execute("BEGIN")
+            try:
+                step(conn)
+                conn.execute(f"PRAGMA user_version = {version}")
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+        conn.execute("ANALYZE")
+        conn.commit()
+    finally:
+        conn.execute(f"PRAGMA foreign_keys = {'ON' if fk_enabled else 'OFF'}")
+    return schema_version(conn)
+
+
+# --- Query plan check ---
+# Parameters used to EXPLAIN queries that take named placeholders
+EXPLAIN_PARAMS = {"city": "All", "food_type": "All", "meal_type": "All"}
+
+# Materialized rollups and lookups hold one row per group, so scanning them is fine
+BOUNDED_TABLES = ("Listing_Rollup", "Claims_Rollup", "Locations", "Food_Types", "Meal_Types", "Provider_Types")
+
+
+def explain(conn, sql, params=None):
+    """Return the detail lines of EXPLAIN QUERY PLAN for a query."""
+    rows = conn.execute("EXPLAIN QUERY PLAN " + sql, params or {}).fetchall()
+    return [row[3] for row in rows]
+
+
+def full_scans(plan):
+    """Plan lines that scan a whole table other than one of BOUNDED_TABLES."""
+    return [
+        line for line in plan
+        if line.startswith("SCAN ") and "INDEX" not in line and "CONSTANT ROW" not in line
+        and line.split()[1] not in BOUNDED_TABLES
+    ]
+
+
+def check_query_plans(conn, query_map=None):
+    """Map each query name to its plan and its full table scans.
+
+    A query passes only when every table it reads is searched by key or read
+    through an index: one SCAN of a base table fails it, however well the
+    other tables of the join are served. Scans of BOUNDED_TABLES don't count.
+    """
+    report = {}
+    for name, sql in (query_map or queries).items():
+        plan = explain(conn, sql, EXPLAIN_PARAMS if ":" in sql else None)
+        report[name] = {"plan": plan, "full_scans": full_scans(plan)}
+    return report
+
+
+if __name__ == "__main__":
+    import sys
+
+    db_path = sys.argv[1] if len(sys.argv) > 1 else "local_food_wastage.db"
+    conn = sqlite3.connect(db_path)
+    print(f"Schema version: {migrate(conn)}")
+
+    failed = []
+    for name, result in check_query_plans(conn).items():
+        ok = not result["full_scans"]
+        print(f"{'ok ' if ok else '!! '}{name}")
+        for line in result["plan"]:
+            print(f"      {line}")
+        if not ok:
+            failed.append(name)
+    conn.close()
+
+    if failed:
+        print(f"Queries scanning a whole table: {', '.join(failed)}")
+        sys.exit(1)
@@ -0,0 +1,57 @@
+# Performance page
+#
+# Hidden from the sidebar menu unless the app is opened with ?perf=1. Shows the
+# per-query totals this process has collected and the slow-query log written
+# by query_stats, with the query plan of each slow execution.
+
+import pandas as pd
+import streamlit as st
+
+from db import get_pool, get_query_stats
+from query_stats import read_slow_log
+
+HOT_COLUMNS = ["query", "calls", "total_ms", "mean_ms", "max_ms", "rows", "bytes", "slow", "full_scans"]
+SLOW_COLUMNS = ["time", "query", "elapsed_ms", "rows", "bytes", "full_scans"]
+
+
+def render():
+    stats = get_query_stats()
+    st.subheader("⏱ Query Performance")
+    st.caption(f"Statements slower than {stats.threshold_ms:g} ms are logged to `{stats.log_path}` "
+               "with their query plan.")
+
+    # --- Hot queries ---
+    totals = stats.totals()
+    calls_col, time_col, scans_col = st.columns(3)
+    calls_col.metric("Statements run", f"{sum(row['calls'] for row in totals):,}")
+    time_col.metric("Time in SQLite", f"{sum(row['total_ms'] for row in totals) / 1000:,.2f} s")
+    scans_col.metric("Queries with full scans", sum(1 for row in totals if row["full_scans"]))
+
+    st.markdown("#### 🔥 Hot Queries (since process start)")
+    hot = pd.DataFrame(totals, columns=HOT_COLUMNS)
+    hot["full_scans"] = hot["full_scans"].map("; ".join)
+    st.dataframe(hot.round(3), use_container_width=True, hide_index=True)
+    st.button("Reset counters", on_click=stats.reset)
+
+    # --- Write queue ---
+    writes = get_pool().writes
+    st.markdown("#### ✍ Write Queue")
+    jobs_col, batches_col, size_col = st.columns(3)
+    jobs_col.metric("Writes committed", f"{writes.jobs:,}")
+    batches_col.metric("Group commits", f"{writes.batches:,}")
+    size_col.metric("Writes per commit", f"{writes.jobs / max(1, writes.batches):.1f}")
+
+    # --- Slow-query log ---
+    st.markdown("#### 🐢 Slow Queries")
+    entries = read_slow_log(stats.log_path)
+    if not entries:
+        st.info("No slow queries logged yet.")
+        return
+    slow = pd.DataFrame(entries, columns=SLOW_COLUMNS)
+    slow["full_scans"] = slow["full_scans"].map("; ".join)
+    st.dataframe(slow, use_container_width=True, hide_index=True)
+
+    for entry in entries[:20]:
+        with st.expander(f"{entry['time']} · {entry['elapsed_ms']:,.1f} ms · {entry['query'][:80]}"):
+            st.code("\n".join(entry["plan"]), language="text")
+            st.json(entry["params"] or {}, expanded=False)
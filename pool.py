@@ -0,0 +1,78 @@
+# SQLite connection pool
+#
+# A few read connections and a single writer, all in WAL mode so readers never
+# wait on the writer. The writer is owned by a WriteQueue thread that
+# group-commits the writes of every caller. The Streamlit app keeps one pool
+# per process (db.get_pool), and so does the HTTP API (api.py).
+
+import queue
+import sqlite3
+from contextlib import contextmanager
+
+from migrations import migrate
+from write_queue import WriteQueue
+
+DB_PATH = "local_food_wastage.db"
+READ_POOL_SIZE = 4
+CHECKOUT_TIMEOUT = 30  # seconds to wait for a free read connection
+
+# Applied once per connection when the pool is built
+PRAGMAS = [
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA cache_size = -16384",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",
+    # Off by default in SQLite; deleting a listing cascades to its claims
+    "PRAGMA foreign_keys = ON",
+]
+
+
+def _connect(path, read_only=False):
+    # Callers run on many threads (Streamlit sessions, the API's executor);
+    # the pool makes sure a connection is only used by one at a time.
+    conn = sqlite3.connect(path, check_same_thread=False)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    if read_only:
+        conn.execute("PRAGMA query_only = ON")
+    return conn
+
+
+class ConnectionPool:
+    def __init__(self, path=DB_PATH, size=READ_POOL_SIZE):
+        self.path = path
+        self._writer = _connect(path)
+        # WAL is persistent in the database file, so only the writer sets it
+        self._writer.execute("PRAGMA journal_mode = WAL")
+        migrate(self._writer)
+        self.writes = WriteQueue(self._writer)
+
+        self._readers = queue.Queue()
+        for _ in range(size):
+            self._readers.put(_connect(path, read_only=True))
+
+    def checkout(self):
+        """Take a read connection; give it back with checkin()."""
+        return self._readers.get(timeout=CHECKOUT_TIMEOUT)
+
+    def checkin(self, conn):
+        self._readers.put(conn)
+
+    @contextmanager
+    def reader(self):
+        conn = self.checkout()
+        try:
+            yield conn
+        finally:
+            self.checkin(conn)
+
+    def write(self, fn, *args):
+        """Run fn(conn, *args) in the next group commit and return its result."""
+        return self.writes.write(fn, *args)
+
+    def close(self):
+        self.writes.close()
+        self._writer.close()
+        while not self._readers.empty():
+            self._readers.get_nowait().close()
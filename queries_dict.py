@@ -13,7 +13,7 @@ queries = {
 
     # 2. Claimed food with receiver details
     "claimed_food": """
-        SELECT f.food_id, f.food_name, f.quantity, f.location, f.food_type, 
+        SELECT f.food_id, f.food_name, IFNULL(c.quantity, f.quantity) AS quantity, f.location, f.food_type, 
                r.name AS receiver_name, r.contact, c.claim_time
         FROM Claims c
         JOIN Food_Listings f ON c.food_id = f.food_id
@@ -29,21 +29,21 @@ queries = {
         ORDER BY expiry DESC;
     """,
 
-    # 4. Available food by city
+    # 4. Available food by city (from the Listing_Rollup materialized rollup)
     "available_by_city": """
-        SELECT location, COUNT(*) AS total_items, SUM(quantity) AS total_quantity
-        FROM Food_Listings
+        SELECT NULLIF(location, '') AS location, SUM(items) AS total_items, SUM(quantity) AS total_quantity
+        FROM Listing_Rollup
         WHERE status = 'Available'
-        GROUP BY location
+        GROUP BY 1
         ORDER BY total_quantity DESC;
     """,
 
     # 5. Available food by provider type
     "available_by_provider_type": """
-        SELECT provider_type, COUNT(*) AS total_items, SUM(quantity) AS total_quantity
-        FROM Food_Listings
+        SELECT NULLIF(provider_type, '') AS provider_type, SUM(items) AS total_items, SUM(quantity) AS total_quantity
+        FROM Listing_Rollup
         WHERE status = 'Available'
-        GROUP BY provider_type
+        GROUP BY 1
         ORDER BY total_quantity DESC;
     """,
 
@@ -51,8 +51,8 @@ queries = {
     "near_expiry": """
         SELECT food_id, food_name, quantity, expiry, location, provider_id
         FROM Food_Listings
-        WHERE status = 'Available' 
-        AND date(expiry) <= date('now', '+1 day')
+        WHERE status = 'Available'
+        AND expiry < date('now', '+2 days')
         ORDER BY expiry ASC;
     """,
 
@@ -68,7 +68,7 @@ queries = {
 
     # 8. Top 5 receivers by quantity claimed
     "top_receivers": """
-        SELECT r.name AS receiver_name, SUM(f.quantity) AS total_claimed
+        SELECT r.name AS receiver_name, SUM(IFNULL(c.quantity, f.quantity)) AS total_claimed
         FROM Claims c
         JOIN Food_Listings f ON c.food_id = f.food_id
         JOIN Receivers r ON c.receiver_id = r.receiver_id
@@ -79,40 +79,39 @@ queries = {
 
     # 9. Food wastage by location & type
     "wastage_by_location_type": """
-        SELECT location, food_type, COUNT(*) AS total_items, SUM(quantity) AS total_quantity
-        FROM Food_Listings
+        SELECT NULLIF(location, '') AS location, NULLIF(food_type, '') AS food_type,
+               SUM(items) AS total_items, SUM(quantity) AS total_quantity
+        FROM Listing_Rollup
         WHERE status = 'Expired'
-        GROUP BY location, food_type
+        GROUP BY 1, 2
         ORDER BY total_quantity DESC;
     """,
 
     # 10. Claimed vs expired quantity summary
     "claimed_vs_expired": """
-        SELECT status, COUNT(*) AS total_items, SUM(quantity) AS total_quantity
-        FROM Food_Listings
+        SELECT status, SUM(items) AS total_items, SUM(quantity) AS total_quantity
+        FROM Listing_Rollup
         WHERE status IN ('Claimed', 'Expired')
         GROUP BY status;
     """,
 
     # 11. Monthly food donations trend
     "monthly_donations": """
-        SELECT strftime('%Y-%m', expiry) AS month,
-               COUNT(*) AS items_listed,
+        SELECT NULLIF(month, '') AS month,
+               SUM(items) AS items_listed,
                SUM(quantity) AS quantity_listed
-        FROM Food_Listings
-        GROUP BY month
-        ORDER BY month ASC;
+        FROM Listing_Rollup
+        GROUP BY 1
+        ORDER BY 1 ASC;
     """,
 
     # 12. Monthly food claims trend
     "monthly_claims": """
-        SELECT strftime('%Y-%m', claim_time) AS month,
-               COUNT(*) AS items_claimed,
-               SUM(f.quantity) AS quantity_claimed
-        FROM Claims c
-        JOIN Food_Listings f ON c.food_id = f.food_id
-        GROUP BY month
-        ORDER BY month ASC;
+        SELECT NULLIF(month, '') AS month,
+               items AS items_claimed,
+               quantity AS quantity_claimed
+        FROM Claims_Rollup
+        ORDER BY 1 ASC;
     """,
 
     # 13. Filtered available food (dynamic replacements in Streamlit)
@@ -140,11 +139,11 @@ queries = {
     # 15. Summary dashboard data
     "dashboard_summary": """
         SELECT 
-            (SELECT COUNT(*) FROM Food_Listings WHERE status = 'Available') AS available_count,
-            (SELECT SUM(quantity) FROM Food_Listings WHERE status = 'Available') AS available_quantity,
-            (SELECT COUNT(*) FROM Food_Listings WHERE status = 'Expired') AS expired_count,
-            (SELECT SUM(quantity) FROM Food_Listings WHERE status = 'Expired') AS expired_quantity,
-            (SELECT COUNT(*) FROM Food_Listings WHERE status = 'Claimed') AS claimed_count,
-            (SELECT SUM(quantity) FROM Food_Listings WHERE status = 'Claimed') AS claimed_quantity;
+            (SELECT IFNULL(SUM(items), 0) FROM Listing_Rollup WHERE status = 'Available') AS available_count,
+            (SELECT SUM(quantity) FROM Listing_Rollup WHERE status = 'Available') AS available_quantity,
+            (SELECT IFNULL(SUM(items), 0) FROM Listing_Rollup WHERE status = 'Expired') AS expired_count,
+            (SELECT SUM(quantity) FROM Listing_Rollup WHERE status = 'Expired') AS expired_quantity,
+            (SELECT IFNULL(SUM(items), 0) FROM Listing_Rollup WHERE status = 'Claimed') AS claimed_count,
+            (SELECT SUM(quantity) FROM Listing_Rollup WHERE status = 'Claimed') AS claimed_quantity;
     """
 }
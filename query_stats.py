@@ -0,0 +1,99 @@
+# Query instrumentation and slow-query log
+#
+# Every read and write the app issues goes through db.read_sql / db.execute,
+# which time the statement and hand it to the process-wide QueryStats. It keeps
+# running totals per query (calls, wall time, rows, bytes materialized) and the
+# EXPLAIN QUERY PLAN of the first execution, so full scans show up next to how
+# hot a query is. Statements slower than SLOW_QUERY_MS are explained again with
+# their actual parameters and appended to the slow-query log, a JSONL file that
+# is rotated to <path>.1 once it grows past SLOW_LOG_MAX_BYTES.
+#
+# The hidden Performance page (performance.py) shows both.
+
+import json
+import os
+import re
+import threading
+from datetime import datetime
+
+from migrations import explain, full_scans
+
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", 200))
+SLOW_LOG_PATH = os.environ.get("SLOW_QUERY_LOG", "slow_queries.jsonl")
+SLOW_LOG_MAX_BYTES = 5 * 1024 * 1024
+
+
+def query_label(sql):
+    """Collapse a query name or SQL text to one short line."""
+    return re.sub(r"\s+", " ", sql).strip()[:120]
+
+
+class QueryStats:
+    def __init__(self, log_path=SLOW_LOG_PATH, threshold_ms=SLOW_QUERY_MS):
+        self.log_path = log_path
+        self.threshold_ms = threshold_ms
+        self._lock = threading.Lock()
+        self._totals = {}
+
+    def record(self, conn, name, sql, params, elapsed_ms, rows, nbytes=0):
+        """Account one execution; conn must be the connection that ran it."""
+        label = query_label(name)
+        with self._lock:
+            first = label not in self._totals
+            if first:
+                self._totals[label] = {
+                    "query": label, "calls": 0, "total_ms": 0.0, "max_ms": 0.0,
+                    "rows": 0, "bytes": 0, "slow": 0, "full_scans": [],
+                }
+            stats = self._totals[label]
+            stats["calls"] += 1
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+            stats["rows"] += rows
+            stats["bytes"] += nbytes
+
+        # EXPLAIN only prepares the statement, so it costs microseconds
+        slow = elapsed_ms >= self.threshold_ms
+        if first or slow:
+            plan = explain(conn, sql, params)
+            with self._lock:
+                stats["full_scans"] = full_scans(plan)
+                stats["slow"] += slow
+        if slow:
+            self._log({
+                "time": datetime.now().isoformat(timespec="seconds"),
+                "query": label,
+                "elapsed_ms": round(elapsed_ms, 3),
+                "rows": rows,
+                "bytes": nbytes,
+                "params": params,
+                "plan": plan,
+                "full_scans": full_scans(plan),
+            })
+
+    def _log(self, entry):
+        line = json.dumps(entry, default=str) + "\n"
+        with self._lock:
+            if os.path.exists(self.log_path) and os.path.getsize(self.log_path) > SLOW_LOG_MAX_BYTES:
+                os.replace(self.log_path, self.log_path + ".1")
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    def totals(self):
+        """Per-query totals, most total time first."""
+        with self._lock:
+            rows = [dict(stats, mean_ms=stats["total_ms"] / stats["calls"]) for stats in self._totals.values()]
+        return sorted(rows, key=lambda stats: stats["total_ms"], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._totals.clear()
+
+
+def read_slow_log(path=SLOW_LOG_PATH, limit=200):
+    """Most recent slow-query entries, newest first."""
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        lines = f.readlines()[-limit:]
+    return [json.loads(line) for line in reversed(lines) if line.strip()]
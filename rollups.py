@@ -0,0 +1,214 @@
+# Materialized rollups for the dashboard aggregates
+#
+# Listing_Rollup holds item counts and quantity sums of Food_Listings grouped
+# by status x location x food_type x provider_type x expiry month, and
+# Claims_Rollup holds claim counts and claimed quantity per claim month. Both
+# are kept current by triggers, so the aggregate reports in queries_dict read a
+# handful of groups instead of scanning every listing.
+#
+# Group keys are stored with NULL mapped to '' (NULLs never conflict in a
+# primary key); the report queries map them back with NULLIF.
+#
+# The categorical columns also get a lookup table each (Locations, Food_Types,
+# Meal_Types, Provider_Types): an integer key per distinct value and the number
+# of listings using it, so the sidebar filters list their options from a few
+# rows instead of a DISTINCT scan of Food_Listings. Values no listing uses any
+# more are dropped; the keys of the others stay put across rebuilds.
+#
+# The tables are created by migrations.py (v6 and v10); TRIGGERS must match
+# the latest migration step that creates them.
+
+# Food_Listings column -> lookup table
+LOOKUPS = {
+    "location": "Locations",
+    "food_type": "Food_Types",
+    "meal_type": "Meal_Types",
+    "provider_type": "Provider_Types",
+}
+
+
+# --- Trigger bodies ---
+def _listing_key(row):
+    return (f"IFNULL({row}.status, ''), IFNULL({row}.location, ''), IFNULL({row}.food_type, ''), "
+            f"IFNULL({row}.provider_type, ''), IFNULL({row}.expiry_month, '')")
+
+
+def _listing_delta(row, sign):
+    return f"""
+        INSERT INTO Listing_Rollup (status, location, food_type, provider_type, month, items, quantity)
+        VALUES ({_listing_key(row)}, {sign}1, {sign}IFNULL({row}.quantity, 0))
+        ON CONFLICT (status, location, food_type, provider_type, month) DO UPDATE SET
+            items = items + excluded.items,
+            quantity = quantity + excluded.quantity;
+    """
+
+
+def _claim_delta(row, sign):
+    # A claim counts once per matching listing, like the JOIN in monthly_claims;
+    # claims without a quantity of their own took the whole listing
+    return f"""
+        INSERT INTO Claims_Rollup (month, items, quantity)
+        SELECT IFNULL({row}.claim_month, ''), {sign}1, {sign}IFNULL({row}.quantity, IFNULL(f.quantity, 0))
+        FROM Food_Listings f WHERE f.food_id = {row}.food_id
+        ON CONFLICT (month) DO UPDATE SET
+            items = items + excluded.items,
+            quantity = quantity + excluded.quantity;
+    """
+
+
+def _listing_claims_delta(row, sign):
+    # Claims already pointing at a listing join in (or out) with it
+    return f"""
+        INSERT INTO Claims_Rollup (month, items, quantity)
+        SELECT IFNULL(c.claim_month, ''), {sign}COUNT(*),
+               {sign}SUM(IFNULL(c.quantity, IFNULL({row}.quantity, 0)))
+        FROM Claims c WHERE c.food_id = {row}.food_id
+        GROUP BY 1
+        ON CONFLICT (month) DO UPDATE SET
+            items = items + excluded.items,
+            quantity = quantity + excluded.quantity;
+    """
+
+
+# Drop groups a removal emptied; only the groups the row belonged to are
+# checked, so this stays a primary key lookup
+def _prune_listing(row):
+    return f"""
+        DELETE FROM Listing_Rollup
+        WHERE (status, location, food_type, provider_type, month) = ({_listing_key(row)}) AND items = 0;
+        DELETE FROM Claims_Rollup
+        WHERE items = 0 AND month IN (
+            SELECT IFNULL(c.claim_month, '') FROM Claims c WHERE c.food_id = {row}.food_id);
+    """
+
+
+def _prune_claim(row):
+    return f"""
+        DELETE FROM Claims_Rollup
+        WHERE month = IFNULL({row}.claim_month, '') AND items = 0;
+    """
+
+
+def _lookup_delta(row, sign):
+    return "".join(f"""
+        INSERT INTO {table} (name, listings)
+        SELECT {row}.{column}, {sign}1 WHERE {row}.{column} IS NOT NULL
+        ON CONFLICT (name) DO UPDATE SET listings = listings + excluded.listings;
+    """ for column, table in LOOKUPS.items())
+
+
+def _prune_lookups(row):
+    return "".join(f"""
+        DELETE FROM {table} WHERE name = {row}.{column} AND listings = 0;
+    """ for column, table in LOOKUPS.items())
+
+
+TRIGGERS = {
+    "trg_rollup_food_insert": f"""
+        AFTER INSERT ON Food_Listings BEGIN
+            {_listing_delta("NEW", "+")}
+            {_listing_claims_delta("NEW", "+")}
+        END
+    """,
+    # BEFORE, so the claims are still there when ON DELETE CASCADE is enforced
+    "trg_rollup_food_delete": f"""
+        BEFORE DELETE ON Food_Listings BEGIN
+            {_listing_delta("OLD", "-")}
+            {_listing_claims_delta("OLD", "-")}
+            {_prune_listing("OLD")}
+        END
+    """,
+    "trg_rollup_food_update": f"""
+        AFTER UPDATE OF food_id, status, location, food_type, provider_type, expiry, quantity
+        ON Food_Listings BEGIN
+            {_listing_delta("OLD", "-")}
+            {_listing_claims_delta("OLD", "-")}
+            {_listing_delta("NEW", "+")}
+            {_listing_claims_delta("NEW", "+")}
+            {_prune_listing("OLD")}
+        END
+    """,
+    "trg_rollup_claim_insert": f"""
+        AFTER INSERT ON Claims BEGIN
+            {_claim_delta("NEW", "+")}
+        END
+    """,
+    "trg_rollup_claim_delete": f"""
+        AFTER DELETE ON Claims BEGIN
+            {_claim_delta("OLD", "-")}
+            {_prune_claim("OLD")}
+        END
+    """,
+    "trg_rollup_claim_update": f"""
+        AFTER UPDATE OF food_id, claim_time, quantity ON Claims BEGIN
+            {_claim_delta("OLD", "-")}
+            {_claim_delta("NEW", "+")}
+            {_prune_claim("OLD")}
+        END
+    """,
+    "trg_lookup_food_insert": f"""
+        AFTER INSERT ON Food_Listings BEGIN
+            {_lookup_delta("NEW", "+")}
+        END
+    """,
+    "trg_lookup_food_delete": f"""
+        AFTER DELETE ON Food_Listings BEGIN
+            {_lookup_delta("OLD", "-")}
+            {_prune_lookups("OLD")}
+        END
+    """,
+    # Separate from the rollup trigger so status changes (sweeps, claims)
+    # don't touch the lookups
+    "trg_lookup_food_update": f"""
+        AFTER UPDATE OF location, food_type, meal_type, provider_type ON Food_Listings BEGIN
+            {_lookup_delta("OLD", "-")}
+            {_lookup_delta("NEW", "+")}
+            {_prune_lookups("OLD")}
+        END
+    """,
+}
+
+
+def create_triggers(conn):
+    for name, body in TRIGGERS.items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+
+def drop_triggers(conn):
+    # Bulk loads drop the triggers and call rebuild() once at the end
+    for name in TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def rebuild_lookups(conn):
+    """Recount the lookup tables, keeping the keys of values still in use."""
+    for column, table in LOOKUPS.items():
+        conn.execute(f"UPDATE {table} SET listings = 0")
+        conn.execute(f"""
+            INSERT INTO {table} (name, listings)
+            SELECT {column}, COUNT(*) FROM Food_Listings WHERE {column} IS NOT NULL GROUP BY 1
+            ON CONFLICT (name) DO UPDATE SET listings = excluded.listings
+        """)
+        conn.execute(f"DELETE FROM {table} WHERE listings = 0")
+
+
+def rebuild(conn):
+    """Recompute the rollups from the base tables with one GROUP BY each."""
+    conn.execute("DELETE FROM Listing_Rollup")
+    conn.execute("""
+        INSERT INTO Listing_Rollup (status, location, food_type, provider_type, month, items, quantity)
+        SELECT IFNULL(status, ''), IFNULL(location, ''), IFNULL(food_type, ''), IFNULL(provider_type, ''),
+               IFNULL(expiry_month, ''), COUNT(*), IFNULL(SUM(quantity), 0)
+        FROM Food_Listings
+        GROUP BY 1, 2, 3, 4, 5
+    """)
+    conn.execute("DELETE FROM Claims_Rollup")
+    conn.execute("""
+        INSERT INTO Claims_Rollup (month, items, quantity)
+        SELECT IFNULL(c.claim_month, ''), COUNT(*), IFNULL(SUM(IFNULL(c.quantity, f.quantity)), 0)
+        FROM Claims c
+        JOIN Food_Listings f ON c.food_id = f.food_id
+        GROUP BY 1
+    """)
+    rebuild_lookups(conn)
+
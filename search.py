@@ -0,0 +1,178 @@
+# Full-text search over listings
+#
+# Listing_Search is an FTS5 index of each listing's food name and location and
+# its provider's name and address. It is an external-content table over the
+# Listing_Search_Source view, so the text itself is not stored twice, and
+# triggers on Food_Listings and Providers keep it in step with both tables.
+#
+# All words of a search must match; the last one is a prefix, since it may
+# still be half typed ("bre" finds Bread). bm25 has to count the rows holding
+# each word, so its cost grows with how common the words are rather than with
+# the page size. A search is therefore ranked (food name hits first) only when
+# it matches at most RANK_LIMIT listings and none of its words matches more
+# than BROAD_LIMIT; other searches list the newest matches first, which FTS5
+# streams straight off the index. Ranked pages use OFFSET (bounded by
+# RANK_LIMIT); newest-first pages use a food_id cursor.
+#
+# The view and the index are created by migrations.py (v11); TRIGGERS must
+# match the latest migration step that creates them.
+
+import re
+
+RANK_LIMIT = 2000
+BROAD_LIMIT = 20_000
+
+# Indexed column -> bm25 weight, the table's rank function since v11
+WEIGHTS = {
+    "food_name": 10.0,
+    "location": 5.0,
+    "provider_name": 2.0,
+    "provider_address": 1.0,
+}
+_COLUMNS = ", ".join(WEIGHTS)
+
+
+# --- Trigger bodies ---
+# External content: a 'delete' must pass exactly the values that were indexed
+def _index(where):
+    return f"""
+        INSERT INTO Listing_Search (rowid, {_COLUMNS})
+        SELECT food_id, {_COLUMNS} FROM Listing_Search_Source WHERE {where};
+    """
+
+
+def _unindex_listing(row):
+    return f"""
+        INSERT INTO Listing_Search (Listing_Search, rowid, {_COLUMNS})
+        VALUES ('delete', {row}.food_id, {row}.food_name, {row}.location,
+                (SELECT name FROM Providers WHERE provider_id = {row}.provider_id),
+                (SELECT address FROM Providers WHERE provider_id = {row}.provider_id));
+    """
+
+
+def _unindex_provider_listings(provider_id, name, address, where="1"):
+    return f"""
+        INSERT INTO Listing_Search (Listing_Search, rowid, {_COLUMNS})
+        SELECT 'delete', food_id, food_name, location, {name}, {address}
+        FROM Food_Listings WHERE provider_id = {provider_id} AND {where};
+    """
+
+
+TRIGGERS = {
+    "trg_search_food_insert": f"""
+        AFTER INSERT ON Food_Listings BEGIN
+            {_index("food_id = NEW.food_id")}
+        END
+    """,
+    "trg_search_food_delete": f"""
+        AFTER DELETE ON Food_Listings BEGIN
+            {_unindex_listing("OLD")}
+        END
+    """,
+    "trg_search_food_update": f"""
+        AFTER UPDATE OF food_id, food_name, location, provider_id ON Food_Listings BEGIN
+            {_unindex_listing("OLD")}
+            {_index("food_id = NEW.food_id")}
+        END
+    """,
+    # Listings pointing at a provider id that didn't exist were indexed without
+    # provider text
+    "trg_search_provider_insert": f"""
+        AFTER INSERT ON Providers BEGIN
+            {_unindex_provider_listings("NEW.provider_id", "NULL", "NULL")}
+            {_index("food_id IN (SELECT food_id FROM Food_Listings WHERE provider_id = NEW.provider_id)")}
+        END
+    """,
+    "trg_search_provider_delete": f"""
+        AFTER DELETE ON Providers BEGIN
+            {_unindex_provider_listings("OLD.provider_id", "OLD.name", "OLD.address")}
+            {_index("food_id IN (SELECT food_id FROM Food_Listings WHERE provider_id = OLD.provider_id)")}
+        END
+    """,
+    "trg_search_provider_update": f"""
+        AFTER UPDATE OF provider_id, name, address ON Providers BEGIN
+            {_unindex_provider_listings("OLD.provider_id", "OLD.name", "OLD.address")}
+            {_unindex_provider_listings("NEW.provider_id", "NULL", "NULL",
+                                        "NEW.provider_id IS NOT OLD.provider_id")}
+            {_index("food_id IN (SELECT food_id FROM Food_Listings "
+                    "WHERE provider_id IN (OLD.provider_id, NEW.provider_id))")}
+        END
+    """,
+}
+
+
+def create_triggers(conn):
+    for name, body in TRIGGERS.items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+
+def drop_triggers(conn):
+    # Bulk loads drop the triggers and call rebuild() once at the end
+    for name in TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def rebuild(conn):
+    """Re-index every listing from Listing_Search_Source."""
+    conn.execute("INSERT INTO Listing_Search (Listing_Search) VALUES ('rebuild')")
+
+
+# --- Queries ---
+
+_SELECT = """
+    SELECT f.food_id, f.food_name, f.quantity, f.expiry, f.location,
+           f.food_type, f.meal_type, p.name AS provider_name, p.contact, f.status
+    FROM Listing_Search s
+    JOIN Food_Listings f ON f.food_id = s.rowid
+    LEFT JOIN Providers p ON p.provider_id = f.provider_id
+    WHERE Listing_Search MATCH :query
+"""
+
+
+def match_terms(text):
+    """FTS5 terms for what the user typed; the last word is a prefix."""
+    terms = [f'"{word}"' for word in re.findall(r"\w+", text.lower())]
+    if terms:
+        terms[-1] += "*"
+    return terms
+
+
+def probe_query(terms):
+    """Return (sql, params) that finds no rows when the search should be ranked.
+
+    Each part streams matches in index order and stops at its limit.
+    """
+    parts = ["SELECT rowid FROM Listing_Search WHERE Listing_Search MATCH :query LIMIT 1 OFFSET :rank_limit"]
+    params = {"query": " ".join(terms), "rank_limit": RANK_LIMIT, "broad_limit": BROAD_LIMIT}
+    if len(terms) > 1:
+        for i, term in enumerate(terms):
+            parts.append(f"SELECT rowid FROM Listing_Search WHERE Listing_Search MATCH :term{i} "
+                         "LIMIT 1 OFFSET :broad_limit")
+            params[f"term{i}"] = term
+    return " UNION ALL ".join(f"SELECT * FROM ({part})" for part in parts), params
+
+
+def build_query(terms, ranked, available_only=True, after=None, page_size=50):
+    """Return (sql, params) for the page after cursor `after`.
+
+    The cursor is the offset of the page for ranked searches and the last
+    food_id shown for newest-first ones.
+    """
+    sql = _SELECT + ("    AND f.status = 'Available'\n" if available_only else "")
+    params = {"query": " ".join(terms), "page_size": page_size}
+    if ranked:
+        sql += "    ORDER BY s.rank\n    LIMIT :page_size OFFSET :offset"
+        params["offset"] = after or 0
+    else:
+        if after is not None:
+            sql += "    AND s.rowid < :after\n"
+            params["after"] = after
+        sql += "    ORDER BY s.rowid DESC\n    LIMIT :page_size"
+    return sql, params
+
+
+def next_cursor(food_ids, ranked, after=None, page_size=50):
+    """Cursor of the page after the one showing food_ids, or None when it was the last."""
+    if len(food_ids) < page_size:
+        return None
+    return (after or 0) + page_size if ranked else int(food_ids[-1])
@@ -0,0 +1,383 @@
+# Columnar analytics snapshot (Parquet + DuckDB)
+#
+# An optional backend for the aggregate reports. snapshot() copies
+# Food_Listings and Claims into Parquet files partitioned by month (of expiry
+# and claim_time), plus Providers and Receivers unpartitioned, all read in one
+# SQLite read transaction so the tables agree with each other. Each snapshot
+# is written into a temporary directory of its own, renamed to a name unique
+# to its time and process once complete, and CURRENT is then switched to it
+# atomically; the previous one is kept for readers still using it. Several
+# processes can snapshot at once: a failed snapshot only removes its own
+# temporary directory, and the current snapshot is never pruned.
+#
+# Snapshots after the first are incremental: the snapshot is a consumer of the
+# change log (changelog.py), and only the month partitions holding a listing or
+# claim changed since the previous snapshot -- in that snapshot or now -- are
+# written again. The others are hard links to the previous snapshot's files.
+# The previous snapshot's MANIFEST records the changelog seq it was taken at;
+# a reload, a compacted cursor or a column change means a full snapshot.
+#
+# query() runs the reports in COLUMNAR_QUERIES through an in-process DuckDB
+# over the current snapshot, with the same columns as queries_dict, so heavy
+# reports stop competing with the app's writes on the SQLite file. Enable it
+# with ANALYTICS_BACKEND=columnar; the app then refreshes the snapshot every
+# SNAPSHOT_INTERVAL seconds. As a separate process:
+#
+#     python -m snapshot [--db local_food_wastage.db] [--out snapshots] [--interval 3600] [--once]
+#
+# Needs pyarrow and duckdb, imported only when a snapshot is written or read.
+# The scheduler reports through the snapshot logger, like the expiry sweep.
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime
+from urllib.parse import unquote
+
+import changelog
+from expiry_sweep import DB_PATH, connect
+
+SNAPSHOT_DIR = os.environ.get("ANALYTICS_SNAPSHOT_DIR", "snapshots")
+SNAPSHOT_INTERVAL = int(os.environ.get("ANALYTICS_SNAPSHOT_INTERVAL", 3600))  # seconds
+CHUNK_SIZE = 100_000
+KEEP = 2  # snapshots kept on disk, the current one included
+
+logger = logging.getLogger(__name__)
+
+# table -> generated month column that partitions it, or None
+TABLES = {
+    "Food_Listings": "expiry_month",
+    "Claims": "claim_month",
+    "Providers": None,
+    "Receivers": None,
+}
+NO_MONTH = "none"  # partition value for rows without a date
+TEMP_PREFIX = ".tmp-"  # snapshots still being written; hidden from pruning
+CONSUMER = "snapshot"  # name of the snapshots' changelog cursor
+
+# Same result columns as the queries_dict entries they replace
+COLUMNAR_QUERIES = {
+    "available_by_city": """
+        SELECT location, COUNT(*) AS total_items, SUM(quantity)::BIGINT AS total_quantity
+        FROM Food_Listings
+        WHERE status = 'Available'
+        GROUP BY 1
+        ORDER BY total_quantity DESC;
+    """,
+    "available_by_provider_type": """
+        SELECT provider_type, COUNT(*) AS total_items, SUM(quantity)::BIGINT AS total_quantity
+        FROM Food_Listings
+        WHERE status = 'Available'
+        GROUP BY 1
+        ORDER BY total_quantity DESC;
+    """,
+    "top_providers": """
+        SELECT p.name AS provider_name, SUM(f.quantity)::BIGINT AS total_quantity
+        FROM Food_Listings f
+        JOIN Providers p ON f.provider_id = p.provider_id
+        GROUP BY p.name
+        ORDER BY total_quantity DESC
+        LIMIT 5;
+    """,
+    "top_receivers": """
+        SELECT r.name AS receiver_name, SUM(COALESCE(c.quantity, f.quantity))::BIGINT AS total_claimed
+        FROM Claims c
+        JOIN Food_Listings f ON c.food_id = f.food_id
+        JOIN Receivers r ON c.receiver_id = r.receiver_id
+        GROUP BY r.name
+        ORDER BY total_claimed DESC
+        LIMIT 5;
+    """,
+    "wastage_by_location_type": """
+        SELECT location, food_type, COUNT(*) AS total_items, SUM(quantity)::BIGINT AS total_quantity
+        FROM Food_Listings
+        WHERE status = 'Expired'
+        GROUP BY 1, 2
+        ORDER BY total_quantity DESC;
+    """,
+    "claimed_vs_expired": """
+        SELECT status, COUNT(*) AS total_items, SUM(quantity)::BIGINT AS total_quantity
+        FROM Food_Listings
+        WHERE status IN ('Claimed', 'Expired')
+        GROUP BY status;
+    """,
+    # The partition column stands in for strftime('%Y-%m', ...)
+    "monthly_donations": """
+        SELECT month, COUNT(*) AS items_listed, SUM(quantity)::BIGINT AS quantity_listed
+        FROM Food_Listings
+        GROUP BY 1
+        ORDER BY 1 ASC;
+    """,
+    "monthly_claims": """
+        SELECT c.month, COUNT(*) AS items_claimed, SUM(COALESCE(c.quantity, f.quantity))::BIGINT AS quantity_claimed
+        FROM Claims c
+        JOIN Food_Listings f ON c.food_id = f.food_id
+        GROUP BY 1
+        ORDER BY 1 ASC;
+    """,
+    "dashboard_summary": """
+        SELECT
+            COUNT(*) FILTER (WHERE status = 'Available') AS available_count,
+            (SUM(quantity) FILTER (WHERE status = 'Available'))::BIGINT AS available_quantity,
+            COUNT(*) FILTER (WHERE status = 'Expired') AS expired_count,
+            (SUM(quantity) FILTER (WHERE status = 'Expired'))::BIGINT AS expired_quantity,
+            COUNT(*) FILTER (WHERE status = 'Claimed') AS claimed_count,
+            (SUM(quantity) FILTER (WHERE status = 'Claimed'))::BIGINT AS claimed_quantity
+        FROM Food_Listings;
+    """,
+}
+
+
+def _arrow_schema(conn, table, month_column):
+    import pyarrow as pa
+
+    # Declared SQLite types; dates stay ISO text, as in the database.
+    # table_xinfo also lists the generated columns that SELECT * returns.
+    fields = [pa.field(name, pa.int64() if decl.upper() == "INTEGER" else pa.string())
+              for _, name, decl, *_ in conn.execute(f"PRAGMA table_xinfo({table})")]
+    if month_column:
+        fields.append(pa.field("month", pa.string()))
+    return pa.schema(fields)
+
+
+def _write_table(conn, table, month_column, path, months=None):
+    # months: only write these partitions
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    schema = _arrow_schema(conn, table, month_column)
+    sql, params = f"SELECT * FROM {table}", None
+    if month_column:
+        sql = f"SELECT *, IFNULL({month_column}, '{NO_MONTH}') AS month FROM {table}"
+    if months is not None:
+        # Kept apart from the IFNULL so the month indexes serve it
+        sql += f" WHERE {month_column} IN (SELECT value FROM json_each(?))"
+        if NO_MONTH in months:
+            sql += f" OR {month_column} IS NULL"
+        params = (json.dumps(sorted(months)),)
+    batches = (pa.RecordBatch.from_pandas(df, schema=schema, preserve_index=False)
+               for df in pd.read_sql(sql, conn, params=params, chunksize=CHUNK_SIZE))
+    partitioning = ds.partitioning(pa.schema([("month", pa.string())]), flavor="hive") if month_column else None
+    ds.write_dataset(batches, path, schema=schema, format="parquet", partitioning=partitioning,
+                     existing_data_behavior="error")
+
+
+# --- Incremental snapshots ---
+def _columns(conn):
+    return {table: [row[1] for row in conn.execute(f"PRAGMA table_xinfo({table})")] for table in TABLES}
+
+
+def _manifest(path):
+    try:
+        with open(os.path.join(path, "MANIFEST"), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _previous_months(path, key, ids):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    partitioning = ds.partitioning(pa.schema([("month", pa.string())]), flavor="hive")
+    dataset = ds.dataset(path, format="parquet", partitioning=partitioning)
+    return set(dataset.to_table(columns=["month"], filter=ds.field(key).isin(ids)).column("month").to_pylist())
+
+
+def _changed_months(conn, previous, seq):
+    """Partitions to write again per table since snapshot `previous`; tables missing or None are written whole."""
+    manifest = _manifest(previous)
+    if manifest is None or manifest["columns"] != _columns(conn):
+        return {}
+    try:
+        changes = changelog.changes_since(conn, manifest["changelog_seq"], seq, changelog.KEYS)
+    except changelog.CursorExpired:
+        return {}
+
+    months = {}
+    for table, key in changelog.KEYS.items():
+        ids = [change.row_id for change in changes if change.table == table]
+        if any(change.op == "reload" for change in changes if change.table == table):
+            months[table] = None
+            continue
+        # Where the rows were, and where they are now
+        months[table] = _previous_months(os.path.join(previous, table), key, ids) if ids else set()
+        months[table].update(row[0] for row in conn.execute(f"""
+            SELECT DISTINCT IFNULL({TABLES[table]}, '{NO_MONTH}') FROM {table}
+            WHERE {key} IN (SELECT value FROM json_each(?))
+        """, (json.dumps(ids),)))
+    return months
+
+
+def _link_partitions(source, target, skip):
+    # Snapshot files are never modified, so a link is as good as a copy.
+    # An empty table left no directory to link from.
+    if not os.path.isdir(source):
+        return
+    for entry in os.listdir(source):
+        if unquote(entry.partition("=")[2]) in skip:
+            continue
+        os.makedirs(os.path.join(target, entry))
+        for filename in os.listdir(os.path.join(source, entry)):
+            src, dst = os.path.join(source, entry, filename), os.path.join(target, entry, filename)
+            try:
+                os.link(src, dst)
+            except OSError:
+                shutil.copy2(src, dst)
+
+
+def current(root=SNAPSHOT_DIR):
+    """Name of the current snapshot, or None if there is none yet."""
+    try:
+        with open(os.path.join(root, "CURRENT"), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _name():
+    # Sorts by time like the older second-resolution names, and two processes
+    # starting in the same microsecond still differ
+    return f"{datetime.now():%Y%m%dT%H%M%S%f}-{os.getpid()}"
+
+
+def _switch_current(root, name):
+    """Point CURRENT at name unless a newer snapshot got there first."""
+    latest = current(root)
+    if latest is not None and latest > name:
+        return
+    pointer = os.path.join(root, "CURRENT")
+    with open(f"{pointer}.{name}.tmp", "w", encoding="utf-8") as f:
+        f.write(name)
+    os.replace(f"{pointer}.{name}.tmp", pointer)
+
+
+def _prune(root, keep=KEEP):
+    live = {current(root)}
+    snapshots = sorted(entry for entry in os.listdir(root)
+                       if os.path.isdir(os.path.join(root, entry)) and not entry.startswith(TEMP_PREFIX))
+    for old in snapshots[:-keep]:
+        if old not in live:
+            shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+
+
+def snapshot(conn, root=SNAPSHOT_DIR, incremental=True):
+    """Write a new snapshot, make it current and return its name."""
+    os.makedirs(root, exist_ok=True)
+    previous = current(root)
+    previous = os.path.join(root, previous) if previous and incremental else None
+    path = tempfile.mkdtemp(prefix=TEMP_PREFIX, dir=root)
+    conn.execute("BEGIN")
+    try:
+        seq = changelog.latest_seq(conn)
+        months = _changed_months(conn, previous, seq) if previous else {}
+        for table, month_column in TABLES.items():
+            if months.get(table) is None:
+                _write_table(conn, table, month_column, os.path.join(path, table))
+            else:
+                if months[table]:
+                    _write_table(conn, table, month_column, os.path.join(path, table), months[table])
+                _link_partitions(os.path.join(previous, table), os.path.join(path, table), months[table])
+        with open(os.path.join(path, "MANIFEST"), "w", encoding="utf-8") as f:
+            json.dump({"changelog_seq": seq, "columns": _columns(conn)}, f)
+        name = _name()
+        os.rename(path, os.path.join(root, name))
+    except BaseException:
+        shutil.rmtree(path, ignore_errors=True)
+        raise
+    finally:
+        conn.rollback()
+    # Keeps the entries since this snapshot from being compacted
+    changelog.advance(conn, CONSUMER, seq)
+    conn.commit()
+
+    _switch_current(root, name)
+    _prune(root)
+    return name
+
+
+def query(name, root=SNAPSHOT_DIR, snapshot_name=None):
+    """Run a COLUMNAR_QUERIES report over a snapshot and return a DataFrame."""
+    import duckdb
+
+    path = os.path.join(root, snapshot_name or current(root))
+    con = duckdb.connect()
+    try:
+        for table, month_column in TABLES.items():
+            files = os.path.join(path, table, "**", "*.parquet").replace("'", "''")
+            source = f"read_parquet('{files}', hive_partitioning = {'true' if month_column else 'false'})"
+            if month_column:
+                source = f"(SELECT * REPLACE (NULLIF(month, '{NO_MONTH}') AS month) FROM {source})"
+            con.execute(f"CREATE VIEW {table} AS SELECT * FROM {source}")
+        df = con.execute(COLUMNAR_QUERIES[name]).df()
+    finally:
+        con.close()
+    # Nullable Int64 becomes what pd.read_sql gives for SQLite: float64 with NaN
+    for column in df.select_dtypes("Int64"):
+        df[column] = df[column].astype("float64" if df[column].isna().any() else "int64")
+    return df
+
+
+class SnapshotScheduler(threading.Thread):
+    """Daemon thread that takes a snapshot every `interval` seconds."""
+
+    def __init__(self, path=DB_PATH, root=SNAPSHOT_DIR, interval=SNAPSHOT_INTERVAL):
+        super().__init__(name="analytics-snapshot", daemon=True)
+        self.path = path
+        self.root = root
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        conn = connect(self.path)
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    t0 = time.perf_counter()
+                    name = snapshot(conn, self.root)
+                    logger.info("analytics snapshot %s written in %.1f s", name, time.perf_counter() - t0)
+                except Exception:
+                    logger.exception("analytics snapshot failed")
+                self._stop_event.wait(self.interval)
+        finally:
+            conn.close()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Snapshot the database into Parquet for columnar analytics.")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database file")
+    parser.add_argument("--out", default=SNAPSHOT_DIR, help="snapshot directory")
+    parser.add_argument("--interval", type=int, default=SNAPSHOT_INTERVAL, help="seconds between snapshots")
+    parser.add_argument("--once", action="store_true", help="take one snapshot and exit")
+    parser.add_argument("--full", action="store_true", help="write every partition, not just the changed ones")
+    args = parser.parse_args(argv)
+
+    if args.once:
+        conn = connect(args.db)
+        t0 = time.perf_counter()
+        name = snapshot(conn, args.out, incremental=not args.full)
+        conn.close()
+        print(f"snapshot {name} written to {args.out} ({time.perf_counter() - t0:.1f} s)")
+        return
+
+    logging.basicConfig(level=logging.INFO, format="[%(asctime)s] %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
+    scheduler = SnapshotScheduler(args.db, args.out, args.interval)
+    scheduler.start()
+    try:
+        while scheduler.is_alive():
+            scheduler.join(1)
+    except KeyboardInterrupt:
+        scheduler.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# Cold-start benchmark for the Streamlit app
+#
+# For each page, a fresh interpreter opens food.py straight on that page with
+# Streamlit's AppTest (no server or browser) against a copy of the database,
+# and times the first run -- time to first paint, module imports included --
+# and the median of a few warm reruns. It also reports whether pandas had to
+# be imported, so a page that starts needing it shows up here.
+#
+#     python -m startup [--db local_food_wastage.db] [--page "Add Entry"] [--runs 3]
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from expiry_sweep import DB_PATH, connect
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+PAGES = ["View Entries", "Search", "Add Entry", "Bulk Upload", "Update Entry", "Delete Entry", "Claim Food",
+         "Export", "Analytics & Reports"]
+
+# Runs in the child interpreter: argv is the entry script and the page
+CHILD = """
+import json, statistics, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+at = AppTest.from_file(sys.argv[1], default_timeout=300)
+at.session_state["page"] = sys.argv[2]
+at.run()
+painted = time.perf_counter()
+reruns = []
+for _ in range(5):
+    t0 = time.perf_counter()
+    at.run()
+    reruns.append(time.perf_counter() - t0)
+print(json.dumps({
+    "streamlit_ms": (imported - start) * 1000,
+    "first_paint_ms": (painted - imported) * 1000,
+    "rerun_ms": statistics.median(reruns) * 1000,
+    "pandas": "pandas" in sys.modules,
+    "errors": [e.value for e in at.exception],
+}))
+"""
+
+
+def measure(page, workdir):
+    """Time one cold start of `page` in a new interpreter running in workdir."""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [APP_DIR, os.environ.get("PYTHONPATH")]))}
+    out = subprocess.run([sys.executable, "-c", CHILD, os.path.join(APP_DIR, "food.py"), page],
+                         cwd=workdir, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def run(db_path=DB_PATH, pages=PAGES, runs=3, log=print):
+    """Return per-page medians of `runs` cold starts."""
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        # The app opens local_food_wastage.db in its working directory;
+        # migrate the copy up front so migrations aren't timed
+        copy = os.path.join(workdir, os.path.basename(DB_PATH))
+        shutil.copy(db_path, copy)
+        connect(copy).close()
+
+        log(f"{'page':22} {'import st':>10} {'first paint':>12} {'rerun':>8}  pandas")
+        for page in pages:
+            samples = [measure(page, workdir) for _ in range(runs)]
+            errors = [e for sample in samples for e in sample["errors"]]
+            if errors:
+                raise RuntimeError(f"{page}: {errors[0]}")
+            result = {key: statistics.median(sample[key] for sample in samples)
+                      for key in ("streamlit_ms", "first_paint_ms", "rerun_ms")}
+            result["pandas"] = any(sample["pandas"] for sample in samples)
+            results[page] = result
+            log(f"{page:22} {result['streamlit_ms']:8.0f} ms {result['first_paint_ms']:9.0f} ms "
+                f"{result['rerun_ms']:5.0f} ms  {'yes' if result['pandas'] else 'no'}")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold-start time to first paint per page.")
+    parser.add_argument("--db", default=DB_PATH, help="database to copy for the run")
+    parser.add_argument("--page", action="append", choices=PAGES, help="page to measure (repeatable; default all)")
+    parser.add_argument("--runs", type=int, default=3, help="cold starts per page; the median is reported")
+    args = parser.parse_args(argv)
+    run(args.db, args.page or PAGES, args.runs)
+
+
+if __name__ == "__main__":
+    main()
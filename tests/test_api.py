@@ -0,0 +1,29 @@
+import asyncio
+import sqlite3
+import threading
+
+import api
+
+
+def sweeps(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM Expiry_Sweeps").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_lifespan_runs_the_expiry_sweep(tmp_path):
+    path = str(tmp_path / "food.db")
+    app = api.create_app(path, readers=1)
+
+    async def serve():
+        async with app.router.lifespan_context(app):
+            for _ in range(100):
+                if sweeps(path):
+                    break
+                await asyncio.sleep(0.05)
+
+    asyncio.run(serve())
+    assert sweeps(path) == 1
+    assert not any(thread.name == "expiry-sweep" for thread in threading.enumerate())
@@ -0,0 +1,69 @@
+import io
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import bulk
+import migrations
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    migrations.migrate(conn)
+    conn.execute("INSERT INTO Providers (provider_id, name) VALUES (1, 'Provider')")
+    yield conn
+    conn.close()
+
+
+def upload(food_ids):
+    n = len(food_ids)
+    return pd.DataFrame({
+        "food_id": food_ids,
+        "food_name": ["Bread"] * n,
+        "quantity": ["5"] * n,
+        "expiry_date": ["3/17/2030"] * n,
+        "provider_id": ["1"] * n,
+        "provider_type": ["Restaurant"] * n,
+        "location": ["Springfield"] * n,
+        "food_type": ["Vegetarian"] * n,
+        "meal_type": ["Dinner"] * n,
+    })
+
+
+def test_food_id_must_be_a_whole_number(conn):
+    rows, errors = bulk.validate(conn, upload(["1.5", "7", None, "abc"]))
+
+    assert rows["food_id"].tolist() == [7, pd.NA]
+    assert errors["line"].tolist() == [2, 5]
+    assert (errors["error"] == "food_id must be a whole number").all()
+
+
+def test_valid_rows_insert(conn):
+    rows, errors = bulk.validate(conn, upload(["7", "8"]))
+    assert errors.empty
+    assert bulk.insert_listings(conn, rows) == 2
+    assert conn.execute("SELECT COUNT(*) FROM Food_Listings").fetchone()[0] == 2
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet"])
+def test_export_stops_past_max_bytes(tmp_path, fmt):
+    path = str(tmp_path / "food.db")
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    migrations.migrate(conn)
+    conn.executemany("INSERT INTO Food_Listings (food_name, quantity) VALUES (?, 1)",
+                     [(f"Bread {i}",) for i in range(1000)])
+    conn.commit()
+
+    out = io.BytesIO()
+    with pytest.raises(bulk.ExportTooLarge) as e:
+        bulk.export(conn, "SELECT * FROM Food_Listings", None, fmt, out, chunk_size=100, max_bytes=1000)
+    assert e.value.rows == 100
+
+    # The abandoned query holds no read snapshot: the connection sees later writes
+    other = sqlite3.connect(path)
+    other.execute("DELETE FROM Food_Listings")
+    other.commit()
+    assert conn.execute("SELECT COUNT(*) FROM Food_Listings").fetchone()[0] == 0
@@ -0,0 +1,34 @@
+import sqlite3
+
+import pytest
+
+import claims
+import migrations
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:", isolation_level=None)
+    migrations.migrate(conn)
+    conn.execute("INSERT INTO Providers (provider_id, name) VALUES (1, 'Provider')")
+    conn.execute("INSERT INTO Receivers (receiver_id, name) VALUES (1, 'Receiver')")
+    conn.execute("""
+        INSERT INTO Food_Listings (food_id, food_name, quantity, expiry, provider_id, location, food_type, status)
+        VALUES (1, 'Bread', 10, datetime('now', '+3 days'), 1, 'Springfield', 'Vegan', 'Available')
+    """)
+    yield conn
+    conn.close()
+
+
+def test_claims_leave_the_listed_quantity(conn):
+    assert claims.claim(conn, 1, 1, 4).remaining == 6
+    last = claims.claim(conn, 1, 1, 6)
+    assert (last.remaining, last.status) == (0, "Claimed")
+    assert conn.execute("SELECT quantity, reserved FROM Food_Listings").fetchone() == (10, 10)
+    assert conn.execute("SELECT status, items, quantity FROM Listing_Rollup").fetchall() == [("Claimed", 1, 10)]
+
+
+def test_claim_beyond_what_is_left_is_rejected(conn):
+    claims.claim(conn, 1, 1, 7)
+    with pytest.raises(claims.ClaimRejected, match="Only 3 left"):
+        claims.claim(conn, 1, 1, 4)
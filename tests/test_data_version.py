@@ -0,0 +1,14 @@
+import data_version
+from queries_dict import queries
+
+
+def test_clock_keys_only_queries_relative_to_now():
+    assert [name for name, sql in queries.items() if data_version.clock(sql)] == ["near_expiry"]
+    assert data_version.clock("SELECT * FROM Food_Listings WHERE expiry >= date('now')")[0][0] == "today"
+    assert data_version.clock("SELECT * FROM Food_Listings WHERE status = 'Available'") == ()
+
+
+def test_deleting_a_listing_also_writes_its_claims():
+    assert data_version.written_tables("DELETE FROM Food_Listings WHERE food_id = ?") == ["Food_Listings", "Claims"]
+    assert data_version.written_tables("UPDATE Food_Listings SET quantity = 1") == ["Food_Listings"]
+    assert data_version.written_tables("SELECT 1") == []
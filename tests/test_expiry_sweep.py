@@ -0,0 +1,16 @@
+import logging
+
+import expiry_sweep
+
+
+def test_scheduler_logs_each_sweep(tmp_path, caplog):
+    scheduler = expiry_sweep.ExpiryScheduler(str(tmp_path / "food.db"), interval=60)
+    with caplog.at_level(logging.INFO, logger="expiry_sweep"):
+        scheduler.start()
+        for _ in range(100):
+            if caplog.records:
+                break
+            scheduler.join(0.05)
+        scheduler.stop()
+        scheduler.join()
+    assert [record.getMessage() for record in caplog.records] == ["expiry sweep: 0 expired, 0 near expiry"]
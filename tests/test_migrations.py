@@ -0,0 +1,46 @@
+import json
+import re
+import sqlite3
+
+import pytest
+
+import changelog
+import migrations
+import rollups
+import search
+
+
+def normalized(sql):
+    return re.sub(r"\s+", " ", sql).replace("( ", "(").replace(" )", ")").replace("IF NOT EXISTS ", "").strip()
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    migrations.migrate(conn)
+    yield conn
+    conn.close()
+
+
+@pytest.mark.parametrize("module", [rollups, search, changelog])
+def test_live_triggers_match_the_migrations(conn, module):
+    # Bulk loads recreate the triggers from the modules
+    for name, body in module.TRIGGERS.items():
+        created = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?", (name,)).fetchone()
+        assert created is not None, name
+        assert normalized(created[0]) == normalized(f"CREATE TRIGGER {name} {body}")
+
+
+def test_indexes_match_the_migrations(conn):
+    created = {normalized(sql) for (sql,) in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name IN (SELECT value FROM json_each(?))",
+        (json.dumps(migrations.TABLES),)) if sql}
+    assert created == {normalized(sql) for sql in migrations.INDEXES}
+
+
+def test_month_columns_are_stored(conn):
+    # table_xinfo's hidden column: 2 for VIRTUAL generated columns, 3 for STORED
+    hidden = {(table, name): flag for table in ("Food_Listings", "Claims")
+              for _, name, _, _, _, _, flag in conn.execute(f"PRAGMA table_xinfo({table})")}
+    assert hidden[("Food_Listings", "expiry_month")] == 3
+    assert hidden[("Claims", "claim_month")] == 3
@@ -0,0 +1,50 @@
+import os
+import sqlite3
+
+import pytest
+
+import migrations
+import snapshot
+
+pytest.importorskip("pyarrow")
+pytest.importorskip("duckdb")
+
+
+@pytest.fixture
+def conn():
+    # pyarrow pulls the batches from its own threads, like expiry_sweep.connect allows
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    migrations.migrate(conn)
+    conn.execute("INSERT INTO Providers (provider_id, name) VALUES (1, 'Provider')")
+    conn.execute("""
+        INSERT INTO Food_Listings (food_name, quantity, expiry, provider_id, location, food_type, status)
+        VALUES ('Bread', 10, '2030-03-17 00:00:00', 1, 'Springfield', 'Vegan', 'Available')
+    """)
+    conn.execute("INSERT INTO Receivers (receiver_id, name) VALUES (1, 'Receiver')")
+    conn.execute("INSERT INTO Claims (food_id, receiver_id, status, claim_time) VALUES (1, 1, 'Pending', '2030-03-01 10:00:00')")
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def test_snapshots_in_the_same_second_get_their_own_directories(conn, tmp_path):
+    root = str(tmp_path)
+    first, second = snapshot.snapshot(conn, root), snapshot.snapshot(conn, root)
+    assert first != second
+    assert snapshot.current(root) == second
+    assert sorted(os.listdir(root)) == sorted(["CURRENT", first, second])
+
+
+def test_a_failed_snapshot_leaves_the_current_one(conn, tmp_path, monkeypatch):
+    root = str(tmp_path)
+    name = snapshot.snapshot(conn, root)
+
+    def fail(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(snapshot, "_write_table", fail)
+    with pytest.raises(OSError):
+        snapshot.snapshot(conn, root, incremental=False)
+    assert snapshot.current(root) == name
+    assert sorted(os.listdir(root)) == sorted(["CURRENT", name])
+    assert snapshot.query("available_by_city", root)["total_quantity"].tolist() == [10]
@@ -0,0 +1,40 @@
+import sqlite3
+
+import pytest
+
+from write_queue import WriteQueue
+
+
+class FlakyConnection:
+    """A connection whose next `failures` BEGINs fail like a malformed file."""
+
+    def __init__(self, failures):
+        self.conn = sqlite3.connect(":memory:", isolation_level=None, check_same_thread=False)
+        self.conn.execute("CREATE TABLE t (x INTEGER)")
+        self.failures = failures
+
+    def execute(self, sql, *args):
+        if sql == "BEGIN IMMEDIATE" and self.failures:
+            self.failures -= 1
+            raise sqlite3.DatabaseError("database disk image is malformed")
+        return self.conn.execute(sql, *args)
+
+    def commit(self):
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+
+def insert(conn, x):
+    return conn.execute("INSERT INTO t VALUES (?)", (x,)).lastrowid
+
+
+def test_a_failed_batch_leaves_the_writer_running():
+    conn = FlakyConnection(failures=1)
+    writes = WriteQueue(conn)
+    with pytest.raises(sqlite3.DatabaseError, match="malformed"):
+        writes.write(insert, 1)
+    assert writes.write(insert, 2) == 1
+    writes.close()
+    assert conn.conn.execute("SELECT x FROM t").fetchall() == [(2,)]
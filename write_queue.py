@@ -0,0 +1,134 @@
+# Single-writer queue with group commit
+#
+# One background thread owns the write connection. Callers submit a job, a
+# function taking the connection, and get a concurrent.futures.Future back.
+# The thread takes every job that queued up while the previous batch was
+# committing (up to MAX_BATCH) and runs the lot in one BEGIN IMMEDIATE
+# transaction, each job under its own SAVEPOINT, so a failing job is rolled
+# back and reported through its future without taking the others down. One commit, and one fsync, covers the
+# whole batch, and writers in this process never wait on each other for the
+# SQLite write lock.
+#
+# Jobs must not commit or roll back themselves. A batch whose transaction
+# fails (BEGIN, a savepoint or the commit) fails every job in it, and the
+# thread carries on with the next batch.
+
+import queue
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+# Seconds to keep collecting after the first job. Callers mostly wait on their
+# result before writing again, so any wait here only adds latency: with 16
+# writers, 0 gave batches of ~10 and 2-2.5x the throughput of a commit per
+# write, while 5 ms fell below it.
+BATCH_WINDOW = 0
+MAX_BATCH = 256
+RETRIES = 6
+BACKOFF = 0.02  # seconds before the first retry of a busy batch; doubles each attempt
+
+_STOP = object()
+
+
+def is_busy(error):
+    """True for SQLITE_BUSY, which is worth retrying after a backoff."""
+    return "locked" in str(error) or "busy" in str(error)
+
+
+class WriteQueue:
+    def __init__(self, conn, window=BATCH_WINDOW, max_batch=MAX_BATCH):
+        self.conn = conn
+        self.window = window
+        self.max_batch = max_batch
+        self.batches = 0
+        self.jobs = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="write-queue", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args):
+        """Queue fn(conn, *args) and return a Future of its result."""
+        future = Future()
+        self._queue.put((fn, args, future))
+        return future
+
+    def write(self, fn, *args):
+        """Run fn(conn, *args) in the next batch and wait for its result."""
+        return self.submit(fn, *args).result()
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    # --- Writer thread ---
+    def _collect(self):
+        first = self._queue.get()
+        if first is _STOP:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            try:
+                job = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is _STOP:
+                self._queue.put(_STOP)
+                break
+            batch.append(job)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            batch = [job for job in batch if job[2].set_running_or_notify_cancel()]
+            if batch:
+                self._commit(batch)
+
+    def _commit(self, batch):
+        for attempt in range(RETRIES + 1):
+            try:
+                outcomes = self._execute(batch)
+                break
+            except Exception as e:
+                self._rollback()
+                if not (isinstance(e, sqlite3.OperationalError) and is_busy(e)) or attempt == RETRIES:
+                    for _, _, future in batch:
+                        future.set_exception(e)
+                    return
+                time.sleep(BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5))
+
+        self.batches += 1
+        self.jobs += len(batch)
+        for (_, _, future), (ok, value) in zip(batch, outcomes):
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def _rollback(self):
+        try:
+            self.conn.rollback()
+        except sqlite3.Error:
+            pass  # e.g. a malformed file; the batch already fails with the original error
+
+    def _execute(self, batch):
+        """Run the batch in one transaction; returns (ok, result or exception) per job."""
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        outcomes = []
+        for fn, args, _ in batch:
+            conn.execute("SAVEPOINT job")
+            try:
+                outcomes.append((True, fn(conn, *args)))
+            except Exception as e:
+                conn.execute("ROLLBACK TO job")
+                outcomes.append((False, e))
+            conn.execute("RELEASE job")
+        conn.commit()
+        return outcomes